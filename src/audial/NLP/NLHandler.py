@@ -1,5 +1,6 @@
 import nltk
 from util.TreeUtil import mutableCopy
+from util.SynonymCache import synonymCacheOf
 from nltk.corpus import wordnet as wn
 from NLP.model.Query import Query
 from NLP.poc.filterCreator import *
@@ -114,18 +115,30 @@ def synonymsOfWord(word, pos_tag=None, n_synonyms=None):
     :param n_synonyms: int; maximum number of synonyms to return, None (default) for all
     :return: list<string> with synonyms of :word
     """
+    if not word:
+        return []
+    text_norm = word.replace(" ", "_").lower()  # Compound names are underscored in Wordnet
+    syns = synonymCacheOf().get(text_norm, pos_tag, lambda: wordnetSynonyms(text_norm, pos_tag))
+    return syns[0:n_synonyms]
+
+
+def wordnetSynonyms(text_norm, pos_tag=None):
+    """
+    Looks up the synonyms of a word in the Wordnet corpus, bypassing the synonym cache
+    :param text_norm: string; lowercase word, with compound names underscored
+    :param pos_tag: string; Wordnet part-of-speech tag of the input word, None for all
+    :return: list<string> with synonyms of :text_norm
+    """
     syns = set()
-    if word:
-        text_norm = word.replace(" ", "_").lower()  # Compound names are underscored in Wordnet
-        syn_set = wn.synsets(text_norm, pos=pos_tag)
-        if len(syn_set) > 0:
-            s = syn_set[0]  # Take into consideration only most relevant synonym set
-            lemmas = s.lemma_names()
-            syns.update([l.replace("_", " ") for l in lemmas if l != text_norm])
-        quick_syn = QUICK_SYN_NOUN.get(text_norm)
-        if quick_syn:
-            syns.add(quick_syn)
-    return list(syns)[0:n_synonyms]
+    syn_set = wn.synsets(text_norm, pos=pos_tag)
+    if len(syn_set) > 0:
+        s = syn_set[0]  # Take into consideration only most relevant synonym set
+        lemmas = s.lemma_names()
+        syns.update([l.replace("_", " ") for l in lemmas if l != text_norm])
+    quick_syn = QUICK_SYN_NOUN.get(text_norm)
+    if quick_syn:
+        syns.add(quick_syn)
+    return list(syns)
 
 
 def similarityBetweenWords(word_one, word_two, metric):
@@ -67,7 +67,7 @@ SYM_TREE_POS_TAG = 'SYM'
 TO_TREE_POS_TAG = 'TO'
 UH_TREE_POS_TAG = 'UH'
 VB_TREE_POS_TAG = 'VB'
-VBD_TREE_POS_TAG = 'CBD'
+VBD_TREE_POS_TAG = 'VBD'
 VBG_TREE_POS_TAG = 'VBG'
 VBN_TREE_POS_TAG = 'VBN'
 VBP_TREE_POS_TAG = 'VBP'
@@ -1,7 +1,14 @@
+from NLP.util.TreeUtil import treeCopy
+from general_util import copyBuiltin
+
+
 class Annotation(object):
     """
     An annotated clause appearing in a user query.
     """
+    __slots__ = ('tree', 'lemma_tree', 'rawText', 'start', 'end', 'stem', 'inOntology', 'isSynonym', 'negated', 'text',
+                 'oc_type', 'extra')
+
     def __init__(self, rawText='', tree=None):
         """
         Annotation constructor.
@@ -93,11 +100,11 @@ class Annotation(object):
         :return: None; updates current instance
         """
         if type(d) is dict:
-            from nltk import ImmutableTree, Tree
+            from NLP.util.TreeUtil import treeFromString
             tree = d.get('tree')
             lemma = d.get('lemma_tree')
-            self.tree = ImmutableTree.fromstring(tree) if tree else None
-            self.lemma_tree = Tree.fromstring(lemma) if lemma else None
+            self.tree = treeFromString(tree, immutable=True) if tree else None
+            self.lemma_tree = treeFromString(lemma) if lemma else None
             self.rawText = d.get('rawText', '')
             self.start = d.get('start', -1)
             self.end = d.get('end', -1)
@@ -133,14 +140,8 @@ class Annotation(object):
 
     def copy(self):
         ann_copy = Annotation()
-        if self.tree:
-            ann_copy.tree = self.tree.copy()
-        else:
-            ann_copy.tree = None
-        if self.lemma_tree:
-            ann_copy.lemma_tree = self.lemma_tree.copy()
-        else:
-            ann_copy.lemma_tree = None
+        ann_copy.tree = treeCopy(self.tree)
+        ann_copy.lemma_tree = treeCopy(self.lemma_tree)
         ann_copy.rawText = self.rawText
         ann_copy.start = self.start
         ann_copy.end = self.end
@@ -156,16 +157,9 @@ class Annotation(object):
     __copy__ = copy
 
     def deepcopy(self):
-        import copy
         ann_copy = Annotation()
-        if self.tree:
-            ann_copy.tree = self.tree.copy(deep=True)
-        else:
-            ann_copy.tree = None
-        if self.lemma_tree:
-            ann_copy.lemma_tree = self.lemma_tree.copy(deep=True)
-        else:
-            ann_copy.lemma_tree = None
+        ann_copy.tree = treeCopy(self.tree, deep=True)
+        ann_copy.lemma_tree = treeCopy(self.lemma_tree, deep=True)
         ann_copy.rawText = self.rawText
         ann_copy.start = self.start
         ann_copy.end = self.end
@@ -174,8 +168,8 @@ class Annotation(object):
         ann_copy.isSynonym = self.isSynonym
         ann_copy.negated = self.negated
         ann_copy.text = self.text
-        ann_copy.oc_type = copy.deepcopy(self.oc_type)
-        ann_copy.extra = copy.deepcopy(self.extra)
+        ann_copy.oc_type = copyBuiltin(self.oc_type)
+        ann_copy.extra = copyBuiltin(self.extra)
         return ann_copy
 
     __deepcopy__ = deepcopy
@@ -0,0 +1,92 @@
+"""
+Compact binary encoding of Query and SuggestionPair instances, as stored in user sessions between dialogue rounds.
+
+An encoding holds the dictionary representation of an instance (to_dict) with each distinct parse tree stored once in
+a table and replaced by its index wherever it appears: the same trees are otherwise repeated in the query, its POCs,
+and the annotations of its semantic concepts and their ontology elements. Encodings start with a version header;
+those of other versions are rejected, so that a session stored by a former release is discarded instead of being
+misread. Parse trees are only parsed when decoded, and trees already parsed from the same string are reused (see
+NLP.util.TreeUtil.treeFromString).
+"""
+import copy
+import cPickle
+import struct
+
+CODEC_MAGIC = 'AQ'
+CODEC_VERSION = 1  # Increment whenever the layout of encodings, or of the to_dict representations, changes
+TREE_KEYS = ['tree', 'lemma_tree', 'pt']  # Dictionary keys holding a bracketed parse tree
+TREE_LIST_KEYS = ['modifiers']  # Dictionary keys holding a list of bracketed parse trees
+
+_header = struct.Struct('>2sB')
+
+
+def encodeModel(instance):
+    """
+    Encodes a Query or SuggestionPair instance
+    :param instance: Query or SuggestionPair instance
+    :return: string; binary encoding
+    """
+    trees = []
+    tree_ids = {}  # Key: bracketed tree; value: index in trees
+
+    def treeId(tree):
+        i = tree_ids.get(tree)
+        if i is None:
+            i = tree_ids[tree] = len(trees)
+            trees.append(tree)
+        return i
+
+    def intern(value):  # Returns a copy with trees replaced; to_dict representations may hold live attributes
+        if isinstance(value, dict):
+            interned = copy.copy(value)
+            for k, v in value.iteritems():
+                if k in TREE_KEYS and isinstance(v, basestring):
+                    interned[k] = treeId(v)
+                elif k in TREE_LIST_KEYS and isinstance(v, list):
+                    interned[k] = [treeId(t) for t in v]
+                elif isinstance(v, (dict, list)):
+                    interned[k] = intern(v)
+            return interned
+        elif isinstance(value, list):
+            return [intern(v) if isinstance(v, (dict, list)) else v for v in value]
+        return value
+
+    body = cPickle.dumps((trees, intern(instance.to_dict())), cPickle.HIGHEST_PROTOCOL)
+    return _header.pack(CODEC_MAGIC, CODEC_VERSION) + body
+
+
+def decodeModel(blob, instance):
+    """
+    Populates a Query or SuggestionPair instance from its encoding. Dictionary representations (from former sessions)
+    are accepted too.
+    :param blob: string; binary encoding given by encodeModel, or dict given by to_dict
+    :param instance: Query or SuggestionPair instance to populate
+    :return: the given instance, populated
+    """
+    if isinstance(blob, dict):
+        instance.from_dict(blob)
+        return instance
+    if not isinstance(blob, str) or len(blob) < _header.size:
+        raise ValueError('decodeModel: invalid encoding.')
+    magic, version = _header.unpack_from(blob)
+    if magic != CODEC_MAGIC or version != CODEC_VERSION:
+        raise ValueError('decodeModel: unsupported encoding version %s.' % version)
+    trees, d = cPickle.loads(blob[_header.size:])
+
+    def restore(value):  # Replaces tree indices in place
+        if isinstance(value, dict):
+            for k, v in value.iteritems():
+                if k in TREE_KEYS and isinstance(v, int):
+                    value[k] = trees[v]
+                elif k in TREE_LIST_KEYS and isinstance(v, list):
+                    value[k] = [trees[t] for t in v]
+                elif isinstance(v, (dict, list)):
+                    restore(v)
+        elif isinstance(value, list):
+            for v in value:
+                if isinstance(v, (dict, list)):
+                    restore(v)
+        return value
+
+    instance.from_dict(restore(d))
+    return instance
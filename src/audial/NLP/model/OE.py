@@ -2,6 +2,8 @@ from NLP.model.Annotation import *
 
 
 class OntologyElement(object):
+    __slots__ = ('uri', 'annotation', 'added', 'main_subject')
+
     def __init__(self):
         """
         Ontology Element (OE) constructor. An OE is a part of a user query that has an equivalent resource in the
@@ -93,6 +95,8 @@ class OntologyEntityElement(OntologyElement):
     """
     An ontology element underpinned by an ontology Class
     """
+    __slots__ = ('specificity',)
+
     def __init__(self):
         self.specificity = 0  # Specificity distance
         super(OntologyEntityElement, self).__init__()
@@ -160,6 +164,8 @@ class OntologyInstanceElement(OntologyElement):
     """
     An ontology element underpinned by one or more ontology instances of the same classes
     """
+    __slots__ = ('uris', 'classUris', 'classUri')
+
     def __init__(self):
         self.uris = []  # URIs of instances of the same class(es); this way they are all grouped under the same OE
         self.classUris = []  # URIs of the Classes the instance(s) belongs to
@@ -252,6 +258,8 @@ class OntologyObjectPropertyElement(OntologyElement):
     """
     An ontology element underpinned by an ontology object property
     """
+    __slots__ = ('domain', 'range', 'specificity_score', 'distance_score', 'reversed')
+
     def __init__(self):
         self.domain = []  # Domain of property
         self.range = []  # Range of property
@@ -348,6 +356,8 @@ class OntologyDatatypePropertyElement(OntologyElement):
     """
     An ontology element underpinned by an ontology datatype property
     """
+    __slots__ = ('domain', 'range', 'specificity_score', 'distance_score', 'governor', 'reversed')
+
     def __init__(self):
         self.domain = []  # Domain of property
         self.range = []  # Range of property
@@ -463,6 +473,8 @@ class OntologyLiteralElement(OntologyElement):
     """
     An ontology element underpinned by an ontology literal
     """
+    __slots__ = ('triples', 'is_user_label', 'is_axis_value')
+
     def __init__(self):
         # (SubjectURI, PropertyURI, LiteralURI) triples where this literal appears in the ontology (grouped by property)
         self.triples = []
@@ -555,6 +567,8 @@ class OntologyNoneElement(OntologyElement):
     """
     An ontology element not underpinned by any ontology resource
     """
+    __slots__ = ()
+
     def __init__(self):
         super(OntologyNoneElement, self).__init__()
 
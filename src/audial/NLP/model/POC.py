@@ -1,4 +1,4 @@
-from NLP.util.TreeUtil import immutableCopy
+from NLP.util.TreeUtil import immutableCopy, treeFromString, treeCopy
 from general_util import isNumber
 
 
@@ -6,6 +6,9 @@ class POC(object):
     """
     Potential Ontology Concept (POC) class
     """
+    __slots__ = ('tree', 'rawText', 'modifiers', 'head', 'numeric', 'start', 'end', 'start_original', 'end_original',
+                 'mainSubjectPriority')
+
     #  Main Subject Priorities
     MSUB_PRIORITY_MIN = 'min'
     MSUB_PRIORITY_MAX = 'max'
@@ -87,13 +90,12 @@ class POC(object):
         :return: None; updates current instance
         """
         if type(d) is dict:
-            from nltk import Tree
             tree = d.get('tree')
             if tree and tree != 'None':
-                self.tree = Tree.fromstring(tree)
+                self.tree = treeFromString(tree)
             self.rawText = d.get('rawText', '')
             modif = d.get('modifiers', [])
-            self.modifiers = [Tree.fromstring(m) for m in modif]
+            self.modifiers = [treeFromString(m) for m in modif]
             head_dict = d.get('head')
             if head_dict:
                 head = POC()
@@ -133,10 +135,7 @@ class POC(object):
 
     def copy(self):
         poc_copy = POC()
-        if self.tree:
-            poc_copy.tree = self.tree.copy()
-        else:
-            poc_copy.tree = None
+        poc_copy.tree = treeCopy(self.tree)
         poc_copy.rawText = self.rawText
         poc_copy.start = self.start
         poc_copy.start_original = self.start_original
@@ -145,17 +144,14 @@ class POC(object):
         poc_copy.numeric = self.numeric
         if self.head:
             poc_copy.head = self.head.copy()
-        poc_copy.modifiers = [m.copy() for m in self.modifiers]
+        poc_copy.modifiers = [treeCopy(m) for m in self.modifiers]
         return poc_copy
 
     __copy__ = copy
 
     def deepcopy(self):
         poc_copy = POC()
-        if self.tree:
-            poc_copy.tree = self.tree.copy(deep=True)
-        else:
-            poc_copy.tree = None
+        poc_copy.tree = treeCopy(self.tree, deep=True)
         poc_copy.rawText = self.rawText
         poc_copy.start = self.start
         poc_copy.start_original = self.start_original
@@ -164,7 +160,7 @@ class POC(object):
         poc_copy.numeric = self.numeric
         if self.head:
             poc_copy.head = self.head.deepcopy()
-        poc_copy.modifiers = [m.copy(deep=True) for m in self.modifiers]
+        poc_copy.modifiers = [treeCopy(m, deep=True) for m in self.modifiers]
         return poc_copy
 
     __deepcopy__ = deepcopy
@@ -147,8 +147,8 @@ class Query(object):
             self.tokens = [tuple(t) for t in tokens]
             pt = d.get('pt')
             if pt:
-                from nltk import Tree
-                self.pt = Tree.fromstring(pt)
+                from NLP.util.TreeUtil import treeFromString
+                self.pt = treeFromString(pt)
             else:
                 self.pt = None
             self.task = None
@@ -198,6 +198,36 @@ class QueryFilterCardinal(QueryFilter):
                             break
         return ast
 
+    def assertFilterValues(self, values):
+        """
+        Array version of assertFilter: returns which of the given values assert this filter
+        :param values: numpy.ndarray of float; NaN for missing values
+        :return: numpy.ndarray of bool; True where the value asserts this filter
+        """
+        import numpy as np
+        ast = np.zeros(len(values), dtype=bool)
+        if self.op and self.operands:
+            ast = ~np.isnan(values)
+            if self.op != self.CardinalFilter.SIM:
+                op = stringOpToPython(self.opToPython(), self.negate)
+                for o in self.operands:
+                    ast &= op(values, float(o))
+            else:
+                tol_p = self.sim_tol / 100.0
+                for v in self.operands:
+                    if isNumber(v):
+                        v = float(v)
+                        if abs(v) <= 10:
+                            upper_tol = v + 1.1
+                            lower_tol = v - 1.1
+                        else:
+                            upper_tol = v * (1 + tol_p)
+                            lower_tol = v * (1 - tol_p)
+                            if v < 0:
+                                upper_tol, lower_tol = lower_tol, upper_tol
+                        ast &= (values >= lower_tol) & (values <= upper_tol)
+        return ast
+
     def overlapsByOperator(self, other):
         """
         Returns whether the operator of the current instance overlaps the operator of the given filter. For example,
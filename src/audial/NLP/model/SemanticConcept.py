@@ -6,6 +6,8 @@ class SemanticConcept(object):
     Semantic Concepts are extended Ontology Concepts (OCs) belonging to a user's query i.e. elements of a query
     that appear in a supporting ontology with extra information required for the query's resolution.
     """
+    __slots__ = ('OE', 'verified', 'answer', 'score', 'task', 'id')
+
     def __init__(self):
         """
         Semantic Concept constructor
@@ -0,0 +1,131 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from nltk import Tree
+from ParserGuard import CircuitBreaker, ParserUnavailableException
+
+POOL_SIZE = 16  # Maximum number of keep-alive connections kept open to the CoreNLP service
+REQUEST_TIMEOUT = 60  # Default seconds to wait for the CoreNLP service to answer
+
+_clients = {}  # Key: service URL; value: CoreNLPClient instance
+_clients_lock = threading.Lock()
+
+
+class CoreNLPClient(object):
+    """
+    Client of a CoreNLP web service sharing a pool of keep-alive HTTP connections among all requests and threads.
+    Provides the tag() and raw_parse() methods of nltk's CoreNLPParser used by GraphNavStanfordParser, and
+    tagAndParse() to obtain both POS tags and the parse tree of a sentence with a single call to the service.
+    Calls that time out or fail on the service side raise ParserUnavailableException, and are skipped altogether
+    while the service is deemed unhealthy.
+    """
+    def __init__(self, url):
+        """
+        CoreNLPClient constructor
+        :param url: string; URL of the CoreNLP service, including credentials if needed
+        """
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.breaker = CircuitBreaker()
+
+    def annotate(self, text, properties, timeout=None):
+        """
+        Sends the given text to the CoreNLP service to be annotated
+        :param text: string; text to annotate
+        :param properties: dict; CoreNLP properties, e.g. the annotators to run
+        :param timeout: float; seconds to wait for each socket operation: connecting to the service, and each wait
+        for data from it. It does not bound the total time of the call. None for REQUEST_TIMEOUT
+        :return: dict; JSON response of the service
+        """
+        props = {'outputFormat': 'json'}
+        props.update(properties)
+        data = text.encode('utf8')  # Before the breaker is asked: an invalid text says nothing of the service
+        if not self.breaker.allow():
+            raise ParserUnavailableException("NLP service skipped: it has been failing recently.")
+        try:
+            response = self.session.post(self.url, params={'properties': json.dumps(props)},
+                                         data=data, timeout=timeout or REQUEST_TIMEOUT)
+            response.raise_for_status()
+            annotation = response.json()
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code >= 500:
+                self.breaker.failure()
+                raise ParserUnavailableException("NLP service failed: %s" % str(e))
+            self.breaker.success()  # The service is up; the request itself was wrong
+            raise
+        except requests.RequestException as e:  # Timeouts, connection errors...
+            self.breaker.failure()
+            raise ParserUnavailableException("NLP service did not answer in time: %s" % str(e))
+        except Exception:  # E.g. an invalid answer; a trial call must never leave the circuit half open
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+        return annotation
+
+    def tagAndParse(self, sentence, timeout=None):
+        """
+        Returns the POS tags and the parse tree of the given sentence, annotated in a single call to the service
+        :param sentence: string; the sentence to annotate
+        :param timeout: float; seconds to wait for each socket operation (see annotate); None for REQUEST_TIMEOUT
+        :return: (list<(string, string)>, nltk.Tree): (word, POS tag) pairs and parse tree of the sentence
+        """
+        data = self.annotate(sentence, {'annotators': 'tokenize,ssplit,pos,parse', 'ssplit.eolonly': 'true'},
+                             timeout)
+        tokens = []
+        tree = None
+        for s in data['sentences']:
+            tokens.extend((t['word'], t['pos']) for t in s['tokens'])
+            if tree is None:
+                tree = Tree.fromstring(s['parse'])
+        return tokens, tree
+
+    def tag(self, tokens, timeout=None):
+        """
+        Returns the POS tags of the given tokens
+        :param tokens: list<string>
+        :param timeout: float; seconds to wait for each socket operation (see annotate); None for REQUEST_TIMEOUT
+        :return: list<(string, string)>: (word, POS tag) pairs
+        """
+        data = self.annotate(' '.join(tokens), {'annotators': 'tokenize,ssplit,pos', 'ssplit.isOneSentence': 'true'},
+                             timeout)
+        return [(t['word'], t['pos']) for t in data['sentences'][0]['tokens']]
+
+    def raw_parse(self, sentence, timeout=None):
+        """
+        Returns the parse tree of the given sentence
+        :param sentence: string
+        :param timeout: float; seconds to wait for each socket operation (see annotate); None for REQUEST_TIMEOUT
+        :return: iterator<nltk.Tree>: the parse tree of the sentence, as returned by CoreNLPParser.raw_parse
+        """
+        data = self.annotate(sentence, {'annotators': 'tokenize,ssplit,pos,parse', 'ssplit.eolonly': 'true'},
+                             timeout)
+        return iter([Tree.fromstring(data['sentences'][0]['parse'])])
+
+
+def coreNLPClientOf(url):
+    """
+    Returns the shared client of the CoreNLP service at the given URL, creating it the first time
+    :param url: string; URL of the CoreNLP service
+    :return: CoreNLPClient instance
+    """
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = CoreNLPClient(url)
+            _clients[url] = client
+        return client
+
+
+def serviceStates():
+    """
+    Returns the health of every CoreNLP service a client has been created for
+    :return: dict<string, string>: for each service host (credentials left out), the state of its circuit breaker
+    """
+    import urlparse
+    with _clients_lock:
+        clients = list(_clients.values())
+    return dict((urlparse.urlparse(client.url).netloc.rsplit('@', 1)[-1], client.breaker.state) for client in clients)
@@ -0,0 +1,202 @@
+import re
+import threading
+from nltk import Tree, RegexpParser, RegexpTagger
+from nltk.tokenize import TreebankWordTokenizer
+from NLP.constants import *
+
+_parser = None  # Process-wide OfflineParser instance
+_parser_lock = threading.Lock()
+
+# Closed-class and query words, tagged as the Stanford tagger does; used when no trained tagger is available
+LEXICON = {
+    DT_TREE_POS_TAG: ['the', 'a', 'an', 'this', 'that', 'these', 'those', 'all', 'each', 'every', 'some', 'any', 'no',
+                      'both', 'either', 'neither', 'another'],
+    PRP_TREE_POS_TAG: ['i', 'me', 'you', 'he', 'him', 'she', 'her', 'it', 'we', 'us', 'they', 'them'],
+    PRPDOLLAR_TREE_POS_TAG: ['my', 'your', 'his', 'its', 'our', 'their'],
+    WP_TREE_POS_TAG: ['what', 'who', 'whom'],
+    WPDOLLAR_TREE_POS_TAG: ['whose'],
+    WDT_TREE_POS_TAG: ['which', 'whatever'],
+    WRB_TREE_POS_TAG: ['how', 'where', 'when', 'why'],
+    IN_TREE_POS_TAG: ['in', 'of', 'on', 'at', 'for', 'from', 'with', 'by', 'about', 'between', 'during', 'before',
+                      'after', 'over', 'under', 'above', 'below', 'than', 'into', 'per', 'since', 'until', 'within',
+                      'without', 'through', 'across', 'against', 'among', 'besides', 'except', 'like', 'near',
+                      'around', 'if', 'whether', 'excluding', 'barring', 'outside'],
+    TO_TREE_POS_TAG: ['to'],
+    CC_TREE_POS_TAG: ['and', 'or', 'but', 'nor'],
+    MD_TREE_POS_TAG: ['can', 'could', 'will', 'would', 'shall', 'should', 'may', 'might', 'must'],
+    VBZ_TREE_POS_TAG: ['is', 'has', 'does', "'s"],
+    VBP_TREE_POS_TAG: ['are', 'have', 'do', 'am', "'re"],
+    VBD_TREE_POS_TAG: ['was', 'were', 'had', 'did'],
+    VBN_TREE_POS_TAG: ['been'],
+    VB_TREE_POS_TAG: ['be', 'show', 'give', 'tell', 'list', 'sort', 'compare', 'go', 'move', 'count', 'find',
+                      'compute', 'calculate', 'set', 'get', 'return', 'display', 'read', 'navigate', 'proceed',
+                      'rank', 'order', 'filter', 'say', 'output', 'fetch', 'apply', 'describe', 'summarize', 'add',
+                      'subtract', 'divide', 'exclude', 'omit', 'leave', 'mark', 'tag', 'label', 'select'],
+    EX_TREE_POS_TAG: ['there'],
+    RB_TREE_POS_TAG: ['not', "n't", 'also', 'very', 'only', 'just', 'approximately', 'roughly', 'exactly', 'again',
+                      'back', 'here', 'now', 'then', 'currently'],
+    JJR_TREE_POS_TAG: ['higher', 'greater', 'bigger', 'larger', 'lower', 'smaller', 'older', 'younger', 'more',
+                       'less', 'fewer', 'better', 'worse'],
+    JJS_TREE_POS_TAG: ['highest', 'greatest', 'biggest', 'largest', 'lowest', 'smallest', 'oldest', 'youngest',
+                       'most', 'least', 'fewest', 'best', 'worst'],
+    JJ_TREE_POS_TAG: ['many', 'much', 'same', 'equal', 'identical', 'next', 'previous', 'first', 'last', 'current',
+                      'approximate', 'other', 'total'],
+    CD_TREE_POS_TAG: ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten', 'eleven',
+                      'twelve', 'twenty', 'thirty', 'forty', 'fifty', 'hundred', 'thousand', 'million', 'billion'],
+}
+
+# Open-class words not in the lexicon, by their form
+SUFFIX_PATTERNS = [
+    (r'^-?\d+([.,]\d+)*%?$', CD_TREE_POS_TAG),
+    (r'.+ing$', VBG_TREE_POS_TAG),
+    (r'.+ed$', VBD_TREE_POS_TAG),
+    (r'.+ly$', RB_TREE_POS_TAG),
+    (r'.+est$', JJS_TREE_POS_TAG),
+    (r'.+ss$', NN_TREE_POS_TAG),
+    (r'.+s$', NNS_TREE_POS_TAG),
+    (r'.*', NN_TREE_POS_TAG),
+]
+
+AUXILIARY_TAGS = [VBZ_TREE_POS_TAG, VBP_TREE_POS_TAG, VBD_TREE_POS_TAG, MD_TREE_POS_TAG]  # Verbs opening questions
+
+# Cascaded chunk grammar building Penn Treebank phrases, in the shape produced by the Stanford parser for queries
+GRAMMAR = r"""
+    QP: {<RB|IN>?<JJR|RBR><IN><CD>}<NN.*>
+        {<IN><JJS><CD>}
+        {<RB><CD>}
+    WHADJP: {<WRB><JJ|RB>}
+    WHNP: {<WHADJP><JJ.*|NN.*>*}
+          {<WDT|WP|WP\$><JJ.*|NN.*>*}
+    WHADVP: {<WRB>}
+    NP: {<DT|PRP\$>?<QP|CD>?<JJ.*|VBN|VBG>*<NN.*>+<CD>?}
+        {<DT|PRP\$>?<JJS><CD>?}
+        {<QP|CD>+}
+        {<PRP>}
+    PP: {<IN|TO><NP|QP>}
+    NP: {<NP><PP>}
+    ADJP: {<RB.*>?<JJ.*|RBR><PP>}
+    VP: {<MD>?<VB.*>+<RP>?}
+"""
+
+
+class OfflineParser(object):
+    """
+    In-process POS tagger and parser of user queries. Tags with nltk's averaged perceptron tagger if its model is
+    installed, or with a built-in lexicon of query words otherwise, and builds nltk.Tree parse trees with Penn
+    Treebank labels by chunking the tags with a cascaded grammar. Provides the same tagging and parsing methods as
+    CoreNLPClient.
+    """
+    def __init__(self):
+        """
+        OfflineParser constructor; loads the tagger and compiles the chunk grammar
+        """
+        self.tokenizer = TreebankWordTokenizer()
+        self.tagger = self.__loadTagger()
+        self.chunker = RegexpParser(GRAMMAR)
+
+    def __loadTagger(self):
+        """
+        Loads the best available tagger
+        :return: nltk tagger instance
+        """
+        try:
+            from nltk.tag.perceptron import PerceptronTagger
+            return PerceptronTagger()
+        except LookupError:  # Tagger model not installed
+            lexicon = []
+            for tag, words in LEXICON.iteritems():
+                lexicon.extend(('^%s$' % re.escape(w), tag) for w in words)
+            return RegexpTagger(lexicon + SUFFIX_PATTERNS)
+
+    def tokenize(self, sentence):
+        """
+        Splits a sentence into tokens as the Stanford tokenizer does (e.g. "isn't" -> "is", "n't")
+        :param sentence: string
+        :return: list<string>
+        """
+        return self.tokenizer.tokenize(sentence)
+
+    def tag(self, tokens):
+        """
+        Returns the POS tags of the given tokens
+        :param tokens: list<string>
+        :return: list<(string, string)>: (word, POS tag) pairs
+        """
+        return self.tagger.tag(tokens)
+
+    def tagAndParse(self, sentence, timeout=None):
+        """
+        Returns the POS tags and the parse tree of the given sentence
+        :param sentence: string; the sentence to parse
+        :param timeout: ignored; parsing is done in-process
+        :return: (list<(string, string)>, nltk.Tree): (word, POS tag) pairs and parse tree of the sentence
+        """
+        tokens = self.tag(self.tokenize(sentence))
+        return tokens, self.treeOfTags(tokens)
+
+    def raw_parse(self, sentence):
+        """
+        Returns the parse tree of the given sentence
+        :param sentence: string
+        :return: iterator<nltk.Tree>: the parse tree of the sentence, as returned by CoreNLPParser.raw_parse
+        """
+        return iter([self.tagAndParse(sentence)[1]])
+
+    def treeOfTags(self, tokens):
+        """
+        Builds the parse tree of a tagged sentence
+        :param tokens: list<(string, string)>: (word, POS tag) pairs
+        :return: nltk.Tree with a ROOT label
+        """
+        if not tokens:
+            return Tree(ROOT_TREE_POS_TAG, [])
+        chunked = self.chunker.parse(tokens)
+        children = [self.__toTree(child) for child in chunked]
+        labels = [child.label() for child in children]
+        if labels[0].startswith('WH'):
+            clause = [children[0]]
+            if len(children) > 1:
+                clause.append(Tree(SQ_TREE_POS_TAG, self.__spliceAuxiliaries(children[1:])))
+            top = Tree(SBARQ_TREE_POS_TAG, clause)
+        elif len(children) > 1 and labels[0] == VP_TREE_POS_TAG and children[0][0].label() in AUXILIARY_TAGS:
+            top = Tree(SQ_TREE_POS_TAG, self.__spliceAuxiliaries(children))  # Yes/no question
+        elif VP_TREE_POS_TAG in labels:
+            top = Tree(S_TREE_POS_TAG, children)
+        elif len(children) == 1 and labels[0] == NP_TREE_POS_TAG:
+            top = children[0]
+        else:
+            top = Tree(NP_TREE_POS_TAG, children)
+        return Tree(ROOT_TREE_POS_TAG, [top])
+
+    def __spliceAuxiliaries(self, children):
+        """
+        Replaces verb phrases made up of a lone auxiliary verb by the verb itself, as the Stanford parser places
+        auxiliaries directly under questions (e.g. (SQ (VBZ is) (NP ...)))
+        :param children: list<nltk.Tree>; children of a question clause
+        :return: list<nltk.Tree>
+        """
+        return [c[0] if c.label() == VP_TREE_POS_TAG and len(c) == 1 and c[0].label() in AUXILIARY_TAGS else c
+                for c in children]
+
+    def __toTree(self, node):
+        """
+        Converts a node of a chunked sentence to a tree; tagged words become pre-terminal trees
+        :param node: nltk.Tree or (string, string)
+        :return: nltk.Tree
+        """
+        if isinstance(node, Tree):
+            return Tree(node.label(), [self.__toTree(child) for child in node])
+        word, tag = node
+        return Tree(tag, [word])
+
+
+def offlineParserOf():
+    """
+    Returns the process-wide offline parser, loading it the first time
+    :return: OfflineParser instance
+    """
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            _parser = OfflineParser()
+        return _parser
@@ -0,0 +1,269 @@
+"""
+Process-wide cache of the parses (POS tags and parse tree) of user queries, so that a query already asked by any
+session is not sent to the parser again. Parses are kept in a bounded in-memory LRU and in a store on disk, one file
+per query, which survives restarts and is pruned of parses not used for a while.
+"""
+import errno
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from nltk import Tree
+
+MEMORY_SIZE = 1024  # Maximum number of parses kept in memory
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')  # Directory of the on-disk parse store
+DISK_SIZE = 10000  # Maximum number of parses kept on disk; the least recently used ones are removed beyond it
+DISK_MAX_AGE = 30 * 24 * 3600  # Seconds after which a parse on disk not used since is discarded
+PRUNE_INTERVAL = 100  # Number of parses written to disk between two prunings of the on-disk store
+
+_cache = None  # Process-wide ParseCache instance
+_cache_lock = threading.Lock()
+
+
+class _InFlight(object):
+    """
+    A parse being computed by one thread on behalf of all threads requesting the same query
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None  # Serialized parse, once computed
+        self.error = None  # Exception raised while computing the parse, if any
+
+
+class ParseCache(object):
+    """
+    Two-level (in-memory LRU and on-disk, bounded in size and age) cache of the POS tags and parse trees of normalized
+    user queries.
+    Concurrent requests of the same uncached query are coalesced into a single call to the parser. Parses in memory
+    can also be looked up by the gist of their query (see similar()), e.g. when the parser is unavailable.
+    """
+    def __init__(self, size=MEMORY_SIZE, path=CACHE_DIR, disk_size=DISK_SIZE, max_age=DISK_MAX_AGE):
+        """
+        ParseCache constructor
+        :param size: int; maximum number of parses kept in memory
+        :param path: string; directory of the on-disk store; None to keep parses in memory only
+        :param disk_size: int; maximum number of parses kept on disk
+        :param max_age: float; seconds after which a parse on disk not used since is discarded
+        """
+        self.size = size
+        self.path = path
+        self.disk_size = disk_size
+        self.max_age = max_age
+        self.stored = 0  # Parses written to disk since the on-disk store was last pruned
+        self.memory = OrderedDict()  # Key: cache key; value: serialized parse. Least recently used first
+        self.in_flight = {}  # Key: cache key; value: _InFlight instance
+        self.gists = {}  # Key: hashed query gist; value: cache key of the last parse in memory with that gist
+        self.gist_of = {}  # Key: cache key of a parse in memory; value: hashed gist of its query
+        self.lock = threading.Lock()
+        self.stats = {'memory': 0, 'disk': 0, 'coalesced': 0, 'parsed': 0, 'similar': 0}  # Parses by origin
+
+    def get(self, key, parse, gist=None):
+        """
+        Returns the POS tags and parse tree of a query, calling the given parse function only if they are not cached
+        :param key: tuple<string>; identifies the backend parsing the query and the query itself, which must be its
+        last item, e.g. (parser, tagger, query)
+        :param parse: function returning the (POS tags, parse tree) of the query
+        :param gist: tuple<string>; key under which the parse can be found by similar(); None to skip
+        :return: (list<(string, string)>, nltk.Tree): (word, POS tag) pairs and parse tree of the query
+        """
+        digest = self.__digest(key)
+        with self.lock:
+            value = self.memory.pop(digest, None)
+            if value is not None:
+                self.memory[digest] = value
+                self.stats['memory'] += 1
+                return self.__deserialize(value)
+            flight = self.in_flight.get(digest)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[digest] = _InFlight()
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return self.__deserialize(flight.value)
+        origin = None
+        try:
+            value = self.__load(digest)
+            if value is None:
+                tokens, tree = parse()
+                value = self.__serialize(key[-1], tokens, tree)
+                self.__store(digest, value)
+                origin = 'parsed'
+            else:
+                origin = 'disk'
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                if origin is None and flight.error is None:
+                    flight.error = Exception("Parse of query interrupted.")
+                if origin is not None:
+                    self.memory[digest] = flight.value
+                    self.stats[origin] += 1
+                    if gist is not None:
+                        gist_digest = self.__digest(gist)
+                        self.gists[gist_digest] = digest
+                        self.gist_of[digest] = gist_digest
+                    while len(self.memory) > self.size:
+                        evicted, _ = self.memory.popitem(last=False)
+                        gist_digest = self.gist_of.pop(evicted, None)
+                        if gist_digest is not None and self.gists.get(gist_digest) == evicted:
+                            del self.gists[gist_digest]
+                del self.in_flight[digest]
+            flight.done.set()
+        return self.__deserialize(value)
+
+    def similar(self, gist):
+        """
+        Returns the most recent parse in memory of a query with the given gist, without calling any parser
+        :param gist: tuple<string>; gist key given to get()
+        :return: (string, list<(string, string)>, nltk.Tree): the parsed query, its (word, POS tag) pairs and its
+        parse tree; None if not found
+        """
+        with self.lock:
+            value = self.memory.get(self.gists.get(self.__digest(gist)))
+            if value is None or 'query' not in value:
+                return None
+            self.stats['similar'] += 1
+        tokens, tree = self.__deserialize(value)
+        return value['query'], tokens, tree
+
+    def clear(self):
+        """
+        Removes all parses from memory; the on-disk store is kept
+        :return: None
+        """
+        with self.lock:
+            self.memory.clear()
+            self.gists.clear()
+            self.gist_of.clear()
+
+    def __digest(self, key):
+        """
+        Hashes a cache or gist key
+        :param key: tuple<string>
+        :return: string
+        """
+        return hashlib.sha1(json.dumps(key)).hexdigest()
+
+    def __serialize(self, query, tokens, tree):
+        """
+        Converts a parse to an equivalent dictionary of builtins
+        :param query: string; the parsed query
+        :param tokens: list<(string, string)>; (word, POS tag) pairs
+        :param tree: nltk.Tree; parse tree
+        :return: dict
+        """
+        pt = unicode(tree) if tree is not None else None  # str() would transliterate non-ASCII leaves
+        return {'query': query, 'tokens': [list(t) for t in tokens], 'pt': pt}
+
+    def __deserialize(self, value):
+        """
+        Builds a new parse from its serialized form, so that callers can modify it freely
+        :param value: dict
+        :return: (list<(string, string)>, nltk.Tree)
+        """
+        tree = Tree.fromstring(value['pt']) if value['pt'] else None
+        return [tuple(t) for t in value['tokens']], tree
+
+    def __filePath(self, digest):
+        """
+        Returns the path of the file storing the parse with the given hashed key
+        :param digest: string; hashed cache key
+        :return: string
+        """
+        return os.path.join(self.path, '%s.json' % digest)
+
+    def __load(self, digest):
+        """
+        Loads a serialized parse from the on-disk store
+        :param digest: string; hashed cache key
+        :return: dict; None if not found
+        """
+        if not self.path:
+            return None
+        file_path = self.__filePath(digest)
+        try:
+            if time.time() - os.path.getmtime(file_path) > self.max_age:
+                return None
+            with open(file_path, 'r') as f:
+                value = json.load(f)
+            os.utime(file_path, None)  # Modification times order parses by last use, see __prune
+            return value
+        except (IOError, OSError, ValueError):
+            return None
+
+    def __store(self, digest, value):
+        """
+        Writes a serialized parse to the on-disk store; failures are ignored as the store is just a cache
+        :param digest: string; hashed cache key
+        :param value: dict; serialized parse
+        :return: None
+        """
+        if not self.path:
+            return
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                return
+        file_path = self.__filePath(digest)
+        tmp_path = '%s.%d.%d.tmp' % (file_path, os.getpid(), threading.current_thread().ident)
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(value, f)
+            os.rename(tmp_path, file_path)  # Atomic: readers never see a partially written parse
+        except (IOError, OSError):
+            return
+        with self.lock:
+            self.stored += 1
+            prune = self.stored >= PRUNE_INTERVAL
+            if prune:
+                self.stored = 0
+        if prune:
+            self.__prune()
+
+    def __prune(self):
+        """
+        Removes the parses on disk not used within the maximum age, and the least recently used ones beyond the
+        maximum number of parses on disk
+        :return: None
+        """
+        try:
+            names = [n for n in os.listdir(self.path) if n.endswith('.json')]
+        except OSError:
+            return
+        entries = []
+        for n in names:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.path, n)), n))
+            except OSError:
+                pass
+        entries.sort(reverse=True)  # Most recently used first
+        oldest = time.time() - self.max_age
+        for i, (mtime, n) in enumerate(entries):
+            if i >= self.disk_size or mtime < oldest:
+                try:
+                    os.remove(os.path.join(self.path, n))
+                except OSError:
+                    pass
+
+
+def parseCacheOf():
+    """
+    Returns the process-wide parse cache, creating it the first time
+    :return: ParseCache instance
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ParseCache()
+        return _cache
@@ -0,0 +1,91 @@
+import threading
+import time
+
+FAILURE_THRESHOLD = 3  # Consecutive failures of the parser service after which it is deemed unhealthy
+RESET_TIMEOUT = 30  # Seconds to skip an unhealthy parser service before trying it again
+
+_paths = {}  # Key: name of the path that answered a query; value: number of queries answered
+_paths_lock = threading.Lock()
+
+
+class ParserUnavailableException(Exception):
+    """
+    Custom exception: the NL parser service did not answer in time, failed, or is being skipped as unhealthy
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Tracks the health of a remote service. After FAILURE_THRESHOLD consecutive failures the circuit opens and calls
+    to the service are skipped; after RESET_TIMEOUT seconds a single trial call is allowed, which closes the circuit
+    again if it succeeds.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        """
+        CircuitBreaker constructor
+        :param failure_threshold: int; consecutive failures after which the circuit opens
+        :param reset_timeout: float; seconds the circuit stays open before a trial call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = 0  # Time the circuit was last opened
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns whether the service may be called now
+        :return: boolean
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN  # Let this call through as a trial; others keep being skipped
+                return True
+            return False
+
+    def success(self):
+        """
+        Records a successful call to the service
+        :return: None
+        """
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        """
+        Records a failed call to the service
+        :return: None
+        """
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+
+def recordAnswerPath(path):
+    """
+    Records which path answered a user query
+    :param path: string; e.g. 'command', 'parser', 'parse_cache', 'similar_parse', 'simple_pipeline'
+    :return: None
+    """
+    with _paths_lock:
+        _paths[path] = _paths.get(path, 0) + 1
+
+
+def answerPathStatistics():
+    """
+    Returns the number of queries answered by each path
+    :return: dict<string, int>
+    """
+    with _paths_lock:
+        return dict(_paths)
@@ -1,6 +1,9 @@
 from nltk.tag.stanford import StanfordPOSTagger
 from nltk.parse.stanford import StanfordParser
-from nltk.parse import CoreNLPParser
+from CoreNLPClient import coreNLPClientOf
+from OfflineParser import offlineParserOf
+from ParseCache import parseCacheOf
+from ParserGuard import ParserUnavailableException
 from nltk.internals import find_jars_within_path
 from nltk import Tree
 import os
@@ -9,17 +12,29 @@ from NLP.poc.POCCreator import *
 
 
 class GraphNavStanfordParser(object):
-    def __init__(self, NLquery=None, parser='stanford', posTagger='stanford'):
+    FILLER_WORDS = set(['the', 'a', 'an', 'please'])  # Words left out of query gists
+
+    def __init__(self, NLquery=None, parser='stanford', posTagger='stanford', deadline=None, endpoint=None):
         """
         Instantiate a POS tagger and NL parser.
         :param NLquery: string; input NL query (optional)
-        :param parser: parser to be loaded. Either 'stanford' (local library) or 'stanford_web' (web service)
-        :param posTagger: POS-tagger to be loaded. Either 'stanford' (local library) or 'stanford_web' (web service)
+        :param parser: parser to be loaded. Either 'stanford' (local library), 'stanford_web' (web service) or 'nltk'
+        (in-process OfflineParser)
+        :param posTagger: POS-tagger to be loaded. Either 'stanford' (local library), 'stanford_web' (web service) or
+        'nltk' (in-process OfflineParser)
+        :param deadline: float; seconds to wait for the web service on each socket operation (connecting, and each
+        wait for data) when tagging or parsing a query, not for the whole call; None for the default timeout of
+        CoreNLPClient
+        :param endpoint: string; URL of the web service; None for the one given in NLP/parser/config.py
         """
         self.rawQuery = ""  # Unprocessed query
         self.normalizedFullQuery = ""  # Normalized query
         self.PT = None  # POS Tagger
         self.parser = None  # Grammar parser
+        self.backend = (parser, posTagger)  # Names of the parser and POS tagger, part of the parse cache keys
+        self.deadline = deadline
+        self.endpoint = endpoint
+        self.source = None  # Where the last parse came from: 'parser', 'parse_cache' or 'similar_parse'
         if NLquery:
             self.rawQuery = NLquery
             self.normalizedFullQuery = self.__normalizeQuery(NLquery)
@@ -30,13 +45,17 @@ class GraphNavStanfordParser(object):
             if posTagger == 'stanford':
                 self.PT = self._loadStanfordPOSTagger()
             elif posTagger == 'stanford_web':
-                self.PT = CoreNLPParser(url=self.__serviceEndpointWithAuth(), tagtype='pos')
+                self.PT = coreNLPClientOf(self.__serviceEndpointWithAuth())
+            elif posTagger == 'nltk':
+                self.PT = offlineParserOf()
             # No else; PT will default to nltk's default pos-tagger
 
             if parser == 'stanford':
                 self.parser = self._loadStanfordParser()
             elif parser == 'stanford_web':
-                self.parser = CoreNLPParser(url=self.__serviceEndpointWithAuth())
+                self.parser = coreNLPClientOf(self.__serviceEndpointWithAuth())
+            elif parser == 'nltk':
+                self.parser = offlineParserOf()
             else:
                 raise ValueError('GraphNavStanfordParser: unknown parser %s' % parser)
         except ImportError as e:
@@ -54,7 +73,9 @@ class GraphNavStanfordParser(object):
         if not q:
             q = self.normalizedFullQuery
         tree = None
-        if self.PT:
+        if self.backend[1] == 'stanford_web':
+            tree = self.PT.tag(q.split(), self.deadline)
+        elif self.PT:
             tree = self.PT.tag(q.split())
         else:
             # Fall back to NLTK's default tagger
@@ -71,12 +92,27 @@ class GraphNavStanfordParser(object):
         if not q:
             q = self.normalizedFullQuery
         tree = None
-        if self.parser:
+        if self.backend[0] == 'stanford_web':
+            tree = list(self.parser.raw_parse(q, self.deadline))[0]
+        elif self.parser:
             tree = list(self.parser.raw_parse(q))[0]
         else:
             raise SystemError("No parser loaded in NLHandler.")
         return tree
 
+    def posAndParseTree(self, q):
+        """
+        Returns both the Part-of-Speech tree and the syntax parse tree of the given query. If the same web service
+        or in-process parser is used as POS tagger and parser, both are obtained from a single call to it.
+        @param q: the NL query
+        @return (array, array): POS Tree and Parse Tree of q
+        """
+        if not q:
+            q = self.normalizedFullQuery
+        if self.PT is not None and self.PT is self.parser:
+            return self.parser.tagAndParse(q, self.deadline)
+        return self.posTree(q), self.parseTree(q)
+
     def isBOW(self, posTags):
         """
         Returns whether the given POS tree represents
@@ -106,9 +142,25 @@ class GraphNavStanfordParser(object):
         if not user_query:
             return "Please enter a question"
         clean_query = self.__normalizeQuery(user_query)
+        cache = parseCacheOf()
+        gist = self.backend + (self.__queryGist(clean_query),)
+        parsed = []
+
+        def parse():
+            parsed.append(True)
+            return self.posAndParseTree(clean_query)
+        try:
+            tokens, pt = cache.get(self.backend + (clean_query,), parse, gist)
+            self.source = 'parser' if parsed else 'parse_cache'
+        except ParserUnavailableException:
+            #  Fall back to a recent parse of a query differing only in filler words, if any
+            similar = cache.similar(gist)
+            if similar is None:
+                raise
+            clean_query, tokens, pt = similar
+            self.source = 'similar_parse'
         query = Query(clean_query)
-        query.tokens = self.posTree(clean_query)
-        query.pt = self.parseTree(clean_query)
+        query.tokens, query.pt = tokens, pt
         poc_creator = POCCreator(query)
         poc_creator.generatePOCs()
         self.findFocus(query)
@@ -203,6 +255,14 @@ class GraphNavStanfordParser(object):
                 nq = nq.replace(rem, "")
         return nq
 
+    def __queryGist(self, q):
+        """
+        Returns the gist of a normalized query: its words without filler words
+        @param q: the normalized NL query
+        @return string: the gist of the query
+        """
+        return ' '.join(w for w in q.split() if w not in self.FILLER_WORDS)
+
     def _loadStanfordPOSTagger(self):
         """
         Loads the local Stanford POS Tagger (warning: deprecated)
@@ -237,6 +297,8 @@ class GraphNavStanfordParser(object):
         Add access credentials to the NLP service URL and return it
         :return: string; Stanford NLP service endpoint URL with added user/password information
         """
+        if self.endpoint:
+            return self.endpoint
         from config import STANFORD_WEB_ENDPOINT, STANFORD_WEB_USER, STANFORD_WEB_PWD, STANFORD_WEB_PROTOCOL
         if STANFORD_WEB_USER and STANFORD_WEB_PWD:
             url = STANFORD_WEB_PROTOCOL + "://" + STANFORD_WEB_USER + ":" + STANFORD_WEB_PWD + "@" + \
@@ -0,0 +1,189 @@
+"""
+Cache of the WordNet synonyms of words. Synonyms of the vocabulary of each chart (label texts, task verbalizations,
+class and property names) are computed offline and stored in a synonym table next to the chart's RDF file, e.g.:
+    python -m NLP.util.SynonymCache static/graphics/energy.rdf
+Tables are loaded when the application starts; synonyms of any other word are kept in a bounded in-memory LRU.
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 4096  # Maximum number of words whose synonyms are kept in memory, besides those in synonym tables
+TABLE_VERSION = 1  # Increment whenever the layout of synonym tables changes
+POS_TAGS = [None, 'n', 'v', 'a', 'r']  # WordNet part-of-speech tags synonyms are looked up with: any, noun, verb...
+
+_cache = None  # Process-wide SynonymCache instance
+_cache_lock = threading.Lock()
+
+
+def synonymKey(word, pos_tag):
+    """
+    Returns the key of a word's synonyms in caches and synonym tables
+    :param word: string; normalized word, as looked up in WordNet
+    :param pos_tag: string; WordNet part-of-speech tag, None for all
+    :return: string
+    """
+    return u'%s|%s' % (word, pos_tag or '')
+
+
+class SynonymCache(object):
+    """
+    Thread-safe cache of the synonyms of words: an LRU of the words looked up at run time, on top of the synonym
+    tables of the charts, which are never evicted
+    """
+    def __init__(self, size=CACHE_SIZE):
+        """
+        SynonymCache constructor
+        :param size: int; maximum number of words kept in the LRU
+        """
+        self.size = size
+        self.memory = OrderedDict()  # Key: synonymKey; value: list<string>. Least recently used first
+        self.table = {}  # Key: synonymKey; value: list<string>. Entries of all synonym tables loaded
+        self.tables = set()  # Paths of the synonym tables loaded
+        self.lock = threading.Lock()
+        self.stats = {'table': 0, 'memory': 0, 'computed': 0}  # Lookups by origin of their result
+
+    def get(self, word, pos_tag, compute):
+        """
+        Returns the synonyms of a word, computing them only if they are not cached
+        :param word: string; normalized word
+        :param pos_tag: string; WordNet part-of-speech tag, None for all
+        :param compute: function returning the list of synonyms of the word
+        :return: list<string>; callers must not modify it
+        """
+        key = synonymKey(word, pos_tag)
+        with self.lock:
+            syns = self.table.get(key)
+            if syns is not None:
+                self.stats['table'] += 1
+                return syns
+            syns = self.memory.pop(key, None)
+            if syns is not None:
+                self.memory[key] = syns
+                self.stats['memory'] += 1
+                return syns
+        syns = compute()  # Outside the lock: WordNet lookups are slow, and computing twice is harmless
+        with self.lock:
+            self.memory[key] = syns
+            self.stats['computed'] += 1
+            while len(self.memory) > self.size:
+                self.memory.popitem(last=False)
+        return syns
+
+    def loadTable(self, path):
+        """
+        Loads a synonym table, once
+        :param path: string; path to the synonym table
+        :return: boolean; whether the table was loaded (False if not found, invalid or already loaded)
+        """
+        with self.lock:
+            if path in self.tables:
+                return False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return False
+        if data.get('version') != TABLE_VERSION:
+            return False
+        with self.lock:
+            self.table.update(data['synonyms'])
+            self.tables.add(path)
+        return True
+
+    def clear(self):
+        """
+        Removes all words from the LRU; synonym tables are kept
+        :return: None
+        """
+        with self.lock:
+            self.memory.clear()
+
+
+def synonymCacheOf():
+    """
+    Returns the process-wide synonym cache, creating it the first time
+    :return: SynonymCache instance
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SynonymCache()
+        return _cache
+
+
+def synonymTablePathOf(source):
+    """
+    Returns the path of the synonym table of a chart
+    :param source: string; path to the RDF file of the chart
+    :return: string
+    """
+    return '%s.synonyms.json' % os.path.splitext(source)[0]
+
+
+def loadChartSynonyms(source):
+    """
+    Loads the synonym table of a chart into the process-wide cache, if it has been built
+    :param source: string; path to the RDF file of the chart
+    :return: boolean; whether the table was loaded
+    """
+    return synonymCacheOf().loadTable(synonymTablePathOf(source))
+
+
+def chartVocabulary(graph):
+    """
+    Returns the words of a chart users are likely to refer to
+    :param graph: rdflib.Graph instance with the chart's triples
+    :return: set<unicode>: label texts, task verbalizations, and names of classes and properties
+    """
+    from rdflib import RDF, URIRef, Literal
+    import const as c
+    words = set()
+    for p in ['has_text', 'task_has_verbalization']:
+        for text in graph.objects(None, URIRef("%s#%s" % (c.VIS_NS, p))):
+            if isinstance(text, Literal):
+                words.add(unicode(text))
+    for owl_class in ['Class', 'ObjectProperty', 'DatatypeProperty']:
+        for s in graph.subjects(RDF.type, URIRef("%s#%s" % (c.OWL_NS, owl_class))):
+            if isinstance(s, URIRef) and '#' in s:
+                words.add(s.rsplit('#', 1)[1].replace('_', ' '))
+    return set(w.strip() for w in words if w.strip())
+
+
+def buildSynonymTable(words, path):
+    """
+    Computes the synonyms of the given words for all WordNet parts of speech and writes them as a synonym table
+    :param words: iterable<string>
+    :param path: string; path to the synonym table to write
+    :return: int; number of entries in the table
+    """
+    from NLP.NLHandler import wordnetSynonyms
+    synonyms = {}
+    for word in words:
+        text_norm = word.replace(" ", "_").lower()
+        for pos_tag in POS_TAGS:
+            synonyms[synonymKey(text_norm, pos_tag)] = wordnetSynonyms(text_norm, pos_tag)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': TABLE_VERSION, 'synonyms': synonyms}, f)
+    os.rename(tmp_path, path)  # Atomic: a running application never loads a partially written table
+    return len(synonyms)
+
+
+def main():
+    args = argparse.ArgumentParser(description="Builds the synonym table of charts.")
+    args.add_argument('charts', nargs='+', help="RDF files of the charts")
+    opts = args.parse_args()
+    from rdflib import ConjunctiveGraph
+    for source in opts.charts:
+        graph = ConjunctiveGraph()
+        graph.load(source)
+        path = synonymTablePathOf(source)
+        n = buildSynonymTable(chartVocabulary(graph), path)
+        print "%s: %d entries written to %s" % (source, n, path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
 import nltk
+import threading
+from collections import OrderedDict
 from NLP.constants import *
 
 ROOT = 'ROOT'
+PARSED_TREES_SIZE = 1024  # Maximum number of parsed tree strings kept by treeFromString
+
+_parsed_trees = OrderedDict()  # Key: bracketed tree string; value: nltk.ImmutableTree. Least recently used first
+_parsed_trees_lock = threading.Lock()
 
 
 def isSubTree(subTree, mainTree):
@@ -391,7 +397,7 @@ def immutableCopy(ptree):
     :return: an nltk.ImmutableTree instance copied from ptree
     """
     if type(ptree) is nltk.ImmutableTree:
-        return ptree.copy()
+        return ptree  # Immutable trees can be shared
     elif type(ptree) is nltk.Tree:
         return nltk.ImmutableTree(ptree.label(), [immutableCopy(c) for c in ptree])
     elif isinstance(ptree, basestring):
@@ -400,6 +406,18 @@ def immutableCopy(ptree):
         raise TypeError("immutableCopy: unknown type given: %s" % str(type(ptree)))
 
 
+def treeCopy(ptree, deep=False):
+    """
+    Copies a parse tree; immutable trees are not copied but shared
+    :param ptree: an nltk.Tree or nltk.ImmutableTree instance; None
+    :param deep: whether to copy the subtrees of a mutable tree too
+    :return: an nltk.Tree copy of ptree, or ptree itself if immutable
+    """
+    if ptree is None or isinstance(ptree, nltk.ImmutableTree):
+        return ptree
+    return ptree.copy(deep=deep)
+
+
 def mutableCopy(ptree):
     """
     Copies an immutable tree into a normal nltk.Tree instance
@@ -416,6 +434,26 @@ def mutableCopy(ptree):
         raise TypeError("mutableCopy: unknown type given: %s" % str(type(ptree)))
 
 
+def treeFromString(s, immutable=False):
+    """
+    Parses a bracketed parse tree, as nltk.Tree.fromstring, reusing the trees already parsed from the same string
+    :param s: string; bracketed parse tree
+    :param immutable: whether to return an nltk.ImmutableTree, shared with other callers, instead of a new nltk.Tree
+    :return: an nltk.ImmutableTree or nltk.Tree instance
+    """
+    with _parsed_trees_lock:
+        ptree = _parsed_trees.pop(s, None)
+        if ptree is not None:
+            _parsed_trees[s] = ptree
+    if ptree is None:
+        ptree = nltk.ImmutableTree.fromstring(s)
+        with _parsed_trees_lock:
+            _parsed_trees[s] = ptree
+            while len(_parsed_trees) > PARSED_TREES_SIZE:
+                _parsed_trees.popitem(last=False)
+    return ptree if immutable else mutableCopy(ptree)
+
+
 def toParentedTree(ptree):
     """
     Copies an nltk.Tree instance to a ParentedTree that maintains parent pointers for each node.
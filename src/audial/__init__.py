@@ -1,14 +1,17 @@
 import traceback
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
 from flask_session import Session
 from functools import wraps
 from auth_secrets import *
 from content_management import Content
 from controller import Controller
+from const import BAR_CHART
 from flask import session
 import os
 from config import *
 from general_util import ontologyPath
+from NLP.util.SynonymCache import loadChartSynonyms
+from session_backend import MemorySessionInterface
 
 
 #  Bootstrapping
@@ -16,8 +19,12 @@ root_dir = os.path.dirname(__file__)
 app = Flask(__name__)
 SESSION_TYPE = 'filesystem'
 SESSION_FILE_DIR = os.path.join(root_dir, 'flask_session')
+SESSION_FILE_THRESHOLD = SESSION_MAX_ENTRIES
+PERMANENT_SESSION_LIFETIME = SESSION_TTL
 app.config.from_object(__name__)
 Session(app)
+if SESSION_BACKEND == 'memory':
+    app.session_interface = MemorySessionInterface(SESSION_TTL, SESSION_MAX_ENTRIES)
 app.config['DEBUG'] = FLASK_DEBUG
 app.config['PROPAGATE_EXCEPTIONS'] = FLASK_BUBBLE_EXCEPTIONS
 app.config['TRAP_HTTP_EXCEPTIONS'] = FLASK_BUBBLE_EXCEPTIONS
@@ -25,6 +32,44 @@ app.secret_key = FLASK_SECRET_KEY
 
 GRAPHICS = Content()
 DEFAULT_KEY = "Austrian Population"
+for graphic in GRAPHICS.values():
+    loadChartSynonyms(ontologyPath(graphic[4]))
+
+
+def warm_up_summaries():
+    """
+    Loads each chart and generates its summary, which is then shared by all sessions
+    """
+    from ontology.summary_cache import summaryOf
+    for graphic in GRAPHICS.values():
+        c = None
+        try:
+            with app.test_request_context():
+                c = Controller(graphic[5], ontologyPath(graphic[4]), graphic[6])
+                if c.type == BAR_CHART and c.isOntologyLoaded():
+                    summaryOf(c.o)
+        except Exception:
+            if c:
+                c.logger.system_logger.exception("Summary of '%s' could not be generated" % graphic[4])
+        finally:
+            if c:
+                c.clean()
+
+
+def start_summary_warm_up():
+    """
+    Generates the summaries of the charts in a background thread, if WARM_UP_SUMMARIES is set. Meant to be called
+    once on start-up by the process serving requests, e.g. from the WSGI script after importing the app; importing
+    this module does not start it.
+    :return: threading.Thread instance; None if not started
+    """
+    if not WARM_UP_SUMMARIES:
+        return None
+    from threading import Thread
+    warm_up = Thread(target=warm_up_summaries, name='summary-warm-up')
+    warm_up.daemon = True
+    warm_up.start()
+    return warm_up
 
 
 def logged_in(f):
@@ -363,7 +408,12 @@ def admin_delete(command):
     error_msg = ''
     succ = True
     if command in ['ontology', 'o', 'all']:
-        paths = serializedOntologyDirs()
+        from ontology.graph_pool import evictGraph
+        busy = []
+        for _, data in GRAPHICS.iteritems():
+            if not evictGraph(data[6]):  # Stores must be closed before their files are removed
+                busy.append(data[6])
+        paths = serializedOntologyDirs(skip=busy)
         if paths:
             import shutil
             for p in paths:
@@ -373,28 +423,30 @@ def admin_delete(command):
                     succ = False
                     error_msg = str(e)
                     break
+        if busy and succ:
+            succ = False
+            error_msg = "Some ontologies are in use and were not removed; please try again later."
     if command in ['logs', 'l', 'all']:
-        import logging
+        from logger.QueuedLogging import closeLogFiles
         path = os.path.normpath(os.path.join(os.path.dirname(__file__), "logger", "logs"))
         try:
-            logging.shutdown()
+            closeLogFiles()
             deleteDirContents(path, ignore=[".keep", "GraphNav.logger.Logger.log"])
         except Exception as e:
             succ = False
             error_msg = str(e)
     if command in ['votes', 'v', 'all']:
-        path = os.path.normpath(os.path.join(os.path.dirname(__file__), "dialog", "storage", "votes.json"))
-        try:
-            with open(path, "w") as f:
-                f.write("{}")  # Empty learning model
-        except Exception as e:
+        from dialog.model.modelUtil import clearLearningModel
+        if not clearLearningModel():
             succ = False
-            error_msg = str(e)
+            error_msg = "The learning model could not be cleared."
     if command in ['session', 's', 'all']:
         path = os.path.normpath(os.path.join(os.path.dirname(__file__), "flask_session"))
         try:
             session.clear()
             deleteDirContents(path)
+            if isinstance(app.session_interface, MemorySessionInterface):
+                app.session_interface.store.clear()
         except Exception as e:
             succ = False
             error_msg = str(e)
@@ -405,6 +457,55 @@ def admin_delete(command):
         return jsonify(result=error_full, output_type='answer')
 
 
+@app.route('/admin/cache-stats')
+@validate_admin_action
+def admin_cache_stats():
+    from ontology.graph_pool import memoStatistics
+    return jsonify(result=memoStatistics())
+
+
+@app.route('/admin/session-stats')
+@validate_admin_action
+def admin_session_stats():
+    if not isinstance(app.session_interface, MemorySessionInterface):
+        return jsonify(result={'backend': SESSION_BACKEND})
+    store = app.session_interface.store
+    sessions, size = store.size()
+    return jsonify(result={'backend': SESSION_BACKEND, 'sessions': sessions, 'bytes': size, 'stats': store.stats})
+
+
+@app.route('/admin/nlp-stats')
+@validate_admin_action
+def admin_nlp_stats():
+    from NLP.parser.ParserGuard import answerPathStatistics
+    from NLP.parser.ParseCache import parseCacheOf
+    from NLP.parser.CoreNLPClient import serviceStates
+    from NLP.util.SynonymCache import synonymCacheOf
+    return jsonify(result={'answer_paths': answerPathStatistics(), 'parse_cache': parseCacheOf().stats,
+                           'synonym_cache': synonymCacheOf().stats, 'services': serviceStates()})
+
+
+@app.route('/admin/metrics')
+@validate_admin_action
+def admin_metrics():
+    from logger.Metrics import prometheusText
+    return Response(prometheusText(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/log-stats')
+@validate_admin_action
+def admin_log_stats():
+    from logger.QueuedLogging import logStatistics
+    return jsonify(result=logStatistics())
+
+
+@app.route('/admin/stage-stats')
+@validate_admin_action
+def admin_stage_stats():
+    from logger.Metrics import stageStatistics
+    return jsonify(result=stageStatistics())
+
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html', GRAPHICS=GRAPHICS, current=DEFAULT_KEY), 404
@@ -585,13 +686,16 @@ def longdescContents(ontology_filename):
     return html
 
 
-def serializedOntologyDirs():
+def serializedOntologyDirs(skip=None):
     """
     Returns all paths to the serialized ontologies in the system
+    :param skip: list<string>; store indexes of the ontologies to leave out; None to return all
     :return: list<string>: absolute paths to the serialized ontologies
     """
     paths = []
     for _, data in GRAPHICS.iteritems():
+        if skip and data[6] in skip:
+            continue
         dir_name = "%s_storage" % data[6]
         p = os.path.normpath(os.path.join(os.path.dirname(__file__), "ontology", dir_name))
         if os.path.isdir(p):
@@ -600,4 +704,6 @@ def serializedOntologyDirs():
 
 
 if __name__ == '__main__':
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':  # Not in the reloader's watcher process
+        start_summary_warm_up()
     app.run(threaded=True)
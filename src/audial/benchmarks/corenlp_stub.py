@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Stanford CoreNLP web service, replaying recorded responses so that benchmarks run offline
+and deterministically. Requests are matched by their annotators and text. When given the URL of an actual CoreNLP
+service, requests not recorded yet are forwarded to it and their responses recorded; otherwise, they can be answered
+by the in-process parser (NLP/parser/OfflineParser.py), so that benchmarks also run without any recordings.
+"""
+import json
+import os
+import threading
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+RESPONSES_FILE = os.path.join(os.path.dirname(__file__), 'data', 'corenlp_responses.json')
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class CoreNLPStub(object):
+    """
+    HTTP server answering CoreNLP annotation requests (as sent by NLP.parser.CoreNLPClient) with recorded responses
+    """
+    def __init__(self, path=RESPONSES_FILE, upstream=None, fallback=False):
+        """
+        CoreNLPStub constructor; loads the recorded responses
+        :param path: string; path to the JSON file of recorded responses
+        :param upstream: string; URL of a CoreNLP service to forward and record unknown requests to; None to answer
+        them with the in-process parser or an error
+        :param fallback: bool; whether to answer requests not recorded with the in-process parser instead of an error
+        """
+        self.path = path
+        self.upstream = upstream
+        self.fallback = fallback
+        self.responses = {}  # Key: requestKey; value: JSON response of the service
+        if os.path.isfile(path):
+            with open(path, 'r') as f:
+                self.responses = json.load(f)
+        self.lock = threading.Lock()
+        self.stats = {'replayed': 0, 'recorded': 0, 'parsed': 0, 'missing': 0}
+        self.server = None
+        self.url = None
+
+    def start(self):
+        """
+        Starts serving on a free local port, in a background thread
+        :return: string; URL of the stub service
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                query = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+                properties = json.loads(query.get('properties', ['{}'])[0])
+                text = self.rfile.read(int(self.headers.getheader('content-length', 0))).decode('utf8')
+                response = stub.respond(properties, text)
+                if response is None:
+                    self.send_error(404, "No recorded response")
+                    return
+                body = json.dumps(response)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.url = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        return self.url
+
+    def stop(self):
+        """
+        Stops serving, and writes the recorded responses if new ones were recorded
+        :return: None
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.stats['recorded']:
+            with open(self.path, 'w') as f:
+                json.dump(self.responses, f, indent=1, sort_keys=True)
+
+    def respond(self, properties, text):
+        """
+        Returns the response to an annotation request
+        :param properties: dict; CoreNLP properties of the request
+        :param text: unicode; text to annotate
+        :return: dict; JSON response; None if not recorded, not recorded now and not parsed in-process
+        """
+        key = requestKey(properties, text)
+        with self.lock:
+            response = self.responses.get(key)
+            if response is not None:
+                self.stats['replayed'] += 1
+                return response
+        if not self.upstream:
+            with self.lock:
+                self.stats['parsed' if self.fallback else 'missing'] += 1
+            return offlineResponse(properties, text) if self.fallback else None
+        import requests
+        r = requests.post(self.upstream, params={'properties': json.dumps(properties)}, data=text.encode('utf8'))
+        r.raise_for_status()
+        response = r.json()
+        with self.lock:
+            self.responses[key] = response
+            self.stats['recorded'] += 1
+        return response
+
+
+def offlineResponse(properties, text):
+    """
+    Annotates a text with the in-process parser, in the JSON format of the CoreNLP service (only the fields read by
+    NLP.parser.CoreNLPClient)
+    :param properties: dict; CoreNLP properties of the request
+    :param text: unicode; text to annotate
+    :return: dict; JSON response
+    """
+    from NLP.parser.OfflineParser import offlineParserOf
+    parser = offlineParserOf()
+    annotators = properties.get('annotators', '').split(',')
+    if 'parse' in annotators:
+        tagged, tree = parser.tagAndParse(text)
+    else:
+        tagged, tree = parser.tag(text.split()), None  # Tokens sent already split, joined by spaces
+    sentence = {'tokens': [{'index': i + 1, 'word': w, 'pos': p} for i, (w, p) in enumerate(tagged)]}
+    if tree is not None:
+        sentence['parse'] = tree.pformat(margin=1000000)
+    return {'sentences': [sentence]}
+
+
+def requestKey(properties, text):
+    """
+    Returns the key of an annotation request among the recorded responses
+    :param properties: dict; CoreNLP properties of the request
+    :param text: unicode; text to annotate
+    :return: unicode
+    """
+    return u'%s|%s' % (properties.get('annotators', ''), text)
@@ -0,0 +1,130 @@
+"""
+Memory benchmark of consolidated queries: runs each benchmark query through the parsing, ontology look-up and
+consolidation steps of the controller against the bundled charts, and reports the size of the resulting Query object
+graph (shared objects counted once), the number of model instances in it, and the size of its session encoding, e.g.:
+    python -m benchmarks.model_memory
+    python -m benchmarks.model_memory --chart "Power in Europe" --parser stanford_web
+"""
+import argparse
+import os
+import sys
+import time
+import types
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from content_management import Content
+from general_util import ontologyPath
+from mapper.Mapper import Mapper
+from NLP.model.ModelCodec import encodeModel
+from benchmarks.parser_parity import QUERIES_FILE
+
+SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+
+def deepSize(root):
+    """
+    Returns the memory taken by an object graph, as reported by sys.getsizeof; shared objects are counted once
+    :param root: object
+    :return: (int, Counter): bytes; instances of each class defined in this application
+    """
+    size = 0
+    instances = Counter()
+    seen = set()
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        cls = type(obj)
+        if not cls.__module__.startswith(('__builtin__', 'nltk')):
+            instances[cls.__name__] += 1
+        if isinstance(obj, dict):
+            pending.extend(obj.iterkeys())
+            pending.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)  # nltk trees are lists
+        if hasattr(obj, '__dict__'):
+            pending.append(obj.__dict__)
+        for klass in cls.__mro__:
+            for slot in klass.__dict__.get('__slots__', ()):
+                if hasattr(obj, slot):
+                    pending.append(getattr(obj, slot))
+    return size, instances
+
+
+def consolidate(controller, query):
+    """
+    Parses, looks up and consolidates a query, as Controller.processQuery does before generating dialogues
+    :param controller: Controller instance
+    :param query: string; NL query
+    :return: Query instance
+    """
+    controller.parseAndLookUp(query)
+    controller.consolidateQuery()
+    return controller.q
+
+
+def benchmark(name, chart, queries, parser):
+    """
+    Prints the memory taken by the consolidated queries of a chart
+    :param name: string; name of the chart
+    :param chart: list; chart entry of content_management.Content
+    :param queries: list<string>
+    :param parser: string; NL parser and POS tagger to use (see config.NLP_PARSER)
+    :return: None
+    """
+    from controller import Controller
+    from config import NLP_PARSER_DEADLINE
+    app = Flask(__name__)
+    with app.test_request_context():
+        controller = Controller(chart[5], ontologyPath(chart[4]), chart[6])
+        controller.mapper = Mapper(parser=parser, tagger=parser, deadline=NLP_PARSER_DEADLINE)
+        sizes, encoded, timings = [], [], []
+        instances = Counter()
+        try:
+            for query in queries:
+                start = time.time()
+                try:
+                    q = consolidate(controller, query)
+                except Exception as e:
+                    print "  '%s' failed: %s" % (query, e)
+                    continue
+                timings.append((time.time() - start) * 1000)
+                size, query_instances = deepSize(q)
+                sizes.append(size)
+                instances.update(query_instances)
+                encoded.append(len(encodeModel(q)))
+        finally:
+            controller.clean()
+    if not sizes:
+        return
+    sizes.sort()
+    n = len(sizes)
+    print "%s: %d queries" % (name, n)
+    print "  Bytes per consolidated query: mean %d, median %d, max %d" % (sum(sizes) / n, sizes[n // 2], sizes[-1])
+    print "  Bytes per session encoding: mean %d" % (sum(encoded) / n)
+    print "  Consolidation time (ms): mean %.1f" % (sum(timings) / n)
+    print "  Instances per query: %s" % ', '.join('%s %.1f' % (cls, float(count) / n)
+                                                 for cls, count in instances.most_common())
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('--chart', action='append', help="name of a chart to benchmark (default: all)")
+    args.add_argument('--queries', default=QUERIES_FILE, help="text file with a query per line")
+    args.add_argument('--parser', default='nltk', help="NL parser and POS tagger: nltk, stanford or stanford_web")
+    opts = args.parse_args()
+    with open(opts.queries, 'r') as f:
+        queries = [l.strip() for l in f if l.strip() and not l.startswith('#')]
+    charts = Content()
+    for name in opts.chart or sorted(charts):
+        benchmark(name, charts[name], queries, opts.parser)
+
+
+if __name__ == '__main__':
+    main()
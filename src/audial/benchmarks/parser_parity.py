@@ -0,0 +1,202 @@
+"""
+Parity benchmark of the in-process parser (NLP/parser/OfflineParser.py) against the Stanford CoreNLP service.
+
+The parse trees of the CoreNLP service must first be recorded for a set of queries (one per line), e.g.:
+    python -m benchmarks.parser_parity --record http://localhost:9000
+Responses recorded for the pipeline benchmark (see benchmarks/pipeline.py) are used too when there are no recorded
+trees, so that a single recording serves both. Then, without the need for the service:
+    python -m benchmarks.parser_parity
+compares the POS tags, constituents and POCs (potential ontology concepts) found with both parsers for each
+recorded query, and times the in-process parser.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from nltk import Tree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from NLP.model.Query import Query
+from NLP.poc.POCCreator import POCCreator
+from NLP.parser.OfflineParser import offlineParserOf
+
+from benchmarks.corenlp_stub import RESPONSES_FILE
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+QUERIES_FILE = os.path.join(DATA_DIR, 'queries.txt')
+TREES_FILE = os.path.join(DATA_DIR, 'corenlp_trees.json')
+
+
+def normalizeQuery(q):
+    """
+    Normalizes a query as GraphNavStanfordParser does before parsing it
+    :param q: string; the NL query
+    :return: string
+    """
+    nq = q.lower()
+    for punct in '.,;':
+        nq = nq.replace(punct, " ")
+    for rem in '?!':
+        nq = nq.replace(rem, "")
+    return nq
+
+
+def readQueries(path):
+    """
+    Reads the queries of the benchmark
+    :param path: string; path to a text file with a query per line
+    :return: list<string>: normalized queries
+    """
+    with open(path, 'r') as f:
+        return [normalizeQuery(l.strip()) for l in f if l.strip() and not l.startswith('#')]
+
+
+def record(url, queries, path):
+    """
+    Parses the given queries with a CoreNLP service and stores the results
+    :param url: string; URL of the CoreNLP service
+    :param queries: list<string>
+    :param path: string; path to the JSON file to write
+    :return: None
+    """
+    from NLP.parser.CoreNLPClient import CoreNLPClient
+    client = CoreNLPClient(url)
+    recorded = []
+    for q in queries:
+        tokens, tree = client.tagAndParse(q)
+        recorded.append({'query': q, 'tokens': [list(t) for t in tokens], 'pt': str(tree)})
+    with open(path, 'w') as f:
+        json.dump(recorded, f, indent=1)
+    print "Recorded %d parse trees in %s" % (len(recorded), path)
+
+
+def recordedResponses(path, queries):
+    """
+    Takes the parse trees of the given queries from the CoreNLP responses recorded by the pipeline benchmark
+    :param path: string; path to the JSON file of recorded responses (see benchmarks/corenlp_stub.py)
+    :param queries: list<string>: normalized queries
+    :return: list<dict>: recorded query, tokens and parse tree, as written by record(), of each query with a parse
+    """
+    with open(path, 'r') as f:
+        responses = json.load(f)
+    parsed = {}
+    for key, response in responses.iteritems():
+        annotators, text = key.split('|', 1)
+        if 'parse' in annotators.split(',') and response.get('sentences'):
+            parsed[text] = response['sentences']
+    recorded = []
+    for q in queries:
+        sentences = parsed.get(q)
+        if sentences:
+            tokens = [[t['word'], t['pos']] for s in sentences for t in s['tokens']]
+            recorded.append({'query': q, 'tokens': tokens, 'pt': sentences[0]['parse']})
+    return recorded
+
+
+def constituents(tree):
+    """
+    Returns the labelled constituents of a parse tree, leaving out its root and pre-terminals
+    :param tree: nltk.Tree
+    :return: set<(string, int, int)>: label, first and last leaf index of each constituent
+    """
+    spans = set()
+
+    def visit(t, start):
+        end = start
+        for child in t:
+            end = visit(child, end) if isinstance(child, Tree) else end + 1
+        if t.height() > 2 and t is not tree:
+            spans.add((t.label(), start, end))
+        return end
+    visit(tree, 0)
+    return spans
+
+
+def pocsOf(query, tokens, tree):
+    """
+    Returns the POCs found in a parsed query
+    :param query: string; normalized query
+    :param tokens: list<(string, string)>; (word, POS tag) pairs
+    :param tree: nltk.Tree; parse tree
+    :return: list<string>: raw text of each POC
+    """
+    q = Query(query)
+    q.tokens, q.pt = tokens, tree
+    POCCreator(q).generatePOCs()
+    return sorted(poc.rawText for poc in q.pocs)
+
+
+def compare(recorded, repeat):
+    """
+    Parses the recorded queries in-process and prints how the results compare to the recorded ones
+    :param recorded: list<dict>: recorded query, tokens and parse tree
+    :param repeat: int; times each query is parsed to measure parsing time
+    :return: None
+    """
+    parser = offlineParserOf()
+    print "Tagger: %s" % type(parser.tagger).__name__
+    tags_total = tags_equal = 0
+    gold_spans = test_spans = common_spans = 0
+    pocs_equal = 0
+    timings = []
+    for r in recorded:
+        query = r['query']
+        gold_tokens = [tuple(t) for t in r['tokens']]
+        gold_tree = Tree.fromstring(r['pt'])
+        start = time.time()
+        for _ in xrange(repeat):
+            tokens, tree = parser.tagAndParse(query)
+        timings.append((time.time() - start) / repeat * 1000)
+        if [w for w, _ in tokens] == [w for w, _ in gold_tokens]:
+            tags_total += len(tokens)
+            tags_equal += sum(1 for t, g in zip(tokens, gold_tokens) if t[1] == g[1])
+        gold, test = constituents(gold_tree), constituents(tree)
+        gold_spans += len(gold)
+        test_spans += len(test)
+        common_spans += len(gold & test)
+        gold_pocs, test_pocs = pocsOf(query, gold_tokens, gold_tree), pocsOf(query, tokens, tree)
+        if gold_pocs == test_pocs:
+            pocs_equal += 1
+        else:
+            print "POCs differ for '%s': CoreNLP %s, in-process %s" % (query, gold_pocs, test_pocs)
+    precision = float(common_spans) / test_spans if test_spans else 0.
+    recall = float(common_spans) / gold_spans if gold_spans else 0.
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.
+    timings.sort()
+    print "Queries: %d" % len(recorded)
+    print "POS tag accuracy: %.3f" % (float(tags_equal) / tags_total if tags_total else 0.)
+    print "Labelled bracket P/R/F1: %.3f / %.3f / %.3f" % (precision, recall, f1)
+    print "Queries with the same POCs: %d (%.3f)" % (pocs_equal, float(pocs_equal) / len(recorded))
+    print "Parse time (ms): mean %.2f, median %.2f, max %.2f" % (sum(timings) / len(timings),
+                                                                timings[len(timings) // 2], timings[-1])
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('--record', metavar='URL', help="record the parse trees of a CoreNLP service at URL")
+    args.add_argument('--queries', default=QUERIES_FILE, help="text file with a query per line")
+    args.add_argument('--trees', default=TREES_FILE, help="JSON file of recorded CoreNLP parse trees")
+    args.add_argument('--responses', default=RESPONSES_FILE,
+                      help="JSON file of CoreNLP responses recorded by the pipeline benchmark")
+    args.add_argument('--repeat', type=int, default=20, help="times each query is parsed when timing")
+    opts = args.parse_args()
+    if opts.record:
+        record(opts.record, readQueries(opts.queries), opts.trees)
+        return
+    if os.path.isfile(opts.trees):
+        with open(opts.trees, 'r') as f:
+            recorded = json.load(f)
+    elif os.path.isfile(opts.responses):
+        recorded = recordedResponses(opts.responses, readQueries(opts.queries))
+    else:
+        recorded = []
+    if not recorded:
+        sys.exit("No recorded parse trees in %s nor %s; record them first with --record URL" % (opts.trees,
+                                                                                                   opts.responses))
+    compare(recorded, opts.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""
+End-to-end benchmark of the NL pipeline. Each benchmark query is asked to the bundled charts through
+Controller.retrieveValue, as the /_retrieve route does; dialogues are answered with their first suggestion through
+Controller.processVoteSelection, as the /_vote_selected route does. Queries are parsed by a local stand-in of the
+CoreNLP service replaying recorded responses (see benchmarks/corenlp_stub.py), which can be recorded from an actual
+service, e.g.:
+    python -m benchmarks.pipeline --record http://localhost:9000
+Queries whose responses have not been recorded are parsed by the in-process parser instead, so that
+    python -m benchmarks.pipeline
+runs offline even on a fresh checkout. It reports the latency and net allocations (GC-tracked objects created and
+still alive) of each pipeline stage, and stores the results under benchmarks/results, labelled with the current
+version, to compare later runs against:
+    python -m benchmarks.pipeline --baseline benchmarks/results/pipeline_<version>.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, session
+from content_management import Content
+from general_util import ontologyPath
+from session_backend import MemorySessionInterface, encodeSession
+from benchmarks.corenlp_stub import CoreNLPStub, RESPONSES_FILE
+from benchmarks.parser_parity import QUERIES_FILE
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+SESSION_ID = 'benchmark'  # Session all benchmark queries are asked in, as a logged-in user
+REGRESSION_THRESHOLD = 0.2  # Relative slowdown of a stage, with respect to a baseline, reported as a regression
+
+
+class StageRecorder(object):
+    """
+    Times the pipeline stages by wrapping the functions implementing them
+    """
+    def __init__(self):
+        self.samples = OrderedDict()  # Key: stage name; value: list<(float, int)>: milliseconds and allocations
+        self.wrapped = []  # (owner, attribute name, original function)
+
+    def wrap(self, owner, name, stage):
+        """
+        Records the latency and allocations of every call to a function
+        :param owner: class or module defining the function
+        :param name: string; name of the function
+        :param stage: string; name of the stage the function implements
+        :return: None
+        """
+        original = owner.__dict__[name]
+        samples = self.samples.setdefault(stage, [])
+
+        def timed(*args, **kwargs):
+            allocated = gc.get_count()[0]
+            start = time.time()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(((time.time() - start) * 1000, gc.get_count()[0] - allocated))
+        setattr(owner, name, timed)
+        self.wrapped.append((owner, name, original))
+
+    def restore(self):
+        """
+        Restores the wrapped functions
+        :return: None
+        """
+        for owner, name, original in reversed(self.wrapped):
+            setattr(owner, name, original)
+        self.wrapped = []
+
+    def summary(self):
+        """
+        Summarizes the samples of each stage
+        :return: OrderedDict<string, dict>: calls, mean/median/95th percentile milliseconds and mean allocations
+        """
+        stages = OrderedDict()
+        for stage, samples in self.samples.iteritems():
+            if not samples:
+                continue
+            timings = sorted(ms for ms, _ in samples)
+            n = len(samples)
+            stages[stage] = {'calls': n, 'mean_ms': sum(timings) / n, 'p50_ms': timings[n // 2],
+                             'p95_ms': timings[min(n - 1, int(n * 0.95))],
+                             'allocations': sum(a for _, a in samples) / float(n)}
+        return stages
+
+
+def instrument(recorder):
+    """
+    Wraps the functions implementing each pipeline stage
+    :param recorder: StageRecorder instance
+    :return: None
+    """
+    import controller
+    from NLP.NLHandler import NLHandler
+    from mapper.Mapper import Mapper
+    from consolidator.Consolidator import Consolidator
+    from dialog.dialogHandler import DialogHandler
+    recorder.wrap(controller.Controller, 'retrieveValue', 'request: query')
+    recorder.wrap(controller.Controller, 'processVoteSelection', 'request: vote')
+    recorder.wrap(NLHandler, 'parseQuery', 'parse')
+    recorder.wrap(Mapper, 'ontologyBasedLookUp', 'ontologyBasedLookUp')
+    recorder.wrap(controller, 'preConsolidateQuery', 'preConsolidateQuery')
+    recorder.wrap(Consolidator, 'consolidateQuery', 'consolidation')
+    recorder.wrap(DialogHandler, 'generateDialogs', 'dialog generation')
+    recorder.wrap(controller.Controller, 'computeAnswer', 'computeAnswer')
+
+
+def firstVoteId():
+    """
+    Returns the ID of the first suggestion of the dialogue in the session
+    :return: string; None if no dialogue
+    """
+    import const as c
+    from dialog.model.SuggestionPair import SuggestionPair
+    from NLP.model.ModelCodec import decodeModel
+    encoded = session.get(c.SESS_SUG_PAIR)
+    if not encoded:
+        return None
+    votes = decodeModel(encoded, SuggestionPair()).votes
+    return votes[0].id if votes else None
+
+
+def askChart(chart, query, endpoint, rounds):
+    """
+    Asks a query to a chart, answering its dialogues with their first suggestion
+    :param chart: list; chart entry of content_management.Content
+    :param query: string; NL query
+    :param endpoint: string; URL of the NL service
+    :param rounds: int; maximum number of dialogue rounds
+    :return: int; number of dialogue rounds
+    """
+    from controller import Controller
+    from mapper.Mapper import Mapper
+    from config import NLP_PARSER_DEADLINE
+
+    def controllerOf():
+        controller = Controller(chart[5], ontologyPath(chart[4]), chart[6])
+        controller.mapper = Mapper(parser='stanford_web', tagger='stanford_web', deadline=NLP_PARSER_DEADLINE,
+                                   endpoint=endpoint)
+        return controller
+
+    controller = controllerOf()
+    controller.clearSessionContext()
+    _, output_type = controller.retrieveValue(query)
+    n = 0
+    while output_type == 'dialogue' and n < rounds:
+        controller.saveContextToSession()
+        controller.clean()
+        vote_id = firstVoteId()
+        controller = controllerOf()
+        _, output_type = controller.processVoteSelection(vote_id)
+        n += 1
+    controller.clearSessionContext()
+    controller.clean()
+    return n
+
+
+def benchmark(charts, queries, endpoint, repeat, rounds):
+    """
+    Runs the benchmark queries against the given charts
+    :param charts: dict; chart entries of content_management.Content by name
+    :param queries: list<string>
+    :param endpoint: string; URL of the NL service
+    :param repeat: int; times each query is asked to each chart
+    :param rounds: int; maximum number of dialogue rounds per query
+    :return: OrderedDict<string, dict>: results of each chart
+    """
+    from NLP.parser.ParseCache import parseCacheOf
+    from dialog.model import modelUtil
+    parse_cache = parseCacheOf()
+    parse_cache.path = None  # Parses are never read from nor written to disk
+    model_dir = tempfile.mkdtemp()
+    model_db = modelUtil.MODEL_DB
+    modelUtil.MODEL_DB = os.path.join(model_dir, model_db)  # Votes cast in dialogues leave the learning model as is
+    app = Flask(__name__)
+    app.session_interface = MemorySessionInterface(3600, 1)
+    app.session_interface.store.set(SESSION_ID, encodeSession({'logged_in': True, 'username': SESSION_ID}))
+    results = OrderedDict()
+    try:
+        for name in sorted(charts):
+            recorder = StageRecorder()
+            instrument(recorder)
+            dialogues = failed = 0
+            try:
+                for query in queries:
+                    for _ in xrange(repeat):
+                        parse_cache.clear()  # Every query is parsed by the NL service
+                        gc.collect()
+                        gc.disable()  # Collections would reset the allocation counts
+                        try:
+                            cookie = '%s=%s' % (app.session_cookie_name, SESSION_ID)
+                            with app.test_request_context(environ_base={'HTTP_COOKIE': cookie}):
+                                dialogues += askChart(charts[name], query, endpoint, rounds)
+                        except Exception as e:
+                            failed += 1
+                            print "  %s: '%s' failed: %s" % (name, query, e)
+                        finally:
+                            gc.enable()
+            finally:
+                recorder.restore()
+            results[name] = {'queries': len(queries) * repeat, 'failed': failed, 'dialogue_rounds': dialogues,
+                             'stages': recorder.summary()}
+    finally:
+        modelUtil.MODEL_DB = model_db
+        shutil.rmtree(model_dir, ignore_errors=True)
+    return results
+
+
+def currentVersion():
+    """
+    Returns a label of the current version of the code
+    :return: string
+    """
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+
+
+def printResults(results, baseline=None, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints the results of a benchmark run, compared to those of a baseline run if given
+    :param results: dict; results of a run, as stored by main()
+    :param baseline: dict; results of a former run; None to skip comparison
+    :param threshold: float; relative slowdown of a stage reported as a regression
+    :return: int; number of regressions
+    """
+    regressions = 0
+    for name, chart in results['charts'].iteritems():
+        print "%s: %d queries, %d failed, %d dialogue rounds" % (name, chart['queries'], chart['failed'],
+                                                                 chart['dialogue_rounds'])
+        print "  %-22s %6s %9s %9s %9s %12s" % ('stage', 'calls', 'mean ms', 'p50 ms', 'p95 ms', 'allocations')
+        base_stages = (baseline or {}).get('charts', {}).get(name, {}).get('stages', {})
+        for stage, s in chart['stages'].iteritems():
+            line = "  %-22s %6d %9.2f %9.2f %9.2f %12.1f" % (stage, s['calls'], s['mean_ms'], s['p50_ms'],
+                                                             s['p95_ms'], s['allocations'])
+            base = base_stages.get(stage)
+            if base and base['p50_ms'] > 0:
+                change = s['p50_ms'] / base['p50_ms'] - 1
+                line += "  %+.0f%% p50" % (change * 100)
+                if change > threshold:
+                    line += "  REGRESSION"
+                    regressions += 1
+            print line
+    if baseline:
+        print "%d regressions with respect to %s" % (regressions, baseline['version'])
+        parsed, base_parsed = (bool(r.get('nl_responses', {}).get('parsed')) for r in (results, baseline))
+        if parsed != base_parsed:
+            print "Warning: only one of the runs parsed queries in-process; parse timings are not comparable"
+    return regressions
+
+
+def main():
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument('--record', metavar='URL', help="record the responses of a CoreNLP service at URL")
+    args.add_argument('--chart', action='append', help="name of a chart to benchmark (default: all)")
+    args.add_argument('--queries', default=QUERIES_FILE, help="text file with a query per line")
+    args.add_argument('--responses', default=RESPONSES_FILE, help="JSON file of recorded CoreNLP responses")
+    args.add_argument('--repeat', type=int, default=3, help="times each query is asked to each chart")
+    args.add_argument('--rounds', type=int, default=3, help="maximum number of dialogue rounds per query")
+    args.add_argument('--baseline', help="results of a former run to compare with")
+    args.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                      help="relative slowdown of a stage reported as a regression")
+    args.add_argument('--label', default=None, help="label of the results (default: current git version)")
+    opts = args.parse_args()
+    with open(opts.queries, 'r') as f:
+        queries = [l.strip() for l in f if l.strip() and not l.startswith('#')]
+    charts = Content()
+    if opts.chart:
+        charts = dict((name, charts[name]) for name in opts.chart)
+    stub = CoreNLPStub(opts.responses, upstream=opts.record, fallback=not opts.record)
+    try:
+        endpoint = stub.start()
+        results = {'version': opts.label or currentVersion(), 'date': datetime.datetime.now().isoformat(),
+                   'charts': benchmark(charts, queries, endpoint, 1 if opts.record else opts.repeat, opts.rounds)}
+    finally:
+        stub.stop()
+    results['nl_responses'] = dict(stub.stats)  # Replayed or parsed in-process: runs are only comparable alike
+    if opts.record:
+        print "Recorded %d responses in %s" % (stub.stats['recorded'], opts.responses)
+        return
+    if stub.stats['parsed']:
+        print "Warning: %d requests had no recorded response and were parsed in-process" % stub.stats['parsed']
+    baseline = None
+    if opts.baseline:
+        with open(opts.baseline, 'r') as f:
+            baseline = json.load(f)
+    regressions = printResults(results, baseline, opts.threshold)
+    if not os.path.isdir(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+    path = os.path.join(RESULTS_DIR, 'pipeline_%s.json' % results['version'])
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print "Results stored in %s" % path
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
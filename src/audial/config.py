@@ -8,11 +8,30 @@ FLASK_DEBUG = True
 # Bubble HTTP exceptions through the exception stack?
 FLASK_BUBBLE_EXCEPTIONS = True
 
-# Which natural language parser should be used; local library ('stanford') or Web service ('stanford_web')
+# Which natural language parser should be used; local library ('stanford'), Web service ('stanford_web') or
+# in-process chunk parser ('nltk')
 NLP_PARSER = 'stanford_web'
 
-# Which Part-of-Speech tagger should be used; local library ('stanford') or Web service ('stanford_web')
+# Which Part-of-Speech tagger should be used; local library ('stanford'), Web service ('stanford_web') or
+# in-process tagger ('nltk')
 NLP_POS_TAGGER = 'stanford_web'
 
+# Seconds to wait for the NLP Web service before falling back to simpler query analyses. Applies to each socket
+# operation (connecting, and each wait for data), so a slow but steady answer may take longer in total
+NLP_PARSER_DEADLINE = 5
+
 # Maximum number of nodes (along with any data about them) to output in answers
 MAX_OUTPUT_NODES = 15
+
+# Where user sessions are kept; process memory ('memory') or one file per session in flask_session ('filesystem')
+SESSION_BACKEND = 'memory'
+
+# Seconds a user session is kept since its last request
+SESSION_TTL = 4 * 60 * 60
+
+# Maximum number of user sessions kept; least recently used ones are dropped beyond it
+SESSION_MAX_ENTRIES = 1000
+
+# Whether to generate the summaries of the charts in the background on start-up (see start_summary_warm_up in
+# __init__.py) instead of on their first request
+WARM_UP_SUMMARIES = False
@@ -1,6 +1,7 @@
 from flask import session
 from oc.triple_utils import *
 from NLP.parser.CommandParser import *
+from NLP.parser.ParserGuard import ParserUnavailableException, recordAnswerPath
 from NLP.SimpleNLHandler import SimpleNLHandler
 from NLP.NLHandler import *
 from mapper.Mapper import *
@@ -9,7 +10,9 @@ from oc.OCCreator import addSemanticConcepts
 from consolidator.Consolidator import *
 from dialog.dialogHandler import DialogHandler
 from dialog.model.SuggestionPair import SuggestionPair
+from NLP.model.ModelCodec import encodeModel, decodeModel
 from logger.Logger import AudialLogger
+from logger.Metrics import span
 from config import *
 import const as c
 
@@ -25,16 +28,13 @@ class Controller(object):
         :param reload_file: bool; whether to re-fetch ontology data from the given file
         """
         self.type = type
-        if c.SESS_QUERY in session:  # Coming from a dialogue, fetch consolidated query from session
-            q = Query()
-            q.from_dict(session[c.SESS_QUERY])
-            self.q = q
+        self.q = None
+        if c.SESS_QUERY in session:  # Coming from a dialogue, consolidated query is decoded from session when used
+            self.q_encoded = session[c.SESS_QUERY]
             reload_file = False
-        else:
-            self.q = None
         self.o = None  # Ontology
         self.NL = SimpleNLHandler()  # Default Natural Language handler if mapper not used
-        self.mapper = Mapper(parser=NLP_PARSER, tagger=NLP_POS_TAGGER)
+        self.mapper = Mapper(parser=NLP_PARSER, tagger=NLP_POS_TAGGER, deadline=NLP_PARSER_DEADLINE)
         self.consolidator = None
         self.dialogue = None  # Dialogue controller
         self.logger = AudialLogger()
@@ -43,6 +43,25 @@ class Controller(object):
         else:
             self.o = UpperVisOntology(RDFpath, sess_id, reload_file)
 
+    @property
+    def q(self):
+        """
+        Current user query; decoded from the session the first time it is accessed
+        :return: Query instance; None if no query
+        """
+        if self.q_encoded is not None:
+            try:
+                self.query = decodeModel(self.q_encoded, Query())
+            except ValueError:
+                self.query = None  # Stored by a former release; dialogue cannot be resumed
+            self.q_encoded = None
+        return self.query
+
+    @q.setter
+    def q(self, q):
+        self.query = q
+        self.q_encoded = None
+
     def isOntologyLoaded(self):
         """
         @return bool: whether the ontology graph is loaded and can be queried
@@ -51,7 +70,7 @@ class Controller(object):
 
     def clean(self):
         """
-        Closes the ontology to prevent memory leaks
+        Releases the ontology; its graph is given back to the process-wide pool and kept open for further requests
         """
         if self.o:
             self.o.close()
@@ -67,9 +86,10 @@ class Controller(object):
         self.parseAndLookUp(what)
         self.consolidateQuery()
         self.dialogue = DialogHandler(self.q, self.o)  # Dialog needs consolidated query
-        suggestion_pair = self.dialogue.generateDialogs()
+        with span('dialog generation', self.o.sess_id):
+            suggestion_pair = self.dialogue.generateDialogs()
         if suggestion_pair:
-            session[c.SESS_SUG_PAIR] = suggestion_pair.to_dict()
+            session[c.SESS_SUG_PAIR] = encodeModel(suggestion_pair)
             # Output dialog
             formatter = OutputFormatter(self.o, skip_inflect=True)
             return formatter.suggestionPairToJSON(suggestion_pair)
@@ -83,11 +103,13 @@ class Controller(object):
         (no further dialogue needed; query instance is resolved and task needs to be performed next)
         """
         from dialog.learning.util import updateVoteScores, updateLearningModel, LEARNING_ENABLED
-        suggestion_pair_dict = session.get(c.SESS_SUG_PAIR)
+        suggestion_pair_encoded = session.get(c.SESS_SUG_PAIR)
         self.consolidator = Consolidator(self.q)
-        if self.q and vote_id and suggestion_pair_dict:
-            suggestion_pair = SuggestionPair()
-            suggestion_pair.from_dict(suggestion_pair_dict)
+        if self.q and vote_id and suggestion_pair_encoded:
+            try:
+                suggestion_pair = decodeModel(suggestion_pair_encoded, SuggestionPair())
+            except ValueError:
+                return False  # Stored by a former release; dialogue cannot be resumed
             votes_chosen = updateVoteScores(suggestion_pair, vote_id)
             if LEARNING_ENABLED:
                 updateLearningModel(suggestion_pair, self.o)
@@ -105,10 +127,11 @@ class Controller(object):
                     self.q = self.consolidator.disambiguateOCs(scs_updated)
             #  Call generateDialogs again; query may still have unresolved elements
             self.dialogue = DialogHandler(self.q, self.o)
-            suggestion_pair_new = self.dialogue.generateDialogs()
+            with span('dialog generation', self.o.sess_id):
+                suggestion_pair_new = self.dialogue.generateDialogs()
             if suggestion_pair_new:
                 session.pop(c.SESS_SUG_PAIR)
-                session[c.SESS_SUG_PAIR] = suggestion_pair_new.to_dict()
+                session[c.SESS_SUG_PAIR] = encodeModel(suggestion_pair_new)
                 # Output dialog
                 formatter = OutputFormatter(self.o, skip_inflect=True)
                 return formatter.suggestionPairToJSON(suggestion_pair_new)
@@ -119,6 +142,14 @@ class Controller(object):
         Given a consolidated query, generate an answer from its semantic concepts
         :return: string; answer (or lack thereof) to the user's query
         """
+        with span('answer', self.o.sess_id):
+            return self.__computeAnswer()
+
+    def __computeAnswer(self):
+        """
+        Generates the answer to the consolidated query; see computeAnswer
+        :return: string; answer (or lack thereof) to the user's query
+        """
         answer = 'Your query could not be resolved'
         if allOCsShareNamespace(self.q.semanticConcepts, self.o.VIS_NS):
             self.q.filters.extend(self.q.getNominalFilters())
@@ -218,19 +249,23 @@ class Controller(object):
         :return: void
         """
         self.NL = NLHandler(self.mapper)
-        self.q = self.NL.parseQuery(what)  # Get POCs
-        self.q = self.NL.getCardinalFilters(self.q)  # Get filters
-        self.q = self.mapper.ontologyBasedLookUp(self.o, self.q)  # Get OCs
-        self.q = preConsolidateQuery(self.q, self.o)
-        self.q = addSemanticConcepts(self.q, self.o.sess_id)
+        with span('parse', self.o.sess_id):
+            self.q = self.NL.parseQuery(what)  # Get POCs
+            self.q = self.NL.getCardinalFilters(self.q)  # Get filters
+        with span('ontology look-up', self.o.sess_id):
+            self.q = self.mapper.ontologyBasedLookUp(self.o, self.q)  # Get OCs
+        with span('pre-consolidation', self.o.sess_id):
+            self.q = preConsolidateQuery(self.q, self.o)
+            self.q = addSemanticConcepts(self.q, self.o.sess_id)
 
     def consolidateQuery(self):
         """
         Performs the automatic consolidation step of mapping POCs to OCs
         :return: void; self.q is consolidated.
         """
-        self.consolidator = Consolidator(self.q)
-        self.q = self.consolidator.consolidateQuery()
+        with span('consolidation', self.o.sess_id):
+            self.consolidator = Consolidator(self.q)
+            self.q = self.consolidator.consolidateQuery()
 
     def count(self,element):
         """
@@ -252,11 +287,53 @@ class Controller(object):
     def retrieveValue(self, what):
         output = ""
         output_type = 'answer'
-        if self.type == c.BAR_CHART:
-            self.logger.log_query(what)
-            output = self.commandLookUp(what)
-            if not output:
-                suggestion = self.processQuery(what)
+        with span('request: query', self.o.sess_id):
+            if self.type == c.BAR_CHART:
+                self.logger.log_query(what)
+                output = self.commandLookUp(what)
+                if output:
+                    recordAnswerPath('command')
+                else:
+                    try:
+                        suggestion = self.processQuery(what)
+                        recordAnswerPath(self.mapper.parser.source)
+                    except ParserUnavailableException:
+                        # NL parser too slow or down: answer with the regex-based pipeline instead
+                        recordAnswerPath('simple_pipeline')
+                        suggestion = False
+                        output = self.retrieveSimpleAnswer(what)
+                    if suggestion:
+                        output_type = 'dialogue'
+                        output = suggestion
+                        self.logger.log_dialog(output)
+                    else:
+                        if not output:
+                            output = self.computeAnswer()
+                        self.logger.log_answer(output)
+        return output, output_type
+
+    def retrieveSimpleAnswer(self, what):
+        """
+        Answers a user query with the regular expression-based analysis of SimpleNLHandler, without parsing it; used
+        when the NL parser is not available
+        :param what: the input query
+        :return: string; answer to the query
+        """
+        self.NL = SimpleNLHandler()
+        if self.NL.retrieveExtremeOPFilter(what):
+            output, _ = self.retrieveExtreme(what)
+        else:
+            output, _ = self.retrieveDerivedValue(what)
+        if not output:
+            output = 'Your query could not be resolved'
+        return "(Simplified answer: the language service is not available at the moment.)<br/>%s" % output
+
+    def processVoteSelection(self, vote_id):
+        output = 'Your selection could not be resolved.'
+        output_type = 'answer'
+        with span('request: vote', self.o.sess_id):
+            if self.type == c.BAR_CHART:
+                suggestion = self.processVote(vote_id)
                 if suggestion:
                     output_type = 'dialogue'
                     output = suggestion
@@ -266,20 +343,6 @@ class Controller(object):
                     self.logger.log_answer(output)
         return output, output_type
 
-    def processVoteSelection(self, vote_id):
-        output = 'Your selection could not be resolved.'
-        output_type = 'answer'
-        if self.type == c.BAR_CHART:
-            suggestion = self.processVote(vote_id)
-            if suggestion:
-                output_type = 'dialogue'
-                output = suggestion
-                self.logger.log_dialog(output)
-            else:
-                output = self.computeAnswer()
-                self.logger.log_answer(output)
-        return output, output_type
-
     def retrieveNumeric(self, what):
         """
         Handles a user query related to a numeric filtering of bars
@@ -576,12 +639,7 @@ class Controller(object):
         """
         summary = 'Summary not available'
         if isinstance(self.o, BarChartOntology):
-            sum_var = c.SESS_SUMMARY % self.o.sess_id
-            if sum_var in session:
-                summary = session[sum_var]
-            else:
-                summary = self.o.generateSummary()
-                session[sum_var] = summary
+            summary = self.o.getSummary()
             self.logger.log_answer('Summary fetched.')
         return summary
 
@@ -858,8 +916,10 @@ class Controller(object):
         Stores the current execution context into the session
         :return: None, session object gets updated
         """
+        if self.q_encoded is not None:
+            return  # Query has not been used, hence not altered, since it was read from the session
         if self.q:
-            session[c.SESS_QUERY] = self.q.to_dict()
+            session[c.SESS_QUERY] = encodeModel(self.q)
             session.modified = True
 
     def clearSessionContext(self):
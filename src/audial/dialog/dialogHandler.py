@@ -224,7 +224,7 @@ class DialogHandler(object):
         """
         votes = []
         if LEARNING_ENABLED:
-            model = loadLearningModel()
+            model = loadLearningVotesOfKeys(learning_keys)
             if model:
                 for k in learning_keys:
                     key_votes = model.get(k, [])
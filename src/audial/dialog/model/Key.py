@@ -1,5 +1,5 @@
 class Key(object):
-
+    __slots__ = ('text', 'oe_id', 'triples')
     NEIGHBORS_NONE = 'Neighbors_None'
 
     def __init__(self, text=''):
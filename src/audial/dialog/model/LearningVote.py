@@ -2,6 +2,8 @@ import uuid
 
 
 class LearningVote(object):
+    __slots__ = ('id', 'identifier', 'triples', 'uris', 'score', 'task')
+
     def __init__(self):
         """
         LearningVote constructor
@@ -4,6 +4,8 @@ import uuid
 
 
 class Vote(object):
+    __slots__ = ('id', 'vote', 'candidate')
+
     def __init__(self):
         """
         Vote constructor
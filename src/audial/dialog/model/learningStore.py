@@ -0,0 +1,139 @@
+"""
+Persistent storage of the learning model: the learning votes of each learning Key, kept in a SQLite database in WAL
+mode. Keys are read and written individually, each write being an atomic transaction, so the cost of a vote does not
+depend on the size of the model and concurrent requests never overwrite each other's keys.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+BUSY_TIMEOUT = 10  # Seconds to wait for a concurrent writer before giving up
+SQLITE_VARIABLES = 500  # Maximum number of keys read with a single statement
+
+_stores = {}  # Key: path to a database; value: LearningStore instance
+_stores_lock = threading.Lock()
+
+
+class LearningStore(object):
+    """
+    Key -> learning votes store. Keys are given in their string form (str(Key)) and votes as lists of dictionaries
+    (LearningVote.to_dict()), as they were laid out in the former JSON learning model.
+    """
+    def __init__(self, path, legacy_path=None):
+        """
+        LearningStore constructor; creates the database if needed
+        :param path: string; path to the SQLite database
+        :param legacy_path: string; path to a JSON learning model to import when the database is created
+        """
+        self.path = path
+        self.local = threading.local()  # SQLite connections cannot be shared among threads
+        created = not os.path.isfile(path)
+        with self.__transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS votes (key TEXT PRIMARY KEY, votes TEXT NOT NULL)")
+        if created and legacy_path and os.path.isfile(legacy_path):
+            try:
+                with open(legacy_path, 'r') as f:
+                    self.put(json.load(f))
+            except ValueError:
+                pass  # Empty or corrupt legacy model: nothing to import
+
+    def __connection(self):
+        """
+        Returns the database connection of the current thread, opening it the first time
+        :return: sqlite3.Connection instance
+        """
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; never corrupt in WAL mode
+            self.local.db = db
+        return db
+
+    def __transaction(self):
+        """
+        Returns a context manager running its block in a write transaction of the current thread's connection
+        :return: _Transaction instance
+        """
+        return _Transaction(self.__connection())
+
+    def get(self, keys):
+        """
+        Returns the votes of the given keys
+        :param keys: iterable<string>; keys in string form
+        :return: dict<string, list<dict>>: votes of each key found
+        """
+        keys = list(set(keys))
+        found = {}
+        db = self.__connection()
+        for i in xrange(0, len(keys), SQLITE_VARIABLES):
+            chunk = keys[i:i + SQLITE_VARIABLES]
+            rows = db.execute("SELECT key, votes FROM votes WHERE key IN (%s)" % ','.join('?' * len(chunk)), chunk)
+            for key, votes in rows:
+                found[key] = json.loads(votes)
+        return found
+
+    def put(self, model, clear_existing=False):
+        """
+        Stores the votes of the given keys, replacing their previous votes, in a single transaction
+        :param model: dict<string, list<dict>>: votes of each key in string form
+        :param clear_existing: whether to remove all other keys
+        :return: None
+        """
+        with self.__transaction() as db:
+            if clear_existing:
+                db.execute("DELETE FROM votes")
+            db.executemany("INSERT OR REPLACE INTO votes (key, votes) VALUES (?, ?)",
+                           ((key, json.dumps(votes)) for key, votes in model.iteritems()))
+
+    def items(self):
+        """
+        Returns the whole model
+        :return: dict<string, list<dict>>: votes of each key in string form
+        """
+        return dict((key, json.loads(votes)) for key, votes in
+                    self.__connection().execute("SELECT key, votes FROM votes"))
+
+    def clear(self):
+        """
+        Removes all keys
+        :return: None
+        """
+        with self.__transaction() as db:
+            db.execute("DELETE FROM votes")
+
+
+class _Transaction(object):
+    """
+    Write transaction: BEGIN IMMEDIATE on entry, so that concurrent writers wait for each other; committed if its
+    block succeeds, rolled back otherwise
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.db.execute("COMMIT")
+        else:
+            self.db.execute("ROLLBACK")
+        return False
+
+
+def learningStoreOf(path, legacy_path=None):
+    """
+    Returns the shared store of the database at the given path, opening it the first time
+    :param path: string; path to the SQLite database
+    :param legacy_path: string; path to a JSON learning model to import when the database is created
+    :return: LearningStore instance
+    """
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = LearningStore(path, legacy_path)
+            _stores[path] = store
+        return store
@@ -2,67 +2,86 @@ import json
 import os
 from dialog.model.Key import *
 from dialog.model.LearningVote import *
+from dialog.model.learningStore import learningStoreOf
 
-MODEL_FILE = 'votes.json'
+MODEL_FILE = 'votes.json'  # Former JSON learning model; imported into the database when the latter is created
+MODEL_DB = 'votes.db'
 
 
 def loadLearningModel(deserialize=True):
     """
-    Load the current learning model from a serialized file on disk
+    Load the whole current learning model from disk
     :param deserialize: Whether to covert the loaded data to model classes (True; default) or keep it as a dict of
     builtin types (False)
     :return: dict<Key, list<LearningVote>>
     """
-    model_path = getLearningModelPath()
     model = {}
     try:
-        with open(model_path, 'a+') as f:
-            model_serialized = json.load(f)
-            if deserialize:
-                for key_str, vote_list_dict in model_serialized.iteritems():
-                    k = Key()
-                    key_dict = json.loads(key_str)
-                    k.from_dict(key_dict)
-                    votes = []
-                    for vote_dict in vote_list_dict:
-                        v = LearningVote()
-                        v.from_dict(vote_dict)
-                        votes.append(v)
-                    model[k] = votes
-            else:
-                model = model_serialized
+        model_serialized = getLearningStore().items()
+        if deserialize:
+            model = deserializeLearningModel(model_serialized)
+        else:
+            model = model_serialized
+    except Exception as e:
+        from warnings import warn
+        warn('Learning model could not be loaded from path: %s: %s' % (getLearningModelPath(), str(e)))
+    finally:
+        return model
+
+
+def loadLearningVotesOfKeys(keys):
+    """
+    Load the learning votes of the given keys from disk, without loading the rest of the learning model
+    :param keys: iterable<Key>
+    :return: dict<Key, list<LearningVote>>: votes of each of the given keys found in the model
+    """
+    model = {}
+    try:
+        model = deserializeLearningModel(getLearningStore().get(str(k) for k in keys))
     except Exception as e:
         from warnings import warn
-        warn('Learning model could not be loaded from path: %s: %s' % (model_path, str(e)))
+        warn('Learning model could not be loaded from path: %s: %s' % (getLearningModelPath(), str(e)))
     finally:
         return model
 
 
+def deserializeLearningModel(model_serialized):
+    """
+    Converts a learning model of builtin types to model classes
+    :param model_serialized: dict<string, list<dict>>
+    :return: dict<Key, list<LearningVote>>
+    """
+    model = {}
+    for key_str, vote_list_dict in model_serialized.iteritems():
+        k = Key()
+        key_dict = json.loads(key_str)
+        k.from_dict(key_dict)
+        votes = []
+        for vote_dict in vote_list_dict:
+            v = LearningVote()
+            v.from_dict(vote_dict)
+            votes.append(v)
+        model[k] = votes
+    return model
+
+
 def saveLearningModel(model, clear_existing=False):
     """
-    Serialize and store a learning model to disk
+    Serialize and store a learning model to disk. Only the keys of the given model are written; their votes are
+    replaced by the given ones.
     :param model: A dict<Key, list<LearningVote>> containing the learning model
     :param clear_existing: Whether to clear the existing learning model (True) or keep it (False; default)
     :return: True on successful storage; False otherwise
     """
-    model_path = getLearningModelPath()
     success = True
     try:
-        if clear_existing:
-            model_dict = {}
-        else:
-            model_dict = loadLearningModel(deserialize=False)
-        with open(model_path, 'w') as f:
-            for key, vote_list in model.iteritems():
-                vote_dict_list = []
-                key_str = str(key)
-                for v in vote_list:
-                    vote_dict_list.append(v.to_dict())
-                model_dict[key_str] = vote_dict_list
-            json.dump(model_dict, f)
+        model_dict = {}
+        for key, vote_list in model.iteritems():
+            model_dict[str(key)] = [v.to_dict() for v in vote_list]
+        getLearningStore().put(model_dict, clear_existing)
     except Exception as e:
         from warnings import warn
-        warn('Learning model could not be stored to file %s: %s' % (model_path, str(e)))
+        warn('Learning model could not be stored to file %s: %s' % (getLearningModelPath(), str(e)))
         success = False
     finally:
         return success
@@ -73,13 +92,21 @@ def clearLearningModel():
     Clear the persisted learning model
     :return: True on success; False otherwise
     """
-    model = {}
-    return saveLearningModel(model)
+    return saveLearningModel({}, clear_existing=True)
+
+
+def getLearningStore():
+    """
+    Returns the store of the learning model
+    :return: LearningStore instance
+    """
+    storage = os.path.normpath(os.path.join(os.path.dirname(__file__), "../storage"))
+    return learningStoreOf(getLearningModelPath(), os.path.join(storage, MODEL_FILE))
 
 
 def getLearningModelPath():
     """
     Returns the platform-specific path to the learning model
-    :return: string; absolute path to the json file with the serialized learning model
+    :return: string; absolute path to the database with the learning model
     """
-    return os.path.normpath(os.path.join(os.path.dirname(__file__), "../storage", MODEL_FILE))
+    return os.path.normpath(os.path.join(os.path.dirname(__file__), "../storage", MODEL_DB))
@@ -0,0 +1,204 @@
+"""
+Batch computation of the similarity scores of SuggestionGenerator.computeSimilarityScore, scoring one user text
+against many candidate texts at once.
+
+With textdistance's default (character-level) settings, the Monge-Elkan similarity of two different strings a and b
+is the fraction of the characters of a that appear in b, so it is computed for all candidates at once from a matrix
+of per-candidate character counts. The soundex codes, synonyms and character counts of candidate texts are computed
+once per chart and kept for subsequent dialogues.
+"""
+import threading
+import numpy as np
+from dialog.config import VOTE_CRITERIA_WEIGHTS
+from NLP.NLHandler import synonymsOfWord, soundex
+
+_scorers = {}  # Key: session/store index of a chart; value: SimilarityScorer instance
+_scorers_lock = threading.Lock()
+
+
+class SimilarityScorer(object):
+    """
+    Scores user texts against candidate texts, with the same results as SuggestionGenerator.computeSimilarityScore
+    """
+    def __init__(self):
+        """
+        SimilarityScorer constructor
+        """
+        self.rows = {}  # Key: text; value: its row in self.counts
+        self.columns = {}  # Key: character; value: its column in self.counts
+        self.counts = np.zeros((64, 64), dtype=np.int32)  # Occurrences of each character in each text
+        self.codes = {}  # Key: text; value: its soundex code
+        self.synonyms = {}  # Key: (text, number of synonyms); value: list<string>: synonyms of the text
+        self.jaro = {}  # Key: pair of soundex codes; value: Jaro similarity between them
+        self.lock = threading.Lock()
+
+    def scores(self, text, candidates, with_synonyms=3):
+        """
+        Returns the similarity score between a text and each of the given candidates
+        :param text: string; user text
+        :param candidates: list<string>; candidate texts
+        :param with_synonyms: int; how many synonyms from each text to consider for the final score
+        :return: numpy array of floats; similarity score between text and each candidate, in the same order
+        """
+        n = len(candidates)
+        if n == 0:
+            return np.zeros(0)
+        syns_text = synonymsOfWord(text, pos_tag=None, n_synonyms=with_synonyms) if with_synonyms > 0 else []
+        with self.lock:
+            rows = np.array([self.__rowOf(c) for c in candidates], dtype=np.intp)
+            for s in syns_text:
+                self.__columnsOf(s)
+            self.__columnsOf(text)
+            counts = self.counts[rows]  # Copy; the matrix may grow once the lock is released
+            syn_rows, syn_owners, syn_texts = [], [], []
+            n_syns = np.zeros(n)
+            if with_synonyms > 0:
+                for i, c in enumerate(candidates):
+                    for s in self.__synonymsOf(c, with_synonyms):
+                        syn_rows.append(self.__rowOf(s))
+                        syn_owners.append(i)
+                        syn_texts.append(s)
+                        n_syns[i] += 1
+            syn_counts = self.counts[np.array(syn_rows, dtype=np.intp)]
+            columns = dict(self.columns)
+            sound = self.__soundexSimilarities(text, candidates)
+        sim_main = self.__mongeElkan(text, candidates, counts, columns)
+        simsyn_one = np.zeros(n)
+        if syns_text:
+            for s in syns_text:
+                simsyn_one += self.__mongeElkan(s, candidates, counts, columns)
+            simsyn_one /= len(syns_text)
+        simsyn_two = np.zeros(n)
+        if syn_rows:
+            in_text = np.zeros(syn_counts.shape[1], dtype=np.int32)
+            for ch in set(text):
+                if ch in columns:
+                    in_text[columns[ch]] = 1
+            lengths = np.array([len(s) for s in syn_texts], dtype=float)
+            sims = syn_counts.dot(in_text) / lengths
+            for j, s in enumerate(syn_texts):
+                if s == text:
+                    sims[j] = len(s)
+                elif not s or not text:
+                    sims[j] = 0.0
+            for j, i in enumerate(syn_owners):  # Summed in order, as computeSimilarityScore does
+                simsyn_two[i] += sims[j]
+            has_syns = n_syns > 0
+            simsyn_two[has_syns] /= n_syns[has_syns]
+        w_main = VOTE_CRITERIA_WEIGHTS[0]
+        w_sound = VOTE_CRITERIA_WEIGHTS[1]
+        w_syn = VOTE_CRITERIA_WEIGHTS[2] / 2.0
+        if with_synonyms == 0:
+            w_main += w_syn
+            w_sound += w_syn
+        return w_main * sim_main + w_sound * sound + w_syn * simsyn_one + w_syn * simsyn_two
+
+    def __mongeElkan(self, text, candidates, counts, columns):
+        """
+        Returns the Monge-Elkan similarity between a text and each candidate
+        :param text: string
+        :param candidates: list<string>
+        :param counts: numpy array; character counts of the candidates, one row each
+        :param columns: dict; column of each character in counts
+        :return: numpy array of floats
+        """
+        sims = np.zeros(len(candidates))
+        if not text:
+            return sims
+        weights = np.zeros(counts.shape[1], dtype=np.int32)  # Occurrences of each character in text
+        for ch in text:
+            if ch in columns:
+                weights[columns[ch]] += 1
+        sims = (counts > 0).dot(weights) / float(len(text))
+        for i, c in enumerate(candidates):
+            if c == text:
+                sims[i] = len(text)
+            elif not c:
+                sims[i] = 0.0
+        return sims
+
+    def __soundexSimilarities(self, text, candidates):
+        """
+        Returns the soundex phonetic similarity between a text and each candidate, as soundexSimilarityBetweenWords
+        :param text: string
+        :param candidates: list<string>
+        :return: numpy array of floats
+        """
+        sims = np.zeros(len(candidates))
+        if not text:
+            return sims
+        from textdistance import jaro
+        code = soundex(text)
+        for i, c in enumerate(candidates):
+            if c:
+                c_code = self.codes.get(c)
+                if c_code is None:
+                    c_code = self.codes[c] = soundex(c)
+                key = (code, c_code)
+                sim = self.jaro.get(key)
+                if sim is None:
+                    sim = float(jaro(code, c_code))
+                    if sim <= 0.5:  # Minimum soundex similarity is 0.5 because of padding zeroes
+                        sim = 0.0
+                    self.jaro[key] = sim
+                sims[i] = sim
+        return sims
+
+    def __synonymsOf(self, text, n):
+        """
+        Returns the synonyms of a candidate text
+        :param text: string
+        :param n: int; maximum number of synonyms
+        :return: list<string>
+        """
+        key = (text, n)
+        syns = self.synonyms.get(key)
+        if syns is None:
+            syns = self.synonyms[key] = synonymsOfWord(text, pos_tag=None, n_synonyms=n)
+        return syns
+
+    def __columnsOf(self, text):
+        """
+        Adds the characters of a text to the columns of the count matrix
+        :param text: string
+        :return: None
+        """
+        for ch in text:
+            if ch not in self.columns:
+                self.columns[ch] = len(self.columns)
+        if len(self.columns) > self.counts.shape[1]:
+            grown = np.zeros((self.counts.shape[0], 2 * len(self.columns)), dtype=np.int32)
+            grown[:, :self.counts.shape[1]] = self.counts
+            self.counts = grown
+
+    def __rowOf(self, text):
+        """
+        Returns the row of a text in the count matrix, adding it if needed
+        :param text: string
+        :return: int
+        """
+        row = self.rows.get(text)
+        if row is None:
+            self.__columnsOf(text)
+            row = self.rows[text] = len(self.rows)
+            if row >= self.counts.shape[0]:
+                grown = np.zeros((2 * self.counts.shape[0], self.counts.shape[1]), dtype=np.int32)
+                grown[:self.counts.shape[0]] = self.counts
+                self.counts = grown
+            for ch in text:
+                self.counts[row, self.columns[ch]] += 1
+        return row
+
+
+def similarityScorerOf(o):
+    """
+    Returns the similarity scorer of the chart handled by the given ontology, creating it the first time
+    :param o: UpperOntology instance
+    :return: SimilarityScorer instance
+    """
+    with _scorers_lock:
+        scorer = _scorers.get(o.sess_id)
+        if scorer is None:
+            scorer = SimilarityScorer()
+            _scorers[o.sess_id] = scorer
+        return scorer
@@ -81,24 +81,25 @@ class SuggestionGenerator(object):
         if key_text and isinstance(self.o, UpperVisOntology):
             from dialog.learning.util import PRIORITY_DIAG_LABELS
             from general_util import numbersInText
-            i = 0
+            oes = {}  # Key: Literal string; value: OntologyLiteralElement with that Literal
+            texts = []
             for element, prop, text_literal in self.o.yieldTextElement():
                 if text_literal:
                     text = str(text_literal)
-                    if text in votes:
-                        votes[text].candidate.OE.triples.append((str(element), str(prop), text))
-                    else:
-                        oe = self.createOntologyElementforURI(text, 'literal', check_exists=False)
-                        oe.triples.append((str(element), str(prop), text))
-                        v = self.createVote(key_text, oe)
-                        if PRIORITY_DIAG_LABELS and v.vote < 1:
-                            v.vote += 0.2
-                        votes[text] = v
-                        i += 1
-                        if i >= limit:
-                            break
+                    if text not in oes:
+                        oes[text] = self.createOntologyElementforURI(text, 'literal', check_exists=False)
+                        texts.append(text)
+                    oes[text].triples.append((str(element), str(prop), text))
+                    if len(texts) >= limit:
+                        break
                 else:
                     break
+            scores = self.similarityScores(key_text, [self.humanNameOf(oes[text]) for text in texts])
+            for text, score in zip(texts, scores):
+                v = self.createVote(key_text, oes[text], score=score)
+                if PRIORITY_DIAG_LABELS and v.vote < 1:
+                    v.vote += 0.2
+                votes[text] = v
             # Look for numbers in the key text and offer votes for chart values
             numbers = numbersInText(key_text)
             for n in numbers:
@@ -119,10 +120,12 @@ class SuggestionGenerator(object):
         votes = []
         if not self.q.task:  # If task has already been found there is no need to cast task votes
             tasks = self.o.getTaskVerbalizations()
+            all_verbs = [v for verbs in tasks.itervalues() for v in verbs]
+            scores = dict(zip(all_verbs, self.similarityScores(key_text, all_verbs)))
             for t, verbs in tasks.iteritems():
                 best_sim = -1
                 for v in verbs:
-                    sim = self.computeSimilarityScore(key_text, v)
+                    sim = scores[v]
                     if sim > best_sim:
                         best_sim = sim
                 vote = Vote()
@@ -149,7 +152,7 @@ class SuggestionGenerator(object):
         if skip_uris is None:
             skip_uris = []
         suggestions = []
-        votes = []
+        oes = []
         for oe in oe_list:
             if isinstance(oe, OntologyElement) and oe.print_uri() not in skip_uris:
                 oe_uri = oe.uri
@@ -163,9 +166,12 @@ class SuggestionGenerator(object):
                     if isinstance(oe, OntologyDatatypePropertyElement) and sc_neighbor:
                         oe.governor = sc_neighbor.OE
                         oe.range = self.o.rangeOfProperty(oe_uri, stripns=False)
-                    vote = self.createVote(text, oe)
-                    votes.append(vote)
-                    votes.extend(self.createAdditionalVotes(text, oe, poc, added=False))
+                    oes.append(oe)
+        votes = []
+        scores = self.similarityScores(text, [self.humanNameOf(oe) for oe in oes])
+        for oe, score in zip(oes, scores):
+            votes.append(self.createVote(text, oe, score=score))
+            votes.extend(self.createAdditionalVotes(text, oe, poc, added=False, score=score))
         return votes
 
     def createFilterVotes(self, key, filter_instance, focus, add_vis=True, add_none=True):
@@ -336,28 +342,52 @@ class SuggestionGenerator(object):
                         break
         return oes
 
-    def createVote(self, text, oe, task=None):
+    def createVote(self, text, oe, task=None, score=None):
         """
         Creates a new Vote from the given parameters
         :param text: User-input text from a SuggestionKey
         :param oe: OntologyElement instance
         :param task: Ontology task
+        :param score: float; similarity score between text and the OE, if already computed; None to compute it
         :return: Vote instance
         """
         vote = None
         if isinstance(oe, OntologyElement):
             vote = Vote()
-            name = self.o.stripNamespace(oe.uri)
-            if not name:
-                name = oe.uri
-            human_name = beautifyOutputString(name)
             sc = SemanticConcept()
             sc.OE = oe.deepcopy()
             sc.task = task
             vote.candidate = sc
-            vote.vote = self.computeSimilarityScore(text, human_name)
+            if score is None:
+                score = self.similarityScores(text, [self.humanNameOf(oe)])[0]
+            vote.vote = score
         return vote
 
+    def humanNameOf(self, oe):
+        """
+        Returns the name of an OntologyElement shown to users, which votes for it are scored against
+        :param oe: OntologyElement instance
+        :return: string
+        """
+        name = self.o.stripNamespace(oe.uri)
+        if not name:
+            name = oe.uri
+        return beautifyOutputString(name)
+
+    def similarityScores(self, text, candidates):
+        """
+        Returns the similarity score between a text and each of the given candidate texts, as computed by
+        computeSimilarityScore
+        :param text: string; user text
+        :param candidates: list<string>; candidate texts
+        :return: list<float>: similarity score of each candidate, in the same order
+        """
+        try:
+            from dialog.similarityScorer import similarityScorerOf
+        except ImportError:  # NumPy not installed
+            return [self.computeSimilarityScore(text, c) for c in candidates]
+        return [float(s) for s in similarityScorerOf(self.o).scores(text, candidates)]
+
     def createNoneVote(self, poc=None):
         """
         Creates a lowest-priority Vote for an empty option
@@ -377,13 +407,14 @@ class SuggestionGenerator(object):
         vote.vote = -1.0
         return vote
 
-    def createAdditionalVotes(self, text, oe, poc, added):
+    def createAdditionalVotes(self, text, oe, poc, added, score=None):
         """
         Generates new votes from a given OE to consider common numerical tasks
         :param text: User-input text from a SuggestionKey
         :param oe: OntologyElement instance
         :param poc: POC instance
         :param added: Whether the OE has already been added to the suggestions
+        :param score: float; similarity score between text and the OE, if already computed; None to compute it
         :return: List<Vote> additional votes
         """
         suggestions = []
@@ -393,7 +424,7 @@ class SuggestionGenerator(object):
                 for task in QUICK_TASKS:
                     new_oe = oe.deepcopy()
                     new_oe.added = added
-                    vote = self.createVote(text, new_oe, task)
+                    vote = self.createVote(text, new_oe, task, score)
                     suggestions.append(vote)
         return suggestions
 
@@ -130,3 +130,21 @@ def deleteDirContents(path, ignore=None):
                     os.unlink(os.path.join(root, f))
             for d in dirs:
                 shutil.rmtree(os.path.join(root, d))
+
+
+def copyBuiltin(value):
+    """
+    Deep copy of a value made of built-in types (e.g. dictionaries of lists of strings); immutable leaves such as
+    strings and numbers are shared with the original
+    :param value: dict, list, set, tuple or immutable value
+    :return: copy of value
+    """
+    if isinstance(value, dict):
+        return dict((k, copyBuiltin(v)) for k, v in value.iteritems())
+    elif isinstance(value, list):
+        return [copyBuiltin(v) for v in value]
+    elif isinstance(value, tuple):
+        return tuple(copyBuiltin(v) for v in value)
+    elif isinstance(value, set):
+        return set(value)
+    return value
@@ -1,7 +1,9 @@
 import logging
-import logging.handlers
+import os
+import threading
 import time
 from flask import session
+from logger.QueuedLogging import QueuedFileHandler
 from general_util import truncateString
 from NLP.model.POC import POC
 
@@ -9,6 +11,9 @@ LOG_REL_DIR = 'logs'  # Relative directory to log files
 MAX_BYTES = 10485760  # Maximum size of each log file (default: 10 MiB)
 SYS_BACKUP_N = 5  # Maximum number of previous system log files to keep
 SES_BACKUP_N = 2  # Maximum number of previous individual session log files to keep
+LOG_DIR = os.path.join(os.path.dirname(__file__), LOG_REL_DIR)
+FORMATTER = logging.Formatter("%(asctime)s - %(uname)s - %(message)s", "%d-%m-%Y %H:%M:%S")
+_handlers_lock = threading.Lock()  # Held while attaching the file handlers of the process-wide loggers
 
 
 class AudialLogger(object):
@@ -17,32 +22,29 @@ class AudialLogger(object):
     """
     def __init__(self):
         """
-        Logger constructor
+        Logger constructor; records are written to the log files in the background (see logger.QueuedLogging)
         """
-        import os
-        log_dir = os.path.join(os.path.dirname(__file__), LOG_REL_DIR)
         self.start_time = 0.0
         self.system_logger = logging.getLogger(__name__)
-        formatter = logging.Formatter("%(asctime)s - %(uname)s - %(message)s", "%d-%m-%Y %H:%M:%S")
         if not self.system_logger.handlers:
-            sysh = logging.handlers.RotatingFileHandler("%s/%s.log" % (log_dir, __name__),
-                                                        maxBytes=MAX_BYTES,
-                                                        backupCount=SYS_BACKUP_N)
-            sysh.setLevel(logging.DEBUG)
-            sysh.setFormatter(formatter)
-            self.system_logger.setLevel(logging.DEBUG)
-            self.system_logger.addHandler(sysh)
+            with _handlers_lock:
+                if not self.system_logger.handlers:  # Another thread may have set it up meanwhile
+                    self.system_logger.setLevel(logging.DEBUG)
+                    self.system_logger.addHandler(QueuedFileHandler(lambda r: "%s/%s.log" % (LOG_DIR, __name__),
+                                                                    FORMATTER, MAX_BYTES, SYS_BACKUP_N))
         self.session_logger = None
+        self.sid = None
         if session:
-            self.session_logger = logging.getLogger(session.sid)
+            self.sid = session.sid
+            self.session_logger = logging.getLogger('%s.sessions' % __name__)  # Shared; records carry their sid
             if not self.session_logger.handlers:
-                sessh = logging.handlers.RotatingFileHandler("%s/session-%s.log" % (log_dir, session.sid),
-                                                             maxBytes=MAX_BYTES,
-                                                             backupCount=SES_BACKUP_N)
-                sessh.setLevel(logging.INFO)
-                sessh.setFormatter(formatter)
-                self.session_logger.setLevel(logging.INFO)
-                self.session_logger.addHandler(sessh)
+                with _handlers_lock:
+                    if not self.session_logger.handlers:  # Another thread may have set it up meanwhile
+                        self.session_logger.setLevel(logging.INFO)
+                        self.session_logger.propagate = False
+                        self.session_logger.addHandler(
+                            QueuedFileHandler(lambda r: "%s/session-%s.log" % (LOG_DIR, r.sid),
+                                              FORMATTER, MAX_BYTES, SES_BACKUP_N))
 
     def log_query(self, query, exec_log_start=True):
         """
@@ -54,7 +56,7 @@ class AudialLogger(object):
         if exec_log_start:
             self.start_exec_log()
         msg = "Input query: '%s'" % query
-        self.session_logger.info(msg, extra={'uname': self.__uname()})
+        self.__log(msg)
 
     def log_vote(self, vote, exec_log_start=True):
         """
@@ -70,7 +72,7 @@ class AudialLogger(object):
         else:
             label = vote.OE.uri if vote.OE.uri else 'None'
         msg = "Vote for '%s' casted." % label
-        self.session_logger.info(msg, extra={'uname': self.__uname()})
+        self.__log(msg)
 
     def log_answer(self, answer):
         """
@@ -82,7 +84,7 @@ class AudialLogger(object):
         msg = "Answer: %s " % truncateString(answer)
         if ex_time > 0:
             msg += "Elapsed: %.2f seconds." % ex_time
-        self.session_logger.info(msg, extra={'uname': self.__uname()})
+        self.__log(msg)
 
     def log_command(self, command, answer):
         """
@@ -95,7 +97,7 @@ class AudialLogger(object):
         msg = "Executed Command: %s. Answer: %s." % (truncateString(command), truncateString(answer))
         if ex_time > 0:
             msg += "Elapsed: %.2f seconds." % ex_time
-        self.session_logger.info(msg, extra={'uname': self.__uname()})
+        self.__log(msg)
 
     def log_dialog(self, suggestion_pair):
         """
@@ -108,7 +110,7 @@ class AudialLogger(object):
             msg = "Dialog for '%s' shown " % suggestion_pair['text']
             msg += "(%d suggestions). " % len(suggestion_pair['votes'])
             msg += "Elapsed: %.2f seconds." % ex_time
-            self.session_logger.info(msg, extra={'uname': self.__uname()})
+            self.__log(msg)
 
     def start_exec_log(self):
         """
@@ -129,6 +131,14 @@ class AudialLogger(object):
         self.start_time = 0.0
         return ex_time
 
+    def __log(self, msg):
+        """
+        Logs a message in the user's session log
+        :param msg: string
+        :return: None
+        """
+        self.session_logger.info(msg, extra={'uname': self.__uname(), 'sid': self.sid})
+
     def __uname(self):
         """
         Returns the current user name to be displayed in logs
@@ -0,0 +1,196 @@
+"""
+Timing spans of the query answering stages. The duration of each span is aggregated into a histogram per stage and
+chart, exposed in the Prometheus text format and as percentiles, and written as a JSON line to a rotating traces file.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from flask import has_request_context, session
+from logger.Logger import LOG_DIR, MAX_BYTES, SYS_BACKUP_N
+from logger.QueuedLogging import QueuedFileHandler
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Upper bounds of histogram buckets (s)
+SAMPLES_KEPT = 1024  # Latest durations kept per histogram to compute percentiles from
+TRACES_ENABLED = True  # Whether to write each span to the traces file
+TRACES_FILE = 'traces.jsonl'
+
+_histograms = {}  # Key: (stage, chart); value: StageHistogram instance
+_histograms_lock = threading.Lock()
+_local = threading.local()  # Spans currently open in each thread
+_traces_lock = threading.Lock()  # Held while setting up the traces logger
+
+
+class StageHistogram(object):
+    """
+    Durations of a stage: cumulative bucket counts as Prometheus histograms have, and the latest samples
+    """
+    def __init__(self):
+        """
+        StageHistogram constructor
+        """
+        self.buckets = [0] * (len(BUCKETS) + 1)  # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        Records a duration
+        :param seconds: float
+        :return: None
+        """
+        with self.lock:
+            self.buckets[bisect_left(BUCKETS, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            self.samples.append(seconds)
+
+    def percentile(self, p):
+        """
+        Returns a percentile of the latest durations
+        :param p: float; percentile, in [0, 100]
+        :return: float; seconds; None if there are no durations yet
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))]
+
+
+def histogramOf(stage, chart):
+    """
+    Returns the histogram of a stage in a chart, creating it if needed
+    :param stage: string; stage name
+    :param chart: string; chart (session ID prefix)
+    :return: StageHistogram instance
+    """
+    key = (stage, chart or '')
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = StageHistogram()
+        return histogram
+
+
+@contextmanager
+def span(stage, chart=''):
+    """
+    Times the enclosed block as a stage of the current request, e.g.:
+        with span('consolidation', self.o.sess_id):
+            ...
+    :param stage: string; stage name
+    :param chart: string; chart (session ID prefix)
+    """
+    parents = getattr(_local, 'spans', None)
+    if parents is None:
+        parents = _local.spans = []
+    parents.append(stage)
+    start = time.time()
+    try:
+        yield
+    finally:
+        seconds = time.time() - start
+        parents.pop()
+        histogramOf(stage, chart).observe(seconds)
+        if TRACES_ENABLED:
+            _trace(stage, chart, start, seconds, parents[-1] if parents else None)
+
+
+def _trace(stage, chart, start, seconds, parent):
+    """
+    Writes a span to the traces file
+    :param stage: string; stage name
+    :param chart: string; chart (session ID prefix)
+    :param start: float; start time of the span
+    :param seconds: float; duration of the span
+    :param parent: string; stage of the enclosing span; None if none
+    :return: None
+    """
+    record = {'ts': round(start, 3), 'stage': stage, 'chart': chart, 'ms': round(seconds * 1000, 3),
+              'parent': parent, 'thread': threading.current_thread().ident}
+    if has_request_context() and session:
+        record['sid'] = session.sid
+    _tracesLogger().info(json.dumps(record, sort_keys=True))
+
+
+def _tracesLogger():
+    """
+    Returns the logger writing the traces file
+    :return: logging.Logger instance
+    """
+    traces_logger = logging.getLogger('%s.traces' % __name__)
+    if not traces_logger.handlers:
+        with _traces_lock:
+            if not traces_logger.handlers:  # Another thread may have set it up meanwhile
+                path = os.path.join(LOG_DIR, TRACES_FILE)
+                traces_logger.setLevel(logging.INFO)
+                traces_logger.propagate = False
+                traces_logger.addHandler(QueuedFileHandler(lambda r: path, logging.Formatter("%(message)s"),
+                                                           MAX_BYTES, SYS_BACKUP_N))
+    return traces_logger
+
+
+def stageStatistics():
+    """
+    Returns the number of spans and the mean, p50 and p99 durations of each stage and chart
+    :return: dict<string, dict<string, dict>>; stage -> chart -> statistics, durations in milliseconds
+    """
+    with _histograms_lock:
+        histograms = _histograms.items()
+    stats = {}
+    for (stage, chart), h in histograms:
+        p50, p99 = h.percentile(50), h.percentile(99)
+        stats.setdefault(stage, {})[chart] = {
+            'count': h.count,
+            'mean_ms': round(h.sum / h.count * 1000, 3) if h.count else None,
+            'p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+            'p99_ms': round(p99 * 1000, 3) if p99 is not None else None
+        }
+    return stats
+
+
+def prometheusText():
+    """
+    Returns the stage histograms in the Prometheus text exposition format
+    :return: string
+    """
+    name = 'audial_stage_duration_seconds'
+    lines = ['# HELP %s Duration of query answering stages.' % name, '# TYPE %s histogram' % name]
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+    for (stage, chart), h in histograms:
+        labels = 'stage="%s",chart="%s"' % (_escape(stage), _escape(chart))
+        with h.lock:
+            buckets, count, total = list(h.buckets), h.count, h.sum
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += n
+            lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative))
+        lines.append('%s_sum{%s} %.6f' % (name, labels, total))
+        lines.append('%s_count{%s} %d' % (name, labels, count))
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    """
+    Escapes a Prometheus label value
+    :param value: string
+    :return: string
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def clearMetrics():
+    """
+    Discards all recorded durations
+    :return: None
+    """
+    with _histograms_lock:
+        _histograms.clear()
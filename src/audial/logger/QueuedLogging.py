@@ -0,0 +1,212 @@
+"""
+Non-blocking logging to rotating files. Log records are appended to a queue by the request threads, which takes no
+lock, and written in batches by a single background thread every FLUSH_INTERVAL seconds; files are flushed once per
+batch rather than once per record. The writer keeps the files it writes to open in a bounded LRU: files not written to
+for a while, and the least recently used ones beyond the maximum, are closed, and are reopened (appending) when written
+to again.
+"""
+import atexit
+import logging
+import logging.handlers
+import threading
+import time
+from collections import OrderedDict, deque
+
+QUEUE_SIZE = 10000  # Maximum number of records waiting to be written; further records are dropped
+FLUSH_INTERVAL = 0.2  # Seconds between batches of writes
+MAX_OPEN_FILES = 32  # Maximum number of log files kept open
+IDLE_TIMEOUT = 60  # Seconds after which a log file not written to is closed
+CLOSE_TIMEOUT = 5  # Seconds to wait for pending records to be written when closing the log files
+
+_queue = deque()  # Items: (QueuedFileHandler, LogRecord) or (_CLOSE, threading.Event, stop); appends are atomic
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {'written': 0, 'dropped': 0, 'opened': 0, 'closed': 0}
+_CLOSE = object()  # Queue item asking the writer to close all files
+
+
+class _BatchedFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler which is only flushed on demand
+    """
+    def flush(self):
+        pass
+
+    def flushBatch(self):
+        """
+        Flushes the records written since the last call
+        :return: None
+        """
+        logging.handlers.RotatingFileHandler.flush(self)
+
+
+class QueuedFileHandler(logging.Handler):
+    """
+    Logging handler queueing records to be written to a rotating file by the writer thread
+    """
+    def __init__(self, path_of, formatter, max_bytes, backup_count):
+        """
+        QueuedFileHandler constructor
+        :param path_of: function; given a log record, returns the path of the file to write it to
+        :param formatter: logging.Formatter instance
+        :param max_bytes: int; size of a file after which it is rotated
+        :param backup_count: int; number of rotated files to keep
+        """
+        logging.Handler.__init__(self)
+        self.setFormatter(formatter)
+        self.path_of = path_of
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def emit(self, record):
+        record.msg = record.getMessage()  # Arguments may change before the record is written
+        record.args = None
+        if len(_queue) >= QUEUE_SIZE:
+            _stats['dropped'] += 1
+            return
+        _queue.append((self, record))
+        if _writer is None:
+            _startWriter()
+
+
+class _LogWriter(threading.Thread):
+    """
+    Background thread writing queued records
+    """
+    def __init__(self):
+        threading.Thread.__init__(self, name='log-writer')
+        self.daemon = True
+        self.files = OrderedDict()  # Key: path; value: (last write time, _BatchedFileHandler). LRU first
+
+    def run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            touched = set()
+            while _queue:
+                item = _queue.popleft()
+                if item[0] is _CLOSE:
+                    self.flush(touched)
+                    touched.clear()
+                    self.closeAll()
+                    item[1].set()
+                    if item[2]:
+                        return
+                else:
+                    touched.add(self.write(*item))
+            self.flush(touched)
+            self.closeIdle(time.time())
+
+    def write(self, handler, record):
+        """
+        Writes a record to its file, opening it if needed
+        :param handler: QueuedFileHandler instance which queued the record
+        :param record: logging.LogRecord instance
+        :return: _BatchedFileHandler instance the record was written to; None if it could not be written
+        """
+        try:
+            path = handler.path_of(record)
+            now = time.time()
+            entry = self.files.pop(path, None)
+            if entry is None:
+                fh = _BatchedFileHandler(path, maxBytes=handler.max_bytes, backupCount=handler.backup_count,
+                                         delay=True)
+                _stats['opened'] += 1
+            else:
+                fh = entry[1]
+            self.files[path] = (now, fh)
+            fh.setFormatter(handler.formatter)
+            fh.emit(record)
+            _stats['written'] += 1
+            while len(self.files) > MAX_OPEN_FILES:
+                self.close(next(self.files.iterkeys()))
+            return fh
+        except Exception:
+            return None
+
+    def flush(self, handlers):
+        """
+        Flushes the given file handlers
+        :param handlers: set<_BatchedFileHandler>
+        :return: None
+        """
+        for fh in handlers:
+            if fh is not None:
+                try:
+                    fh.flushBatch()
+                except Exception:
+                    pass
+
+    def close(self, path):
+        """
+        Closes a log file
+        :param path: string; path to the file
+        :return: None
+        """
+        _, fh = self.files.pop(path)
+        try:
+            fh.close()
+        except Exception:
+            pass
+        _stats['closed'] += 1
+
+    def closeIdle(self, now):
+        """
+        Closes the log files not written to within IDLE_TIMEOUT
+        :param now: float; current time
+        :return: None
+        """
+        while self.files:
+            path, (last_write, _) = next(self.files.iteritems())
+            if now - last_write < IDLE_TIMEOUT:
+                break  # Files are in order of last write
+            self.close(path)
+
+    def closeAll(self):
+        """
+        Closes all log files
+        :return: None
+        """
+        for path in self.files.keys():
+            self.close(path)
+
+
+def _startWriter():
+    """
+    Starts the writer thread if not running yet
+    :return: None
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            writer = _LogWriter()
+            writer.start()
+            _writer = writer
+
+
+def closeLogFiles(timeout=CLOSE_TIMEOUT, stop=False):
+    """
+    Writes the records queued so far and closes all log files, e.g. before they are removed; files are reopened when
+    written to again
+    :param timeout: float; seconds to wait for the records to be written
+    :param stop: bool; whether to stop the writer thread too, on exit
+    :return: bool; whether the files were closed within the timeout
+    """
+    if _writer is None or not _writer.is_alive():
+        return True
+    done = threading.Event()
+    _queue.append((_CLOSE, done, stop))
+    return done.wait(timeout)
+
+
+def logStatistics():
+    """
+    Returns counts of the records written and dropped, and of the log files opened, closed and currently open
+    :return: dict<string, int>
+    """
+    stats = dict(_stats)
+    stats['pending'] = len(_queue)
+    stats['open'] = stats['opened'] - stats['closed']
+    return stats
+
+
+atexit.register(closeLogFiles, stop=True)  # Before modules are torn down under the daemon writer thread
@@ -9,13 +9,16 @@ class Mapper(object):
     """
     Prepares a user's query tokens to be mapped to OCs
     """
-    def __init__(self, parser='stanford', tagger='stanford'):
+    def __init__(self, parser='stanford', tagger='stanford', deadline=None, endpoint=None):
         """
         Mapper class constructor
         :param parser: string; which NL parserto use: 'stanford' (default), or 'stanford_web'
         :param parser: tagger; which POS tagger to use: 'stanford' (default), or 'stanford_web'
+        :param deadline: float; seconds to wait for the NL web service on each socket operation (see
+        GraphNavStanfordParser), not for the whole parse; None for the default timeout
+        :param endpoint: string; URL of the NL web service; None for the one given in NLP/parser/config.py
         """
-        self.parser = GraphNavStanfordParser(parser=parser, posTagger=tagger)
+        self.parser = GraphNavStanfordParser(parser=parser, posTagger=tagger, deadline=deadline, endpoint=endpoint)
         self._toIgnore = []  # Children to be ignored when the father is ignored
 
     def processQuestion(self, text):
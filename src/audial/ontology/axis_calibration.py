@@ -0,0 +1,93 @@
+"""
+Calibration of the metric axis of a chart: maps element lengths to values in the units of the axis.
+"""
+import threading
+
+_calibrations = {}  # Key: session/store index of a chart; value: AxisCalibration instance
+_calibrations_lock = threading.RLock()
+
+
+class AxisCalibration(object):
+    """
+    Length-to-value conversion of a metric axis, computed once from the axis length and its extreme labels
+    """
+    def __init__(self, o, axis):
+        """
+        AxisCalibration constructor
+        :param o: UpperVisOntology instance
+        :param axis: string; name of the metric axis
+        """
+        self.axis = axis
+        self.dtype = o.getChartMeasurementDataType(axis)
+        self.length = o.lengthOfAxis(axis)
+        top_label, bottom_label = o.getExtremeLabels(axis)
+        top_text = o.getText(top_label)
+        if top_text is None:
+            self.length = o.computeAxisLengthFromLabels(axis)
+            top_label, bottom_label = o.getExtremeLabels(axis)
+            top_text = o.getText(top_label)
+            if top_text is None:
+                raise Exception("Axis not correctly labeled: top label not found.")
+        bottom_text = o.getText(bottom_label)
+        self.top = float(top_text)
+        self.bottom = float(bottom_text) if bottom_text is not None else 0.0
+        self.scale = abs(self.top - self.bottom) / self.length if self.length > 0 else 0.0
+        self.cardinal_info = o.getValue(axis, o.StatisticalProperty.EXPRESSES_CARDINAL_INFORMATION)
+        #  Elements and properties whose triples this calibration depends on
+        self.subjects = set([axis, top_label, bottom_label, self.cardinal_info])
+        self.properties = set([o.SyntacticProperty.HAS_SYNTACTIC_ROLE, o.SyntacticProperty.HAS_INFORMATIONAL_ROLE])
+
+    def valueOf(self, length):
+        """
+        Converts an element length to a value in the units of the axis
+        :param length: float; length of an element (e.g. a bar) along the axis
+        :return: float or int (if the axis expresses integers); None if the length or the axis length is not positive
+        """
+        value = None
+        if self.length > 0 and length > 0:
+            value = self.scale * length + self.bottom
+            if self.dtype == "int":
+                value = int(round(value))
+        return value
+
+    def dependsOn(self, s, p):
+        """
+        Returns whether a change in triples with the given subject and property may alter this calibration
+        :param s: string; name of the subject of the triples; None for any subject
+        :param p: string; name of the property of the triples; None for any property
+        :return: boolean
+        """
+        return s is None or s in self.subjects or p in self.properties
+
+
+def calibrationOf(o):
+    """
+    Returns the calibration of the metric axis of the chart handled by the given ontology, computing it the first time
+    :param o: UpperVisOntology instance
+    :return: AxisCalibration instance; None if the chart has no metric axis
+    """
+    with _calibrations_lock:
+        calibration = _calibrations.get(o.sess_id)
+        if calibration is None:
+            axis = o.getMetricAxis()
+            if axis:
+                calibration = AxisCalibration(o, axis)
+                _calibrations[o.sess_id] = calibration
+        return calibration
+
+
+def dropCalibration(sess_id, s=None, p=None):
+    """
+    Drops the calibration of a chart if it may be affected by a change in the triples with the given subject and
+    property
+    :param sess_id: string; session/store index of the chart
+    :param s: string; name of the subject of the changed triples; None for any
+    :param p: string; name of the property of the changed triples; None for any
+    :return: boolean; whether a calibration was dropped
+    """
+    with _calibrations_lock:
+        calibration = _calibrations.get(sess_id)
+        if calibration is not None and calibration.dependsOn(s, p):
+            del _calibrations[sess_id]
+            return True
+        return False
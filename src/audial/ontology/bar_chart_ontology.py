@@ -4,6 +4,7 @@ from NLP.util.TreeUtil import quick_norm
 from sys import float_info
 from rdflib import XSD
 from general_util import isNumber, stringOpToPython, numberToOrdinal, replaceLastCommaWithAnd
+from logger.Metrics import span
 
 
 class BarChartOntology(UpperVisOntology):
@@ -26,6 +27,17 @@ class BarChartOntology(UpperVisOntology):
         :param bars: list<string> bars to which the task will be applied
         :return: (string, boolean); answer in NL and whether the task could be computed
         """
+        task = self.stripNamespace(task_sc.task)
+        with span('task: %s' % task, self.sess_id):
+            return self.__computeAnalyticalTask(task, bars)
+
+    def __computeAnalyticalTask(self, task, bars):
+        """
+        Computes an analytical task on the given bars; see applyAnalyticalTask
+        :param task: string; task name, without namespace
+        :param bars: list<string> bars to which the task will be applied
+        :return: (string, boolean); answer in NL and whether the task could be computed
+        """
         answer = ''
         success = True
         add_units = True
@@ -36,7 +48,6 @@ class BarChartOntology(UpperVisOntology):
         else:
             units_answer = ''
         add_labels_bar = []  # Bars of which to add labels to output
-        task = self.stripNamespace(task_sc.task)
         if task == self.StructuralTask.DerivedValueTask.COMPARE:
             answer, success = self.computeCompare(bars)
             add_units = False
@@ -183,9 +194,27 @@ class BarChartOntology(UpperVisOntology):
             outputbars.extend(b)
         return outputbars
 
+    def getSummary(self):
+        """
+        Outputs a text summary of the chart: the summary of its contents, shared by all sessions, followed by the
+        elements tagged by the current user
+        :return: string; summary in NL
+        """
+        from ontology.summary_cache import summaryOf
+        output = summaryOf(self)
+        user_labels = self.getAllUserLabels()
+        if user_labels:
+            output += "Tagged elements:<br/>"
+            elements = self.getNavIndex().ordered(user_labels)
+            elements.extend(sorted(e for e in user_labels if e not in elements))
+            for element in elements:
+                output += "%s: %s<br/>" % (self.getElementFiltersString(element), user_labels[element])
+        output += "End of summary.<br/>"
+        return output
+
     def generateSummary(self):
         """
-        Outputs a text summary of the contents of the chart
+        Outputs a text summary of the contents of the chart, without the elements tagged by users; see getSummary
         """
         output = "This is a bar chart. "
 
@@ -303,10 +332,64 @@ class BarChartOntology(UpperVisOntology):
             if len(extremeMetric['min']) > 1:
                 output += ". Tied with %s other bars." % (len(extremeMetric['min']) - 1)
             output += "<br/>"
-
-        output += "End of summary.<br/>"
         return output
 
+    def getBarTable(self):
+        """
+        Returns the columnar snapshot of the bars of this chart, built once per loaded chart
+        :return: BarTable instance; None if NumPy is not available
+        """
+        try:
+            from ontology.bar_table import barTableOf
+        except ImportError:
+            return None
+        return barTableOf(self)
+
+    def _onTripleChanged(self, s, p):
+        """
+        Drops the bar snapshot, navigation index and summary when the whole graph may have changed (e.g. on reload),
+        and the label index if the changed triples may alter it
+        :param s: string; name of the subject of the changed triples; None if any subject may have changed
+        :param p: string; name of the property of the changed triples; None if any property may have changed
+        :return: None
+        """
+        from ontology.label_index import dropLabelIndex
+        from ontology.nav_index import dropNavIndex
+        from ontology.summary_cache import dropSummary
+        super(BarChartOntology, self)._onTripleChanged(s, p)
+        if s is None and p is None:
+            self.invalidateBarTable()
+            dropNavIndex(self.sess_id)
+            dropSummary(self.sess_id)
+        dropLabelIndex(self.sess_id, s, p)
+
+    def invalidateBarTable(self):
+        """
+        Drops the columnar snapshot of the bars of this chart so it is rebuilt on its next use
+        :return: None
+        """
+        try:
+            from ontology.bar_table import invalidateBarTable
+        except ImportError:
+            return
+        invalidateBarTable(self.sess_id)
+
+    def getLabelIndex(self):
+        """
+        Returns the inverted index from label text to the bars labeled by it, built once per loaded chart
+        :return: LabelIndex instance
+        """
+        from ontology.label_index import labelIndexOf
+        return labelIndexOf(self)
+
+    def getNavIndex(self):
+        """
+        Returns the navigation index of the bars of this chart, built once per navigation order
+        :return: NavIndex instance
+        """
+        from ontology.nav_index import navIndexOf
+        return navIndexOf(self)
+
     def getBars(self):
         """
         Returns all bars in the chart, both metric and stacked
@@ -397,27 +480,8 @@ class BarChartOntology(UpperVisOntology):
         @param metricBar: the name of a metric or stacked bar instance
         @return float: the value of the bar (same units as the axis)
         """
-        value = None
-        axis = self.getMetricAxis()
-        if axis:
-            dtype = self.getChartMeasurementDataType(axis)
-            axisLength = self.lengthOfAxis(axis)
-            (topl, bottoml) = self.getExtremeLabels(axis)
-            if not topl:
-                axisLength = self.computeAxisLengthFromLabels(axis)
-                (topl, bottoml) = self.getExtremeLabels(axis)
-                if not topl:
-                    raise Exception("Axis not correctly labeled: top label not found.")
-        else:
-            raise Exception("Axis not found in chart.")
-        length = self.lengthOfElement(metricBar)
-        if axisLength > 0 and length > 0:
-            bottomval = float(self.getText(bottoml)) if bottoml else 0.0
-            topval = float(self.getText(topl))
-            value = abs(topval - bottomval) * (length / axisLength) + bottomval
-            if dtype == "int":
-                value = int(round(value))
-        return value
+        calibration = self.getAxisCalibration()
+        return calibration.valueOf(self.lengthOfElement(metricBar))
 
     def reasonLabelsFromLegends(self):
         """
@@ -536,29 +600,7 @@ class BarChartOntology(UpperVisOntology):
         :param bars: bars to consider; None for all
         :return: list<string> list of bar instances from bar_start to bar_end
         """
-        if bars is None:
-            bars = self.getBars()
-        orderedBars = self.getBarsOrders(bars)
-        ordered_path = []
-        if orderedBars:
-            start_found = bar_start is None
-            reverse = False
-            for t in sorted(orderedBars.items(), key=orderedBars.get):
-                if t[1]:
-                    if not start_found:
-                        if t[1] == bar_start:
-                            start_found = True
-                        elif t[1] == bar_end:
-                            reverse = True
-                            start_found = True
-                            bar_end = bar_start
-                    if start_found:
-                        ordered_path.append(t[1])
-                        if t[1] == bar_end:
-                            break
-            if reverse:
-                ordered_path = ordered_path[::-1]
-        return ordered_path
+        return self.getNavIndex().path(bar_start, bar_end, bars)
 
     def applyLowLevelTask(self, task, **kwargs):
         """
@@ -645,24 +687,28 @@ class BarChartOntology(UpperVisOntology):
         if not bars:
             return []
         to_remove = set()
-        n_bars = len(bars)
-        i = 0
-        for b in bars:
-            added = False
-            b_v = self.getMetricBarValue(b)
-            for v in values:
-                if v != b_v:
-                    to_remove.add(b)
-                    added = True
-            if not added:
-                for f in cardinal_f_result:
-                    if not f.assertFilter(b_v):
+        table = self.getBarTable()
+        if table is not None:
+            bars = table.valueMask(bars, values, cardinal_f_result)
+        else:
+            n_bars = len(bars)
+            i = 0
+            for b in bars:
+                added = False
+                b_v = self.getMetricBarValue(b)
+                for v in values:
+                    if v != b_v:
                         to_remove.add(b)
-            if added:
-                i += 1
-                if i == n_bars:
-                    break
-        bars = bars - to_remove
+                        added = True
+                if not added:
+                    for f in cardinal_f_result:
+                        if not f.assertFilter(b_v):
+                            to_remove.add(b)
+                if added:
+                    i += 1
+                    if i == n_bars:
+                        break
+            bars = bars - to_remove
         if cardinal_f_label:
             for b in bars:
                 bar_filters = [f for f in self.getElementFilters(b, returnText=True) if isNumber(f)]
@@ -685,6 +731,9 @@ class BarChartOntology(UpperVisOntology):
         """
         if not isinstance(ops, list):
             ops = [ops]
+        table = self.getBarTable()
+        if table is not None:
+            return table.extreme(ops, bars, n)
         # (name, value) pairs of bars
         barVals = {}
         result = {}
@@ -724,6 +773,9 @@ class BarChartOntology(UpperVisOntology):
         account
         @return float: the result of the derived operation
         """
+        table = self.getBarTable()
+        if table is not None:
+            return table.derived(op, bars)
         from collections import defaultdict
         derived = None
         totalVal = 0.0
@@ -830,6 +882,9 @@ class BarChartOntology(UpperVisOntology):
         :param descending: boolean: whether to return the bars in descending (default) or descending order
         :return: dict(string, float): Sorted bars and their values
         """
+        table = self.getBarTable()
+        if table is not None:
+            return table.sort(bars, descending)
         import operator
         bar_vals = {}
         for b in bars:
@@ -845,11 +900,8 @@ class BarChartOntology(UpperVisOntology):
         :param bars: list<string> bars to consider
         :return: list<string> sorted bars
         """
-        sorted_b = []
-        bars_nav = self.getBarsOrders(bars)
-        if bars_nav:
-            sorted_b = [bars_nav[v] for v in sorted(bars_nav)]
-        else:  # Default sort: stacked bar followed by its metric bars
+        sorted_b = self.getNavIndex().ordered(bars)
+        if not sorted_b:  # Default sort: stacked bar followed by its metric bars
             for b in bars:
                 if self.elementHasRole(b, self.SyntacticRoles.STACKED_BAR):
                     sorted_b.append(b)
@@ -863,6 +915,9 @@ class BarChartOntology(UpperVisOntology):
         :param bars: list<string> bars to consider
         :return: dict<string; float>: keys are bar ids, values are bar values
         """
+        table = self.getBarTable()
+        if table is not None:
+            return table.valueDict(bars)
         vals = {}
         for bar in bars:
             vals[bar] = float(self.getMetricBarValue(bar))
@@ -1089,6 +1144,9 @@ class BarChartOntology(UpperVisOntology):
                 for childBar in self.getMetricBarsOfStacked(bar):
                     n += 1
                     self.__addBarOrder(childBar, n)
+        self.invalidateBarTable()
+        from ontology.nav_index import dropNavIndex
+        dropNavIndex(self.sess_id)
         return None
 
     def __addBarOrder(self, bar, n):
@@ -1131,13 +1189,8 @@ class BarChartOntology(UpperVisOntology):
                     labelsSet.remove(f)
             if user_tags:
                 barset &= set(self.getElementsWithUserLabels(labelsSet, negate))
-            else:
-                for bar_filter in labelsSet:
-                    elements_labeled = set(self.getElementsLabeledByText(bar_filter))
-                    if negate:
-                        barset -= elements_labeled
-                    else:
-                        barset &= elements_labeled
+            elif labelsSet:
+                barset = self.getLabelIndex().filter(barset, labelsSet, negate)
         return barset
 
     def getCurrentBar(self):
@@ -1152,8 +1205,7 @@ class BarChartOntology(UpperVisOntology):
             return None
         else:
             bar = current[0]
-        if not self.elementHasRole(bar, self.SyntacticRoles.METRIC_BAR) and \
-           not self.elementHasRole(bar, self.SyntacticRoles.STACKED_BAR):
+        if not self.getNavIndex().isBar(bar):
             raise NavigationException("Current element '%s' is not a bar!" % bar)
         return bar
 
@@ -1225,17 +1277,30 @@ class BarChartOntology(UpperVisOntology):
         """
         Reset the navigation, i.e. reset bar orders and current bar, and move
         to the first bar. Can be also used to initialize graph navigation
-        predicates.
+        predicates. Bar orders, axis values and legend labels are only computed if not in the graph yet (see
+        hasDerivedData).
         @return string: instance name of first bar
         """
+        derived = self.hasDerivedData()
         super(BarChartOntology, self).resetNavigation()
-        self.computeBarsNavOrder()
-        axis = self.getMetricAxis()
-        if axis:
-            self.computeAxisLengthFromLabels(axis)
-        self.reasonLabelsFromLegends()
+        if not derived:
+            self.computeBarsNavOrder()
+            axis = self.getMetricAxis()
+            if axis:
+                self.computeAxisLengthFromLabels(axis)
+            self.reasonLabelsFromLegends()
+            self.invalidateBarTable()
         return self.__moveFirst()
 
+    def hasDerivedData(self):
+        """
+        Returns whether the data computed by resetNavigation, including the navigation order of bars, is already in
+        the graph
+        :return: bool
+        """
+        return (super(BarChartOntology, self).hasDerivedData() and
+                self.hasPropertyOccurrences(self.NavigationDataProperty.HAS_ORDER))
+
     def __getExtremeNavBar(self, pos='first', bars=None):
         """
         Return the first or last bar of the chart
@@ -1244,20 +1309,15 @@ class BarChartOntology(UpperVisOntology):
         :return string: instance name of first or last bar
         """
         b = None
+        index = self.getNavIndex()
         if bars is None:
-            stacked_bars = self.getStackedBars()
-            if len(stacked_bars) == 0:
-                bars = None  # None defaults to all bars in getBarsOrders
-            else:
-                bars = stacked_bars
-        orderedBars = self.getBarsOrders(bars)
-        if len(orderedBars) > 0:
-            if pos == 'first':
-                i = min(orderedBars, key=int)
-            else:
-                i = max(orderedBars, key=int)
-            b = orderedBars[i]
-        elif bars:
+            bars = self.getStackedBars()  # Stacked bars first; all bars if there are none
+            b = index.extreme(pos, index.STACKED if bars else None)
+        else:
+            ordered = index.ordered(bars)
+            if ordered:
+                b = ordered[0] if pos == 'first' else ordered[-1]
+        if not b and bars:
             b = bars[0]  # Fallback to any bar
             from warnings import warn
             warn('getExtremeNavBar: bars are not ordered, random bar fetched.')
@@ -1310,39 +1370,24 @@ class BarChartOntology(UpperVisOntology):
         :return: list<string>: instance names of all bars from the current one until the given bar
         """
         ordered_path = []
+        index = self.getNavIndex()
         current = self.getCurrentBar()
-        bar_role = None
-        if self.elementHasRole(bar, self.SyntacticRoles.STACKED_BAR):
-            bar_role = self.SyntacticRoles.STACKED_BAR
-        elif self.elementHasRole(bar, self.SyntacticRoles.METRIC_BAR):
-            bar_role = self.SyntacticRoles.METRIC_BAR
         next = None
         if not current and default_curr_first:
             current = self.__getFirst()
         if current:
-            cur_role = None
-            if self.elementHasRole(current, self.SyntacticRoles.STACKED_BAR):
-                cur_role = self.SyntacticRoles.STACKED_BAR
-            elif self.elementHasRole(current, self.SyntacticRoles.METRIC_BAR):
-                cur_role = self.SyntacticRoles.METRIC_BAR
             cont = True
             use_stacked = False
-            if bar_role == self.SyntacticRoles.STACKED_BAR:
+            if index.isStacked(bar):
                 use_stacked = True
-                if cur_role == self.SyntacticRoles.METRIC_BAR:
-                    current = self.getStackedBarOfMetric(current)
-            elif cur_role == self.SyntacticRoles.STACKED_BAR:
+                if index.isMetric(current):
+                    current = index.parent.get(current)
+            elif index.isStacked(current):
                 cont = False
             if cont:
-                if use_stacked:
-                    all_bars = self.getStackedBars()
-                else:
-                    all_bars = self.getMetricBars()
-                if bars:
-                    nav_bars = list(set(bars) & set(all_bars))
-                else:
-                    nav_bars = all_bars
-                ordered_path = self.pathBetweenBars(bar_start=current, bar_end=bar, bars=nav_bars)
+                role = index.STACKED if use_stacked else index.METRIC
+                nav_bars = [b for b in bars if index.role.get(b) == role] if bars else index.lineups[role]
+                ordered_path = index.path(current, bar, nav_bars)
                 next = ordered_path[-1] if ordered_path else None
         if not ordered_path and bar:
             if current:
@@ -1359,18 +1404,12 @@ class BarChartOntology(UpperVisOntology):
         :return list<string>: instance names of the current and child bars
         """
         path_bars = []
-        candidates = []
         current = self.getCurrentBar()
         if current:
             path_bars.append(current)
-            if self.elementHasRole(current, self.SyntacticRoles.STACKED_BAR):
-                children = self.getConstituentElements(current)
-                for e in children:
-                    if self.elementHasRole(e, self.SyntacticRoles.METRIC_BAR):
-                        candidates.append(e)
-                ordered = self.getBarsOrders(candidates)
-                minOrder = min(ordered, key=int)
-                next = ordered[minOrder]
+            children = self.getNavIndex().children.get(current)
+            if children:
+                next = children[0]
                 self.setCurrentBar(next)
                 path_bars.append(next)
         return path_bars
@@ -1384,11 +1423,10 @@ class BarChartOntology(UpperVisOntology):
         current = self.getCurrentBar()
         if current:
             path_bars.append(current)
-            if self.elementHasRole(current, self.SyntacticRoles.METRIC_BAR):
-                parent = self.getStackedBarOfMetric(current)
-                if parent:
-                    self.setCurrentBar(parent)
-                    path_bars.append(parent)
+            parent = self.getNavIndex().parent.get(current)
+            if parent:
+                self.setCurrentBar(parent)
+                path_bars.append(parent)
         return path_bars
 
     def __moveNext(self, bars=None):
@@ -1419,35 +1457,13 @@ class BarChartOntology(UpperVisOntology):
         current = self.getCurrentBar()
         path_bars = [current]
         if n != 0:
-            barsOrder = self.getBarsOrders(bars)
-            v = self.getValue(current, self.NavigationDataProperty.HAS_ORDER)
-            if v:
-                curr_n = int(v)
-                curr_role = self.getRolesOfElement(current)
-            else:
+            index = self.getNavIndex()
+            if current not in index.ordinal:
                 raise NavigationException("Current bar %s has no ordinal value!" % current)
-            i = curr_n
-            if n > 0:
-                stop_i = max(barsOrder, key=int)
-            else:
-                stop_i = min(barsOrder, key=int)
-            found = False
-            c = 0  # bar counter to skip the previous n-1 bars
-            while not found:
-                i += 1 if n > 0 else -1
-                if i in barsOrder:
-                    next = barsOrder[i]
-                    next_role = self.getRolesOfElement(next)
-                    mbr = self.SyntacticRoles.METRIC_BAR
-                    sbr = self.SyntacticRoles.STACKED_BAR
-                    if (mbr in curr_role and mbr in next_role) or (sbr in curr_role and sbr in next_role):
-                        c = c + 1
-                        path_bars.append(next)
-                        if c == abs(n):
-                            found = True
-                            self.setCurrentBar(next)
-                if (n > 0 and i > stop_i) or (n < 0 and i < stop_i):
-                    found = True
+            steps = index.step(current, n, bars)
+            path_bars.extend(steps)
+            if len(steps) == abs(n):
+                self.setCurrentBar(steps[-1])
         return path_bars
 
     def __moveExtreme(self, op, bars=None):
@@ -1470,9 +1486,9 @@ class BarChartOntology(UpperVisOntology):
                 extremes = self.computeExtreme(op, bars)
                 max_bar, _ = extremes[op][0]
                 self.setCurrentBar(max_bar)
-                if self.elementHasRole(current, self.SyntacticRoles.METRIC_BAR) and \
-                        self.elementHasRole(max_bar, self.SyntacticRoles.STACKED_BAR):
-                    current = self.getStackedBarOfMetric(current)
+                index = self.getNavIndex()
+                if index.isMetric(current) and index.isStacked(max_bar):
+                    current = index.parent.get(current)
                 path_bars = self.pathBetweenBars(current, max_bar, bars)
         return path_bars
 
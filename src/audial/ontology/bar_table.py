@@ -0,0 +1,204 @@
+"""
+Columnar in-memory snapshot of the bars of a chart, used to run analytical tasks as array operations instead of
+crawling the ontology graph once per bar.
+"""
+import numpy as np
+import threading
+
+_tables = {}  # Key: session/store index of a chart; value: BarTable instance
+_tables_lock = threading.Lock()
+_chart_locks = {}  # Key: session/store index of a chart; value: lock held while building its snapshot
+_generations = {}  # Key: session/store index of a chart; value: number of times its snapshot was invalidated
+
+
+class BarTable(object):
+    """
+    Bar snapshot: one row per bar (metric or stacked) with its value, role, parent and navigation order
+    """
+    ROLE_METRIC = 0
+    ROLE_STACKED = 1
+
+    def __init__(self, o):
+        """
+        BarTable constructor; crawls the given ontology once and stores its bar data as columns
+        :param o: BarChartOntology instance
+        """
+        self.calibration = o.getAxisCalibration()  # Axis calibration the values of the snapshot were computed with
+        stacked = o.getStackedBars()
+        metric = o.getMetricBars()
+        self.ids = list(stacked) + list(metric)  # Bar instance names
+        self.index = dict((b, i) for i, b in enumerate(self.ids))  # Row of each bar
+        n = len(self.ids)
+        self.int_valued = o.getChartMeasurementDataType() == "int"  # Whether bar values are integers
+        self.values = np.full(n, np.nan)
+        self.role = np.zeros(n, dtype=np.int8)
+        self.parent = np.full(n, -1, dtype=np.int32)  # Row of the parent stacked bar; -1 if none
+        self.order = np.full(n, -1, dtype=np.int32)  # Navigation order; -1 if not set
+        self.role[:len(stacked)] = self.ROLE_STACKED
+        for i, b in enumerate(self.ids):
+            v = o.getMetricBarValue(b)
+            if v is not None:
+                self.values[i] = float(v)
+        for s in stacked:
+            for m in o.getMetricBarsOfStacked(s):
+                row = self.index.get(m)
+                if row is not None:
+                    self.parent[row] = self.index[s]
+        for n_order, b in o.getBarsOrders(self.ids).iteritems():
+            self.order[self.index[b]] = n_order
+
+    def rows(self, bars):
+        """
+        Returns the table rows of the given bars, in the same order
+        :param bars: iterable<string>; bar instance names. Bars not in the table are ignored
+        :return: numpy.ndarray of int
+        """
+        index = self.index
+        return np.array([index[b] for b in bars if b in index], dtype=np.int64)
+
+    def pyValue(self, v):
+        """
+        Converts a value of the table to the Python type returned by BarChartOntology.getMetricBarValue
+        :param v: float
+        :return: int or float
+        """
+        if self.int_valued:
+            return int(v)
+        return float(v)
+
+    def valuesOf(self, bars, skip_empty=False, strict=False):
+        """
+        Returns the rows and values of the given bars
+        :param bars: iterable<string>; bar instance names
+        :param skip_empty: whether to leave out bars with no value or a zero value
+        :param strict: whether to raise TypeError, as converting their values to float would, if any bar has no value
+        or is not in the table
+        :return: (numpy.ndarray, numpy.ndarray): rows of the bars and their values
+        """
+        if strict:
+            bars = list(bars)
+        rows = self.rows(bars)
+        vals = self.values[rows]
+        if strict and (len(rows) < len(bars) or np.isnan(vals).any()):
+            missing = [b for b in bars if b not in self.index or np.isnan(self.values[self.index[b]])]
+            raise TypeError("Bar %s has no value" % missing[0])
+        if skip_empty:
+            mask = ~np.isnan(vals) & (vals != 0)
+            rows, vals = rows[mask], vals[mask]
+        return rows, vals
+
+    def extreme(self, ops, bars, n=1):
+        """
+        Vectorized equivalent of BarChartOntology.computeExtreme
+        :param ops: list<string>; operations: 'max', 'min'
+        :param bars: iterable<string>; bars to take into account
+        :param n: int; maximum number of tied elements to return, or 'all' to return all tied elements
+        :return: dict<string, list<(string, float)>>
+        """
+        result = {}
+        rows, vals = self.valuesOf(bars, skip_empty=True)
+        if len(vals) > 0:
+            extremes = {'max': vals.max(), 'min': vals.min()}
+            for op in ['max', 'min']:
+                if op in ops:
+                    tied = rows[vals == extremes[op]]
+                    result[op] = [(self.ids[r], float(extremes[op])) for r in tied]
+                    if isinstance(n, int) and n > 0:
+                        result[op] = result[op][: n]
+            result['range'] = (None, float(extremes['max'] - extremes['min']))
+        return result
+
+    def derived(self, op, bars):
+        """
+        Vectorized equivalent of BarChartOntology.computeDerived
+        :param op: string; the name of the operation to perform (avg, median, mode, count, sum)
+        :param bars: iterable<string>; bars to take into account
+        :return: float; result of the operation; None if there were no bars
+        """
+        derived = None
+        _, vals = self.valuesOf(bars, strict=True)
+        if len(vals) > 0:
+            if op == 'avg':
+                derived = float(vals.mean())
+            elif op == 'median':
+                derived = float(np.median(vals))
+            elif op == 'mode':
+                uniq, counts = np.unique(vals, return_counts=True)
+                derived = float(uniq[counts.argmax()])
+            elif op == 'count':
+                derived = len(vals)
+            elif op == 'sum':
+                derived = float(vals.sum())
+        return derived
+
+    def sort(self, bars, descending=True):
+        """
+        Vectorized equivalent of BarChartOntology.sortBars
+        :param bars: iterable<string>; bars to take into account
+        :param descending: boolean: whether to sort values in descending (default) or ascending order
+        :return: list<(string, float)>: sorted bars and their values
+        """
+        rows, vals = self.valuesOf(bars, skip_empty=True)
+        keys = -vals if descending else vals
+        sorted_i = np.argsort(keys, kind='mergesort')
+        return [(self.ids[rows[i]], self.pyValue(vals[i])) for i in sorted_i]
+
+    def valueDict(self, bars):
+        """
+        Vectorized equivalent of BarChartOntology.getBarValues
+        :param bars: iterable<string>; bars to consider
+        :return: dict<string; float>: keys are bar ids, values are bar values
+        """
+        rows, vals = self.valuesOf(bars, strict=True)
+        return dict((self.ids[r], float(v)) for r, v in zip(rows, vals))
+
+    def valueMask(self, bars, values, cardinal_filters):
+        """
+        Returns the given bars that match all the given values and satisfy all the given cardinal filters
+        :param bars: iterable<string>; bars to consider
+        :param values: list<float>; values the bars must be equal to
+        :param cardinal_filters: list<QueryFilterCardinal>; filters to apply to the bars' values
+        :return: set<string>; bars satisfying all the conditions
+        """
+        rows, vals = self.valuesOf(bars)
+        mask = np.ones(len(rows), dtype=bool)
+        for v in values:
+            mask &= vals == v
+        for f in cardinal_filters:
+            mask &= f.assertFilterValues(vals)
+        return set(self.ids[r] for r in rows[mask])
+
+
+def barTableOf(o):
+    """
+    Returns the BarTable snapshot of the chart handled by the given ontology, building it the first time
+    :param o: BarChartOntology instance
+    :return: BarTable instance
+    """
+    calibration = o.getAxisCalibration()
+    with _tables_lock:
+        table = _tables.get(o.sess_id)
+        if table is not None and table.calibration is calibration:
+            return table
+        chart_lock = _chart_locks.setdefault(o.sess_id, threading.Lock())
+    with chart_lock:  # Only requests of the same chart wait for its snapshot to be built
+        with _tables_lock:
+            table = _tables.get(o.sess_id)
+            generation = _generations.get(o.sess_id, 0)
+        if table is None or table.calibration is not calibration:
+            table = BarTable(o)
+            with _tables_lock:
+                if _generations.get(o.sess_id, 0) == generation:  # Not invalidated while being built
+                    _tables[o.sess_id] = table
+        return table
+
+
+def invalidateBarTable(sess_id):
+    """
+    Drops the BarTable snapshot of a chart so it is rebuilt on its next use, e.g. after its bars have changed
+    :param sess_id: string; session/store index of the chart
+    :return: None
+    """
+    with _tables_lock:
+        _tables.pop(sess_id, None)
+        _generations[sess_id] = _generations.get(sess_id, 0) + 1
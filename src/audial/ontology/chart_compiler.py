@@ -0,0 +1,176 @@
+"""
+Offline chart compiler: runs the reasoning steps the application would otherwise perform at run time on a chart (see
+BarChartOntology.resetNavigation) and writes the chart's triples along with the derived ones as a compiled chart,
+which the application then loads instead of the plain chart (see compiled_chart). E.g.:
+    python -m ontology.chart_compiler static/graphics/energy.rdf
+Steps are independent of each other, so with --jobs each one runs in a worker process forked once the chart is loaded,
+on its own copy of the chart; the triples each step adds or removes are then merged into the compiled chart. The time
+taken by each step is reported.
+"""
+import argparse
+import os
+import time
+from multiprocessing import Pool, cpu_count
+
+COMPILER_INDEX = 'compiler'  # Store index of the in-memory graph steps are run on
+_compiling = None  # (BarChartOntology instance, set of its triples) of the chart being compiled; read by workers
+
+
+def deriveLegendLabels(o):
+    """
+    Labels bars according to the legends of the chart
+    :param o: BarChartOntology instance
+    :return: None
+    """
+    o.reasonLabelsFromLegends()
+
+
+def deriveNavigationOrder(o):
+    """
+    Numbers bars in navigation order
+    :param o: BarChartOntology instance
+    :return: None
+    """
+    o.computeBarsNavOrder()
+
+
+def deriveAxisValues(o):
+    """
+    Computes the length and extreme labels of the metric axis
+    :param o: BarChartOntology instance
+    :return: None
+    """
+    axis = o.getMetricAxis()
+    if axis:
+        o.computeAxisLengthFromLabels(axis)
+
+
+def deriveScores(o):
+    """
+    Computes the specificity scores of classes and properties, and the distance scores of properties
+    :param o: BarChartOntology instance
+    :return: None
+    """
+    o.computeSpecificities([], 'class')
+    props = o.getProperties()
+    o.computeSpecificities(props, 'property')
+    o.computeDistanceScores(props)  # Relies on the specificities of classes
+
+
+#  Reasoning steps and the functions performing them on a BarChartOntology instance
+STEPS = [('legend labels', deriveLegendLabels),
+         ('navigation order', deriveNavigationOrder),
+         ('axis values', deriveAxisValues),
+         ('specificity and distance scores', deriveScores)]
+
+
+def runStep(name):
+    """
+    Runs a reasoning step on the chart being compiled, in a worker process forked after the chart was loaded (see
+    compileDerivedChart), i.e. on its own copy of the chart
+    :param name: string; name of the step, as in STEPS
+    :return: (string, float, set<tuple>, set<tuple>): name of the step, seconds taken, triples added and triples
+    removed by the step
+    """
+    o, before = _compiling
+    with _requestContext():
+        start = time.time()
+        dict(STEPS)[name](o)
+        seconds = time.time() - start
+    after = set(o.graph.triples((None, None, None)))
+    return name, seconds, after - before, before - after
+
+
+def _requestContext():
+    """
+    Returns a throwaway request context; navigation steps write to the session
+    :return: flask.ctx.RequestContext instance
+    """
+    from flask import Flask
+    app = Flask(__name__)
+    app.secret_key = os.urandom(16)
+    return app.test_request_context()
+
+
+def compileDerivedChart(source, jobs=1):
+    """
+    Runs all reasoning steps on a chart and writes its compiled version with the derived triples
+    :param source: string; path to the RDF file of the chart
+    :param jobs: int; number of worker processes, up to one per step; 1 to run the steps one after the other in this
+    process, which is faster unless steps take longer than copying the chart to and from the workers
+    :return: (CompiledChart, list<(string, float)>): compiled chart, and the name and seconds taken by each step,
+    including loading, merging and writing
+    """
+    global _compiling
+    from ontology import graph_pool
+    from ontology.bar_chart_ontology import BarChartOntology
+    from ontology.compiled_chart import compiledPathOf, compileGraph, sourceChecksum
+    source = os.path.abspath(source)
+    jobs = max(1, min(jobs, len(STEPS), cpu_count()))
+    steps = {}  # Key: step name; value: seconds taken
+    timings = []
+    start = time.time()
+    checksum = sourceChecksum(source)
+    graph_pool.keepInMemory(COMPILER_INDEX)
+    o = BarChartOntology(None, COMPILER_INDEX)
+    try:
+        graph_pool.loadSource(o.graph, source, derived=False)
+        o._onTripleChanged(None, None)
+        timings.append(('load', time.time() - start))
+        start = time.time()
+        if jobs > 1:
+            _compiling = (o, set(o.graph.triples((None, None, None))))
+            pool = Pool(jobs)  # Forked now: workers share the loaded chart until they write to it
+            try:
+                results = pool.map(runStep, [name for name, _ in STEPS])
+            finally:
+                pool.close()
+                pool.join()
+                _compiling = None
+            steps_seconds = time.time() - start
+            start = time.time()
+            with o.graph_lock:
+                for name, seconds, added, removed in results:
+                    steps[name] = seconds
+                    for triple in removed:
+                        o.graph.remove(triple)
+                    for triple in added:
+                        o.graph.add(triple)
+            o._onTripleChanged(None, None)
+            merge_seconds = time.time() - start
+        else:
+            with _requestContext():
+                for name, step in STEPS:
+                    step_start = time.time()
+                    step(o)
+                    steps[name] = time.time() - step_start
+            steps_seconds = time.time() - start
+            merge_seconds = 0.0
+        timings.extend((name, steps[name]) for name, _ in STEPS)
+        timings.append(('all steps (%d jobs)' % jobs, steps_seconds))
+        timings.append(('merge', merge_seconds))
+        start = time.time()
+        chart = compileGraph(o.graph, compiledPathOf(source, derived=True), source, checksum,
+                             dict((name, round(seconds, 3)) for name, seconds in steps.iteritems()))
+        timings.append(('write', time.time() - start))
+    finally:
+        o.close()
+        graph_pool.evictGraph(COMPILER_INDEX)
+    return chart, timings
+
+
+def main():
+    args = argparse.ArgumentParser(description="Compiles charts along with the data derived from them.")
+    args.add_argument('charts', nargs='+', help="RDF files of the charts")
+    args.add_argument('-j', '--jobs', type=int, default=1,
+                      help="number of worker processes to run the steps in; 1 to run them in this process (default)")
+    opts = args.parse_args()
+    for source in opts.charts:
+        chart, timings = compileDerivedChart(source, opts.jobs)
+        print "%s: %d triples written to %s" % (source, len(chart), chart.path)
+        for name, seconds in timings:
+            print "  %-32s %8.1f ms" % (name, seconds * 1000)
+
+
+if __name__ == '__main__':
+    main()
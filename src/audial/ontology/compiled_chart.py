@@ -0,0 +1,252 @@
+"""
+Compiled charts: a binary snapshot of the triples of an RDF chart that can be loaded without parsing RDF/XML.
+
+A compiled chart is made up of a term dictionary (every distinct RDF term, numbered from 0) and an array with the
+triples encoded as the numbers of their subject, predicate and object, sorted in that order. Loading it only decodes
+each distinct term once and adds the triples to the graph store in bulk; queries are then answered by the store. The
+snapshot stores the checksum of its source file and is compiled again whenever the source changes.
+
+A derived compiled chart also holds the triples the application would otherwise reason at run time (legend labels,
+navigation order, axis values, specificity and distance scores). It is only built offline, see chart_compiler, and
+is preferred over the plain snapshot while its source is unchanged.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib
+import urlparse
+import numpy as np
+from rdflib import ConjunctiveGraph, URIRef, BNode, Literal
+import constants as o_c
+
+FORMAT_VERSION = 2  # Increment whenever the layout of compiled charts changes
+_charts = {}  # Key: (absolute path of a source RDF file, whether derived); value: CompiledChart instance
+_charts_lock = threading.Lock()
+
+
+def sourceChecksum(source):
+    """
+    Returns the checksum of an RDF file
+    :param source: string; path to the file
+    :return: string; SHA-1 hex digest of its contents
+    """
+    sha = hashlib.sha1()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def sourceContext(source):
+    """
+    Returns the identifier of the graph context the triples of an RDF file are loaded into, the same used by
+    rdflib when parsing the file
+    :param source: string; path to the RDF file
+    :return: URIRef
+    """
+    return URIRef(urlparse.urljoin('file:', urllib.pathname2url(os.path.abspath(source))))
+
+
+def compiledPathOf(source, derived=False):
+    """
+    Returns the directory where the compiled version of an RDF file is stored
+    :param source: string; path to the RDF file
+    :param derived: bool; whether to return the directory of the version with derived triples
+    :return: string; directory path
+    """
+    name = os.path.splitext(os.path.basename(source))[0]
+    if derived:
+        name = '%s.derived' % name
+    return os.path.join(os.path.dirname(__file__), o_c.ONT_COMPILED_DIR, name)
+
+
+def encodeTerm(term):
+    """
+    Converts an RDF term to a JSON-serializable list
+    :param term: URIRef, BNode or Literal
+    :return: list: [kind, value] for URIs and blank nodes; [kind, value, datatype, language] for literals
+    """
+    if isinstance(term, Literal):
+        return ['l', unicode(term), unicode(term.datatype) if term.datatype else None, term.language]
+    elif isinstance(term, BNode):
+        return ['b', unicode(term)]
+    return ['u', unicode(term)]
+
+
+def decodeTerm(data):
+    """
+    Converts a list produced by encodeTerm back to an RDF term
+    :param data: list
+    :return: URIRef, BNode or Literal
+    """
+    kind = data[0]
+    if kind == 'l':
+        datatype = URIRef(data[2]) if data[2] else None
+        return Literal(data[1], lang=data[3], datatype=datatype)
+    elif kind == 'b':
+        return BNode(data[1])
+    return URIRef(data[1])
+
+
+class CompiledChart(object):
+    """
+    Read-only set of triples of a compiled chart
+    """
+    def __init__(self, path):
+        """
+        CompiledChart constructor; opens a compiled chart
+        :param path: string; directory of the compiled chart
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'terms.json')) as f:
+            self.terms = [decodeTerm(t) for t in json.load(f)]
+        self.spo = np.load(os.path.join(path, 'spo.npy'))  # Triples as rows of term numbers, sorted
+
+    def __len__(self):
+        return len(self.spo)
+
+    def addTo(self, graph, context=None):
+        """
+        Adds all the triples of this chart to the given graph
+        :param graph: rdflib.ConjunctiveGraph instance
+        :param context: URIRef; identifier of the graph context to add the triples to; None for the path of the
+        compiled chart's source
+        :return: None
+        """
+        if context is None:
+            context = sourceContext(self.meta['source'])
+        target = graph.get_context(context)
+        terms = self.terms
+        graph.addN((terms[s], terms[p], terms[o], target) for s, p, o in self.spo.tolist())
+
+
+def compileGraph(graph, path, source, checksum, steps=None):
+    """
+    Writes the triples of a graph to a compiled chart
+    :param graph: rdflib.Graph instance
+    :param path: string; directory of the compiled chart
+    :param source: string; path to the RDF file the graph was loaded from
+    :param checksum: string; checksum of the source file
+    :param steps: dict<string, float>; reasoning steps whose triples were added to the graph and their durations in
+    seconds; None if the graph only holds the triples of the source
+    :return: CompiledChart instance
+    """
+    ids = {}
+    terms = []
+    encoded = []
+    for triple in graph.triples((None, None, None)):
+        row = []
+        for term in triple:
+            t = ids.get(term)
+            if t is None:
+                t = ids[term] = len(terms)
+                terms.append(term)
+            row.append(t)
+        encoded.append(row)
+    encoded.sort()
+    triples = np.array(encoded, dtype=np.int64).reshape(-1, 3)
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except OSError:  # Created by another process meanwhile
+            if not os.path.isdir(parent):
+                raise
+    # Written aside and renamed into place, so that processes compiling the same chart never mix their files
+    tmp = tempfile.mkdtemp(prefix='.%s.' % os.path.basename(path), dir=parent)
+    try:
+        np.save(os.path.join(tmp, 'spo.npy'), triples)
+        with open(os.path.join(tmp, 'terms.json'), 'w') as f:
+            json.dump([encodeTerm(t) for t in terms], f)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'source': os.path.abspath(source), 'checksum': checksum,
+                       'triples': len(triples), 'terms': len(terms), 'steps': steps}, f)
+        replaceDir(tmp, path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return CompiledChart(path)
+
+
+def replaceDir(new, path):
+    """
+    Puts a directory in place of another one, which is removed
+    :param new: string; path to the new directory, on the same file system
+    :param path: string; path to the directory to replace, which may not exist
+    :return: None
+    """
+    old = '%s.old' % new
+    try:
+        os.rename(path, old)
+    except OSError:  # Not compiled before
+        old = None
+    try:
+        os.rename(new, path)
+    except OSError:  # Another process put its own version in place meanwhile, which is as good as this one
+        if not os.path.isdir(path):
+            raise
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def compileChart(source, path=None, checksum=None):
+    """
+    Parses an RDF file and writes it as a compiled chart
+    :param source: string; path to the RDF file
+    :param path: string; directory of the compiled chart; None for the default one (see compiledPathOf)
+    :param checksum: string; checksum of the source file, if already known
+    :return: CompiledChart instance
+    """
+    if path is None:
+        path = compiledPathOf(source)
+    if checksum is None:
+        checksum = sourceChecksum(source)
+    graph = ConjunctiveGraph()
+    graph.load(source)
+    return compileGraph(graph, path, source, checksum)
+
+
+def isUpToDate(path, checksum):
+    """
+    Returns whether the compiled chart in the given directory was compiled from a source with the given checksum
+    :param path: string; directory of the compiled chart
+    :param checksum: string; checksum of the source file
+    :return: boolean
+    """
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    except (IOError, ValueError):
+        return False
+    return meta.get('version') == FORMAT_VERSION and meta.get('checksum') == checksum
+
+
+def compiledChartOf(source, derived=False):
+    """
+    Returns the compiled version of an RDF file, compiling it first if it does not exist or its source has changed
+    :param source: string; path to the RDF file
+    :param derived: bool; whether to return the version with derived triples instead, which is never compiled here
+    :return: CompiledChart instance; None if a derived version was requested and there is none up to date
+    """
+    source = os.path.abspath(source)
+    checksum = sourceChecksum(source)
+    with _charts_lock:
+        chart = _charts.get((source, derived))
+        if chart is None or chart.meta['checksum'] != checksum:
+            path = compiledPathOf(source, derived)
+            chart = None
+            if isUpToDate(path, checksum):
+                try:
+                    chart = CompiledChart(path)
+                except (IOError, ValueError):  # Replaced by another process while being read
+                    chart = None
+            if chart is None:
+                if derived:
+                    return None
+                chart = compileChart(source, path, checksum)
+            _charts[(source, derived)] = chart
+        return chart
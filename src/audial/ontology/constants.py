@@ -11,3 +11,6 @@ OTYPE_DTPROP = 'datatypeProperty'
 
 # Relative directory where the ontology will be serialized
 ONT_REL_DIR = 'storage'
+
+# Relative directory where compiled (binary) versions of RDF charts are stored
+ONT_COMPILED_DIR = 'compiled'
@@ -0,0 +1,227 @@
+"""
+Process-wide pool of open ontology graphs.
+
+Opening and closing a Sleepycat (Berkeley DB) store on every request is expensive, so graphs are opened once per
+store index (the session prefix of a chart, e.g. 'ap', 'dc', 'pw') and kept open for the lifetime of the process.
+Ontology handlers borrow the shared graph from the pool and give it back when they are done; the underlying store
+is only closed on shutdown or when explicitly evicted (e.g. before its serialized directory is deleted), which is
+refused while any handler borrows it. A graph is opened and loaded under a lock of its own store index, so only
+requests of the same chart wait for it.
+"""
+import threading
+import atexit
+import rdflib
+import bsddb
+from memo import GraphMemo
+
+_pool = {}  # Key: store index (string); value: PooledGraph instance
+_pool_lock = threading.Lock()
+_memory_indexes = set()  # Store indexes whose graphs are kept in memory only
+_index_locks = {}  # Key: store index; value: lock held while its graph is being opened and loaded
+_opening = set()  # Store indexes whose graphs are being opened and loaded
+
+
+class PooledGraph(object):
+    """
+    An open graph shared among all ontology handlers with the same store index
+    """
+    def __init__(self, graph, path, existed):
+        self.graph = graph  # rdflib.ConjunctiveGraph instance
+        self.path = path  # Path to the persistent store
+        self.existed = existed  # Whether the store already existed when it was first opened
+        self.source = None  # Path to the RDF file of the chart, once known
+        self.lock = threading.RLock()  # Serializes writes to the graph between request threads
+        self.borrowed = 0  # Number of handlers currently using this graph
+        self.memo = GraphMemo()  # Memoized results of read primitives on this graph
+
+
+def acquireGraph(index, path, source=None):
+    """
+    Returns the open graph for the given store index, opening (or creating) it the first time it is requested
+    :param index: string; store index, usually the session prefix of a chart
+    :param path: string; path to the persistent store directory
+    :param source: string; path to an RDF file to load into the store if it has to be created; None to skip
+    :return: tuple<PooledGraph, bool>: the pool entry holding the graph, its write lock and its memoization store;
+    and whether the store already contained data when it was opened
+    """
+    with _pool_lock:
+        entry = _pool.get(index)
+        if entry is not None:
+            return _borrow(entry, source), True
+        index_lock = _index_locks.setdefault(index, threading.Lock())
+    with index_lock:  # Only requests of the same store wait for its graph to be opened
+        with _pool_lock:
+            entry = _pool.get(index)
+            if entry is not None:
+                return _borrow(entry, source), True
+            in_memory = index in _memory_indexes
+            _opening.add(index)
+        try:
+            graph, existed = _openGraph(path, source, in_memory)
+            entry = PooledGraph(graph, path, existed)
+        finally:
+            with _pool_lock:
+                _opening.discard(index)
+                if entry is not None:
+                    _pool[index] = entry
+                    _borrow(entry, source)
+        return entry, existed
+
+
+def _borrow(entry, source):
+    """
+    Lends a pooled graph to a handler; to be called while holding the pool lock
+    :param entry: PooledGraph instance
+    :param source: string; path to the RDF file of the chart; None if unknown
+    :return: PooledGraph instance; the given entry
+    """
+    if source:
+        entry.source = source
+    entry.borrowed += 1
+    return entry
+
+
+def _openGraph(path, source, in_memory):
+    """
+    Opens (or creates) a graph, loading the given RDF file into it if it has just been created
+    :param path: string; path to the persistent store directory
+    :param source: string; path to an RDF file to load into the store if it has to be created; None to skip
+    :param in_memory: bool; whether to keep the graph in memory instead of a persistent store
+    :return: tuple<rdflib.ConjunctiveGraph, bool>: the open graph and whether its store already contained data
+    """
+    if in_memory:
+        graph = rdflib.ConjunctiveGraph()
+        if source:
+            loadSource(graph, source)
+        return graph, False
+    graph = rdflib.ConjunctiveGraph("Sleepycat")
+    try:
+        graph.open(path, create=False)
+        return graph, True
+    except bsddb.db.DBNoSuchFileError:
+        graph.open(path, create=True)
+    if source:
+        try:
+            loadSource(graph, source)
+        except Exception:
+            graph.close()
+            raise
+    return graph, False
+
+
+def keepInMemory(index):
+    """
+    Makes the graph of the given store index be kept in memory instead of a persistent store, e.g. to process a
+    chart offline; to be called before the graph is first acquired
+    :param index: string; store index
+    :return: None
+    """
+    with _pool_lock:
+        _memory_indexes.add(index)
+
+
+def isInMemory(index):
+    """
+    Returns whether the graph of the given store index is kept in memory only
+    :param index: string; store index
+    :return: bool
+    """
+    return index in _memory_indexes
+
+
+def loadSource(graph, source, derived=True):
+    """
+    Loads the triples of an RDF file into a graph, from its compiled version if possible in order to avoid parsing
+    the file (see compiled_chart); the compiled version is (re)built if it is missing or out of date
+    :param graph: rdflib.ConjunctiveGraph instance
+    :param source: string; path to the RDF file
+    :param derived: bool; whether to load the triples derived by the chart compiler too, if they are up to date
+    :return: None
+    """
+    try:
+        from compiled_chart import compiledChartOf
+    except ImportError:
+        graph.load(source)
+        return
+    chart = compiledChartOf(source, derived=True) if derived else None
+    if chart is None:
+        chart = compiledChartOf(source)
+    chart.addTo(graph)
+
+
+def graphSource(index):
+    """
+    Returns the RDF file the graph with the given store index was acquired with
+    :param index: string; store index
+    :return: string; path to the RDF file; None if the graph is not open or has only been acquired without a source
+    """
+    with _pool_lock:
+        entry = _pool.get(index)
+        return entry.source if entry else None
+
+
+def releaseGraph(index):
+    """
+    Gives a borrowed graph back to the pool; the graph is kept open for subsequent requests
+    :param index: string; store index
+    :return: None
+    """
+    with _pool_lock:
+        entry = _pool.get(index)
+        if entry and entry.borrowed > 0:
+            entry.borrowed -= 1
+
+
+def evictGraph(index, force=False):
+    """
+    Closes the graph with the given store index and removes it from the pool, e.g. before its store is deleted
+    or in order to force it to be reopened from disk. Nothing is done while the graph is borrowed by a handler or
+    being opened, since in-flight requests would be left with a closed store.
+    :param index: string; store index
+    :param force: bool; whether to close the graph even if it is borrowed, e.g. on shutdown
+    :return: bool; whether the graph is not in the pool any longer
+    """
+    with _pool_lock:
+        entry = _pool.get(index)
+        if entry is None:
+            return index not in _opening or force
+        if entry.borrowed > 0 and not force:
+            return False
+        del _pool[index]
+    with entry.lock:
+        entry.graph.close()
+    return True
+
+
+def closeAllGraphs():
+    """
+    Closes all pooled graphs, borrowed or not; called on process shutdown
+    :return: None
+    """
+    with _pool_lock:
+        indexes = list(_pool.keys())
+    for index in indexes:
+        evictGraph(index, force=True)
+
+
+def pooledGraphs():
+    """
+    Returns the store indexes of the currently open graphs
+    :return: dict<string, int>: store index and number of handlers currently borrowing its graph
+    """
+    with _pool_lock:
+        return dict((index, entry.borrowed) for index, entry in _pool.iteritems())
+
+
+def memoStatistics():
+    """
+    Returns the hit/miss statistics of the memoized read primitives of every open graph
+    :return: dict<string, dict>: for each store index, its generation and hits/misses per memoized method
+    """
+    with _pool_lock:
+        entries = list(_pool.items())
+    return dict((index, {'generation': entry.memo.generation, 'methods': entry.memo.hitsAndMisses()})
+                for index, entry in entries)
+
+
+atexit.register(closeAllGraphs)
@@ -0,0 +1,273 @@
+"""
+Class and property hierarchies of an ontology, read from all rdfs:subClassOf / rdfs:subPropertyOf triples at once,
+with the specificity distance of each element (see UpperOntology.specificityDistanceOfClass) memoized: computing the
+distances of all the elements visits each one once, instead of once per descendant. Parent, child and top element
+queries are dict lookups instead of walks along the hierarchy triples. The ancestors and descendants of every element
+are tabulated as well when the hierarchy is read (transitive closure), so that when the parents of an element change,
+only its distance and closure and those of its descendants are computed again.
+"""
+from rdflib import BNode
+from rdflib.term import URIRef
+import const as c
+import threading
+
+_hierarchies = {}  # Key: (session/store index of an ontology, kind, namespace of parents or None); value: Hierarchy
+_hierarchies_lock = threading.Lock()
+
+CLASS = 'class'
+PROPERTY = 'property'
+HIERARCHY_PROPERTIES = {CLASS: 'subClassOf', PROPERTY: 'subPropertyOf'}  # Property linking elements to their parents
+
+
+class Hierarchy(object):
+    """
+    Parent and child links of the classes or properties of an ontology, their transitive closure, and the specificity
+    distance of each element. As UpperOntology.specificityDistanceOfClass is called with a stripped element name,
+    parents may be identified by their name in a given namespace; otherwise they keep their own URI.
+    """
+    def __init__(self, o, kind, ns):
+        """
+        Hierarchy constructor; reads the hierarchy triples of the given ontology once and tabulates their closure
+        :param o: UpperOntology instance
+        :param kind: string; CLASS or PROPERTY
+        :param ns: string; namespace parents are looked up in; None to keep the URIs of parents
+        """
+        self.kind = kind
+        self.ns = ns
+        self.predicate = URIRef("%s#%s" % (c.RDFS_NS, HIERARCHY_PROPERTIES[kind]))
+        self.parents = {}  # Key: element URI; value: list of the URIs of its parents
+        self.children = {}  # Key: element URI; value: list of the URIs of its children
+        self.ancestors = {}  # Key: element URI; value: frozenset of the URIs of its ancestors
+        self.descendants = {}  # Key: element URI; value: set of the URIs of its descendants
+        self.distances = {}  # Key: element URI; value: specificity distance, computed on demand
+        self.tops = {}  # Key: element URI; value: list of its furthest top ancestors, computed on demand
+        self.lock = threading.RLock()
+        for s, obj in o.graph.subject_objects(self.predicate):
+            if self.__isParent(obj):
+                self.__link(str(s), self.__parentURI(o, obj))
+        for s in self.parents.keys():
+            self.__closeOver(s)
+
+    def __isParent(self, obj):
+        """
+        Returns whether the object of a hierarchy triple is taken as a parent, as UpperOntology.getParentClasses does
+        :param obj: rdflib term
+        :return: bool
+        """
+        if self.kind == CLASS:
+            return obj != URIRef("%s#%s" % (c.OWL_NS, "NamedIndividual")) and not isinstance(obj, BNode)
+        return True
+
+    def __parentURI(self, o, obj):
+        """
+        Returns the URI a parent is identified by
+        :param o: UpperOntology instance
+        :param obj: rdflib term; object of a hierarchy triple
+        :return: string
+        """
+        if self.ns is None:
+            return str(obj)
+        return "%s#%s" % (self.ns, o.stripNamespace(obj))
+
+    def __link(self, uri, parent):
+        """
+        Links an element to one of its parents
+        :param uri: string; URI of the element
+        :param parent: string; URI of the parent
+        :return: None
+        """
+        parents = self.parents.setdefault(uri, [])
+        if parent not in parents:
+            parents.append(parent)
+        children = self.children.setdefault(parent, [])
+        if uri not in children:
+            children.append(uri)
+
+    def __ancestorsOf(self, uri, visiting):
+        """
+        Returns the ancestors of an element, computing those of its parents first if needed
+        :param uri: string; URI of the element
+        :param visiting: set<string>; elements whose ancestors are being computed; a cycle back to any of them is
+        ignored
+        :return: frozenset<string>
+        """
+        ancestors = self.ancestors.get(uri)
+        if ancestors is None:
+            visiting.add(uri)
+            ancestors = set()
+            for p in self.parents.get(uri, []):
+                ancestors.add(p)
+                if p not in visiting:
+                    ancestors.update(self.__ancestorsOf(p, visiting))
+            visiting.discard(uri)
+            ancestors.discard(uri)
+            ancestors = self.ancestors[uri] = frozenset(ancestors)
+        return ancestors
+
+    def __closeOver(self, uri):
+        """
+        Tabulates the ancestors of an element, and adds it to the descendants of each of them
+        :param uri: string; URI of the element
+        :return: None
+        """
+        for a in self.__ancestorsOf(uri, set()):
+            self.descendants.setdefault(a, set()).add(uri)
+
+    def parentsOf(self, uri):
+        """
+        Returns the parents of an element
+        :param uri: string; URI of the element
+        :return: list<string>: URIs of its parents, in the order they were read
+        """
+        with self.lock:
+            return list(self.parents.get(uri, []))
+
+    def childrenOf(self, uri):
+        """
+        Returns the children of an element
+        :param uri: string; URI of the element
+        :return: list<string>: URIs of its children, in the order they were read
+        """
+        with self.lock:
+            return list(self.children.get(uri, []))
+
+    def topElementsOf(self, uri):
+        """
+        Returns the most generic ancestors of an element: those without parents at the end of its longest paths
+        along the hierarchy
+        :param uri: string; URI of the element
+        :return: list<string>: URIs of the top elements; the element itself if it has no parents
+        """
+        with self.lock:
+            return list(self.__topElementsOf(uri, set()))
+
+    def __topElementsOf(self, uri, visiting):
+        """
+        Returns the furthest top ancestors of an element, following the parents one step closer to the top
+        :param uri: string; URI of the element
+        :param visiting: set<string>; elements whose top ancestors are being computed; a cycle back to any of them is
+        ignored
+        :return: list<string>
+        """
+        tops = self.tops.get(uri)
+        if tops is None:
+            distance = self.__distanceOf(uri, set())
+            parents = [p for p in self.parents.get(uri, []) if p not in visiting]
+            if parents:
+                visiting.add(uri)
+                tops = []
+                for p in parents:
+                    if self.__distanceOf(p, set()) == distance - 1:
+                        tops.extend(t for t in self.__topElementsOf(p, visiting) if t not in tops)
+                visiting.discard(uri)
+            tops = self.tops[uri] = tops or [uri]
+        return tops
+
+    def distanceOf(self, uri):
+        """
+        Returns the specificity distance of an element: the length of the longest path to a top element, from 1
+        :param uri: string; URI of the element
+        :return: int
+        """
+        with self.lock:
+            return self.__distanceOf(uri, set())
+
+    def __distanceOf(self, uri, visiting):
+        """
+        Returns the specificity distance of an element, computing those of its ancestors first if needed
+        :param uri: string; URI of the element
+        :param visiting: set<string>; elements whose distance is being computed; a cycle back to any of them is
+        ignored
+        :return: int
+        """
+        distance = self.distances.get(uri)
+        if distance is None:
+            visiting.add(uri)
+            distance = 1 + max([self.__distanceOf(p, visiting) for p in self.parents.get(uri, [])
+                                if p not in visiting] or [0])
+            visiting.discard(uri)
+            self.distances[uri] = distance
+        return distance
+
+    def update(self, o, name):
+        """
+        Reads the parents of the elements with the given name again, and updates the distance and closure of those
+        elements and of their descendants
+        :param o: UpperOntology instance
+        :param name: string; name of the subject of the changed hierarchy triples
+        :return: dict<string, int>: previous distance of the elements whose distance has changed
+        """
+        changed = {}
+        with self.lock:
+            subjects = set(self.parents.keys() + self.distances.keys())  # Elements that may have lost all parents
+            subjects.update(str(s) for s in o.graph.subjects(self.predicate, None))
+            subjects = [s for s in subjects if o.stripNamespace(s) == name]
+            affected = set(subjects)  # The elements and their descendants
+            for s in subjects:
+                affected.update(self.descendants.get(s, ()))
+                for p in self.parents.pop(s, []):
+                    if s in self.children.get(p, []):
+                        self.children[p].remove(s)
+                for obj in o.graph.objects(URIRef(s), self.predicate):
+                    if self.__isParent(obj):
+                        self.__link(s, self.__parentURI(o, obj))
+            for s in affected:
+                for a in self.ancestors.pop(s, ()):
+                    self.descendants.get(a, set()).discard(s)
+                self.tops.pop(s, None)
+            for s in affected:
+                self.__closeOver(s)
+            previous = dict((s, self.distances.pop(s)) for s in affected if s in self.distances)
+            for s, old in previous.iteritems():
+                if self.__distanceOf(s, set()) != old:
+                    changed[s] = old
+        return changed
+
+
+def hierarchyOf(o, kind, ns=None):
+    """
+    Returns the class or property hierarchy of the given ontology, reading it the first time
+    :param o: UpperOntology instance
+    :param kind: string; CLASS or PROPERTY
+    :param ns: string; namespace parents are looked up in; None to keep the URIs of parents
+    :return: Hierarchy instance
+    """
+    key = (o.sess_id, kind, ns)
+    with _hierarchies_lock:
+        hierarchy = _hierarchies.get(key)
+        if hierarchy is None:
+            hierarchy = _hierarchies[key] = Hierarchy(o, kind, ns)
+        return hierarchy
+
+
+def updateHierarchies(o, s=None, p=None):
+    """
+    Updates the hierarchies of an ontology after a change in the triples with the given subject and property; they
+    are dropped instead if the parents of any element may have changed
+    :param o: UpperOntology instance
+    :param s: string; name of the subject of the changed triples; None for any
+    :param p: string; name of the property of the changed triples; None for any
+    :return: dict<string, dict<string, int>>: for each kind of element whose hierarchy may have changed, previous
+    distance of the elements whose distance has changed; None if not known, i.e. if a hierarchy property changed and
+    the hierarchy had not been read or was dropped. Empty if the whole graph may have changed.
+    """
+    kinds = [kind for kind, hp in HIERARCHY_PROPERTIES.iteritems() if p in [None, hp]]
+    with _hierarchies_lock:
+        hierarchies = []
+        for key, h in _hierarchies.items():
+            if key[0] == o.sess_id and h.kind in kinds:
+                if s is None:
+                    del _hierarchies[key]
+                else:
+                    hierarchies.append(h)
+    if s is None and p is None:
+        return {}
+    changed = {}
+    for h in hierarchies:
+        h_changed = h.update(o, s)
+        if h.ns == o.VIS_NS:
+            changed[h.kind] = h_changed
+    if p is not None:
+        for kind in kinds:
+            changed.setdefault(kind, None)
+    return changed
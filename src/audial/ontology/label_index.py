@@ -0,0 +1,137 @@
+"""
+Inverted index of the labels of a chart: maps the text of each label to the bitmap of the bars it labels, so that
+label filters are applied as bitwise AND/ANDNOT operations instead of crawling the ontology graph once per label.
+Texts are matched exactly, as UpperVisOntology.getElementsLabeledByText does.
+"""
+from rdflib import Literal, URIRef
+import threading
+
+_indexes = {}  # Key: session/store index of a chart; value: LabelIndex instance
+_indexes_lock = threading.Lock()
+
+
+class LabelIndex(object):
+    """
+    Label text -> bar bitmap index. Bitmaps are Python integers whose bit i is set if the bar in row i is labeled by
+    a label with the given text.
+    """
+    def __init__(self, o):
+        """
+        LabelIndex constructor; crawls the labels of the given ontology once
+        :param o: BarChartOntology instance
+        """
+        self.ids = list(o.getStackedBars()) + list(o.getMetricBars())  # Bar instance names
+        self.index = dict((b, i) for i, b in enumerate(self.ids))  # Row of each bar
+        self.bitmaps = {}  # Key: text literal of a label; value: bitmap of labeled bars
+        #  Properties whose triples this index depends on
+        self.properties = set([o.SyntacticProperty.IS_LABELED_BY, o.SytacticDataProperty.HAS_TEXT,
+                               o.SyntacticProperty.HAS_SYNTACTIC_ROLE])
+        labels = set(o.getLabels())
+        text_property = URIRef("%s#%s" % (o.VIS_NS, o.SytacticDataProperty.HAS_TEXT))
+        for element, text in o.graph.subject_objects(text_property):
+            label = o.stripNamespace(element)
+            if label in labels:
+                for e in o.getSubjects(o.SyntacticProperty.IS_LABELED_BY, label):
+                    self.__addBar(text, e)
+
+    def __addBar(self, text, bar):
+        """
+        Sets the bit of the given bar in the bitmap of the given text
+        :param text: Literal; text of a label
+        :param bar: string; bar instance name. Elements that are not bars are ignored
+        :return: None
+        """
+        row = self.index.get(bar)
+        if row is not None:
+            self.bitmaps[text] = self.bitmaps.get(text, 0) | (1 << row)
+
+    def bitsOf(self, bars):
+        """
+        Returns the bitmap of the given bars
+        :param bars: iterable<string>; bar instance names. Bars not in the index are ignored
+        :return: int
+        """
+        bits = 0
+        index = self.index
+        for b in bars:
+            row = index.get(b)
+            if row is not None:
+                bits |= 1 << row
+        return bits
+
+    def barsOf(self, bits):
+        """
+        Returns the bars set in the given bitmap
+        :param bits: int; bitmap of bars
+        :return: set<string>: bar instance names
+        """
+        bars = set()
+        while bits:
+            lowest = bits & -bits
+            bars.add(self.ids[lowest.bit_length() - 1])
+            bits ^= lowest
+        return bars
+
+    def bitsWithText(self, text):
+        """
+        Returns the bitmap of the bars labeled by labels with the given text
+        :param text: string; text of the label
+        :return: int
+        """
+        return self.bitmaps.get(Literal(text), 0) if text else 0
+
+    def filter(self, bars, labels, negate=False):
+        """
+        Returns the given bars that are labeled by all the given label texts, or by none of them if negate is True
+        :param bars: iterable<string>; bars to consider
+        :param labels: iterable<string>; label texts
+        :param negate: boolean; whether to logically negate the results (default False)
+        :return: set<string>: bars satisfying the filters
+        """
+        mask = self.bitsOf(bars)
+        for text in labels:
+            if negate:
+                mask &= ~self.bitsWithText(text)
+            else:
+                mask &= self.bitsWithText(text)
+        return self.barsOf(mask)
+
+    def dependsOn(self, s, p):
+        """
+        Returns whether a change in triples with the given subject and property may alter this index
+        :param s: string; name of the subject of the triples; None for any subject
+        :param p: string; name of the property of the triples; None for any property
+        :return: boolean
+        """
+        return (s is None and p is None) or p in self.properties
+
+
+def labelIndexOf(o):
+    """
+    Returns the label index of the chart handled by the given ontology, building it the first time
+    :param o: BarChartOntology instance
+    :return: LabelIndex instance
+    """
+    with _indexes_lock:
+        index = _indexes.get(o.sess_id)
+        if index is None:
+            index = LabelIndex(o)
+            _indexes[o.sess_id] = index
+        return index
+
+
+def dropLabelIndex(sess_id, s=None, p=None):
+    """
+    Drops the label index of a chart if it may be affected by a change in the triples with the given subject and
+    property
+    :param sess_id: string; session/store index of the chart
+    :param s: string; name of the subject of the changed triples; None for any
+    :param p: string; name of the property of the changed triples; None for any
+    :return: boolean; whether an index was dropped
+    """
+    with _indexes_lock:
+        index = _indexes.get(sess_id)
+        if index is not None and index.dependsOn(s, p):
+            del _indexes[sess_id]
+            return True
+        return False
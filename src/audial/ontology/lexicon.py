@@ -0,0 +1,136 @@
+"""
+Surface-form lexicon of an ontology: maps the folded form (lowercase, underscores as spaces) of every literal and of
+the name of every individual, class and property to the exact values and URIs sharing that form, so that looking up
+a free-formed string costs a single dictionary access instead of a series of triple-membership probes per variant
+of the string.
+"""
+from rdflib import RDF, Literal, XSD
+from rdflib.term import URIRef
+from util import stringToID
+import const as c
+import threading
+
+_lexicons = {}  # Key: session/store index of an ontology; value: SurfaceLexicon instance
+_lexicons_lock = threading.Lock()
+
+# Key: type of element as given to UpperOntology.thingOfTypeExists; value: OWL class of its instances
+ELEMENT_TYPES = {'individual': 'NamedIndividual', 'class': 'Class', 'objectProperty': 'ObjectProperty',
+                 'datatypeProperty': 'DatatypeProperty'}
+
+# Names of the properties whose changes alter the lexicon: the typing of elements, and the properties of the text
+# users refer to elements by (rdfs:label and rdfs:comment, the text of chart labels, verbalizations of tasks). Values
+# computed by the application (lengths, navigation order, scores, axis values, task results...) are not surface forms,
+# so writing them keeps the lexicon.
+SURFACE_PROPERTIES = frozenset(['type', 'label', 'comment', 'has_text', 'task_has_verbalization'])
+
+
+def foldText(text):
+    """
+    Returns the folded form of a string, shared by all the variants of it tried by UpperOntology.thingOfTypeExists
+    :param text: string
+    :return: unicode
+    """
+    if not isinstance(text, unicode):
+        text = text.decode('utf8')
+    return u' '.join(text.lower().replace(u'_', u' ').split())
+
+
+class SurfaceLexicon(object):
+    """
+    Folded surface form -> {element type: set of literal values or URIs} index of an ontology
+    """
+    def __init__(self, o):
+        """
+        SurfaceLexicon constructor; crawls the literals and typed elements of the given ontology once
+        :param o: UpperOntology instance
+        """
+        self.forms = {}  # Key: folded form; value: dict<string, set<unicode>>: values or URIs by type
+        for obj in set(o.graph.objects()):
+            if isinstance(obj, Literal) and obj.language is None and obj.datatype in [None, XSD.string]:
+                self.__add(unicode(obj), 'literal', unicode(obj))
+        for subjectType, owl_class in ELEMENT_TYPES.iteritems():
+            for s in o.graph.subjects(RDF.type, URIRef("%s#%s" % (c.OWL_NS, owl_class))):
+                if isinstance(s, URIRef) and '#' in s:
+                    name = s.rsplit('#', 1)[1]
+                    self.__add(name, subjectType, unicode(s))
+
+    def __add(self, text, subjectType, value):
+        """
+        Adds an entry to the lexicon
+        :param text: string; surface form
+        :param subjectType: string; type of the element
+        :param value: unicode; literal value or URI of the element
+        :return: None
+        """
+        key = foldText(text)
+        if key:
+            self.forms.setdefault(key, {}).setdefault(subjectType, set()).add(value)
+
+    def lookup(self, name, subjectType, ns):
+        """
+        Returns the element of the given type matching a name, trying its variants in the same order as
+        UpperOntology.thingOfTypeExists
+        :param name: string; the name of the thing to search for, without namespace
+        :param subjectType: 'literal', 'individual', 'class', 'objectProperty', or 'datatypeProperty'
+        :param ns: namespace of the element
+        :return: Found element's URI (or value, for literals) if exists, False otherwise
+        """
+        if subjectType != 'literal' and subjectType not in ELEMENT_TYPES:
+            raise ValueError('lookup: invalid type %s' % subjectType)
+        values = self.forms.get(foldText(name), {}).get(subjectType)
+        if not values:
+            return False
+        if subjectType == 'literal':
+            candidates = [name.replace(' ', '_')]
+            candidates.append(candidates[-1].lower())
+            candidates.append(stringToID(name, subjectType))
+            candidates.append(candidates[-1].replace('_', ' '))
+            candidates.append(candidates[-1].lower())
+        else:
+            candidates = ["%s#%s" % (ns, n) for n in [name.replace(' ', '_'), name.lower().replace(' ', '_'),
+                                                       stringToID(name, subjectType)]]
+        for candidate in candidates:
+            if candidate in values:
+                return str(candidate)
+        return False
+
+    def dependsOn(self, s, p):
+        """
+        Returns whether a change in triples with the given subject and property may alter this lexicon (see
+        SURFACE_PROPERTIES)
+        :param s: string; name of the subject of the triples; None for any subject
+        :param p: string; name of the property of the triples; None for any property
+        :return: boolean
+        """
+        return p is None or p in SURFACE_PROPERTIES
+
+
+def lexiconOf(o):
+    """
+    Returns the surface-form lexicon of the given ontology, building it the first time
+    :param o: UpperOntology instance
+    :return: SurfaceLexicon instance
+    """
+    with _lexicons_lock:
+        lexicon = _lexicons.get(o.sess_id)
+        if lexicon is None:
+            lexicon = SurfaceLexicon(o)
+            _lexicons[o.sess_id] = lexicon
+        return lexicon
+
+
+def dropLexicon(sess_id, s=None, p=None):
+    """
+    Drops the lexicon of an ontology if it may be affected by a change in the triples with the given subject and
+    property
+    :param sess_id: string; session/store index of the ontology
+    :param s: string; name of the subject of the changed triples; None for any
+    :param p: string; name of the property of the changed triples; None for any
+    :return: boolean; whether a lexicon was dropped
+    """
+    with _lexicons_lock:
+        lexicon = _lexicons.get(sess_id)
+        if lexicon is not None and lexicon.dependsOn(s, p):
+            del _lexicons[sess_id]
+            return True
+        return False
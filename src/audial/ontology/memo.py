@@ -0,0 +1,77 @@
+"""
+Generation-versioned memoization of ontology read primitives.
+
+Every pooled graph owns a GraphMemo. Results of memoized methods are stored keyed by method name and call arguments
+and tagged with the generation of the graph at the time they were computed. Any write to the graph bumps the
+generation, so results computed before the write are never served afterwards; this holds even for results stored
+by a concurrent reader after the bump, since their tag is already stale.
+"""
+from functools import wraps
+import threading
+
+
+class GraphMemo(object):
+    """
+    Memoization store of a graph, with hit/miss statistics per memoized method
+    """
+    def __init__(self):
+        self.generation = 0  # Incremented on every change to the graph
+        self.entries = {}  # Key: (method name, args, kwargs); value: (generation, result)
+        self.stats = {}  # Key: method name; value: [hits, misses]
+        self.lock = threading.Lock()
+
+    def bump(self):
+        """
+        Invalidates all memoized results after a change to the graph
+        :return: None
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries = {}
+
+    def hitsAndMisses(self):
+        """
+        Returns the hit/miss statistics of the memoized methods
+        :return: dict<string, dict<string, int>>: for each method name, its number of hits and misses
+        """
+        report = {}
+        for name, (hits, misses) in self.stats.items():
+            report[name] = {'hits': hits, 'misses': misses}
+        return report
+
+
+def memoized(f):
+    """
+    Decorator memoizing an ontology read method in the GraphMemo of the handler's graph (self.memo). Calls with
+    unhashable arguments, or made on a handler without a graph, are not memoized. Lists are copied on the way out so
+    callers can modify them freely.
+    :param f: method of an UpperOntology (sub)class
+    :return: decorated method
+    """
+    name = f.__name__
+
+    @wraps(f)
+    def wrapper(self, *args, **kwargs):
+        memo = self.memo
+        if memo is None:
+            return f(self, *args, **kwargs)
+        key = (name, args, tuple(sorted(kwargs.items())))
+        try:
+            entry = memo.entries.get(key)
+        except TypeError:
+            return f(self, *args, **kwargs)
+        stats = memo.stats.get(name)
+        if stats is None:
+            stats = memo.stats.setdefault(name, [0, 0])
+        generation = memo.generation
+        if entry is not None and entry[0] == generation:
+            stats[0] += 1
+            result = entry[1]
+        else:
+            stats[1] += 1
+            result = f(self, *args, **kwargs)
+            memo.entries[key] = (generation, result)
+        if isinstance(result, list):
+            return list(result)
+        return result
+    return wrapper
@@ -0,0 +1,182 @@
+"""
+Navigation index of a chart: the bars in navigation order, the position of each bar among those of its role (metric
+or stacked), and the parent/children links between stacked bars and their metric bars. Moves between bars become
+list lookups and paths between bars list slices, instead of reading order, role and containment triples from the
+ontology graph on every step. The index is rebuilt when the navigation order is recomputed (see
+BarChartOntology.computeBarsNavOrder).
+"""
+from bisect import bisect_left, bisect_right
+import threading
+
+_indexes = {}  # Key: session/store index of a chart; value: NavIndex instance
+_indexes_lock = threading.Lock()
+
+
+class NavIndex(object):
+    """
+    Bar navigation index; bars without a navigation order are only indexed by role and containment
+    """
+    METRIC = 'metric'
+    STACKED = 'stacked'
+
+    def __init__(self, o):
+        """
+        NavIndex constructor; crawls the bars of the given ontology once
+        :param o: BarChartOntology instance
+        """
+        stacked = o.getStackedBars()
+        metric = o.getMetricBars()
+        self.role = dict((b, self.METRIC) for b in metric)  # Role of each bar
+        self.role.update((b, self.STACKED) for b in stacked)
+        self.ordinal = {}  # Navigation order of each bar; read per bar, as bars may share an order
+        for b in self.role:
+            n = o.getValue(b, o.NavigationDataProperty.HAS_ORDER)
+            if n:
+                self.ordinal[b] = int(n)
+        self.order = sorted(self.ordinal, key=self.ordinal.get)  # Bars in navigation order
+        self.position = dict((b, i) for i, b in enumerate(self.order))  # Position of each bar in self.order
+        self.lineups = {self.METRIC: [], self.STACKED: []}  # Ordered bars of each role, as navigated horizontally
+        for b in self.order:
+            self.lineups[self.role[b]].append(b)
+        self.ordinals = dict((r, [self.ordinal[b] for b in bars]) for r, bars in self.lineups.iteritems())
+        self.parent = {}  # Key: metric bar; value: stacked bar containing it
+        self.children = {}  # Key: stacked bar; value: list of its ordered metric bars, in navigation order
+        for s in stacked:
+            children = [e for e in o.getConstituentElements(s) if self.role.get(e) == self.METRIC]
+            self.children[s] = sorted([e for e in children if e in self.ordinal], key=self.ordinal.get)
+        if stacked:
+            for m in metric:
+                s = o.getStackedBarOfMetric(m)
+                if s:
+                    self.parent[m] = s
+
+    def isBar(self, bar):
+        """
+        Returns whether the given element is a bar of the chart
+        :param bar: string; element instance name
+        :return: boolean
+        """
+        return bar in self.role
+
+    def isStacked(self, bar):
+        """
+        Returns whether the given element is a stacked bar
+        :param bar: string; element instance name
+        :return: boolean
+        """
+        return self.role.get(bar) == self.STACKED
+
+    def isMetric(self, bar):
+        """
+        Returns whether the given element is a metric bar
+        :param bar: string; element instance name
+        :return: boolean
+        """
+        return self.role.get(bar) == self.METRIC
+
+    def ordered(self, bars=None):
+        """
+        Returns the given bars that have a navigation order, in that order
+        :param bars: iterable<string>; bar instance names; None for all
+        :return: list<string>
+        """
+        if bars is None:
+            return list(self.order)
+        position = self.position
+        return sorted([b for b in set(bars) if b in position], key=position.get)
+
+    def extreme(self, pos='first', role=None):
+        """
+        Returns the first or last ordered bar, of a given role or of any role
+        :param pos: string; 'first' or 'last'
+        :param role: string; NavIndex.METRIC or NavIndex.STACKED; None for any
+        :return: string; bar instance name; None if there are no ordered bars
+        """
+        bars = self.lineups[role] if role else self.order
+        if not bars:
+            return None
+        return bars[0] if pos == 'first' else bars[-1]
+
+    def step(self, bar, n, bars=None):
+        """
+        Returns the bars of the same role as the given one visited when taking n steps from it
+        :param bar: string; bar instance name to start from; it must have a navigation order
+        :param n: int; number of steps; to the previous bars if negative, to the next ones otherwise
+        :param bars: iterable<string>; bar instance names to step on; None for all
+        :return: list<string>: visited bars, without the starting one; fewer than abs(n) if the end of the chart is
+        reached before
+        """
+        role = self.role.get(bar)
+        lineup = self.lineups.get(role, [])
+        if bars is not None:
+            bars = set(bars)
+        k = abs(n)
+        visited = []
+        if n > 0:
+            i = bisect_right(self.ordinals.get(role, []), self.ordinal[bar])
+            while i < len(lineup) and len(visited) < k:
+                if bars is None or lineup[i] in bars:
+                    visited.append(lineup[i])
+                i += 1
+        elif n < 0:
+            i = bisect_left(self.ordinals.get(role, []), self.ordinal[bar]) - 1
+            while i >= 0 and len(visited) < k:
+                if bars is None or lineup[i] in bars:
+                    visited.append(lineup[i])
+                i -= 1
+        return visited
+
+    def path(self, bar_start=None, bar_end=None, bars=None):
+        """
+        Returns the bars visited from one bar to another, following their navigation order; see
+        BarChartOntology.pathBetweenBars
+        :param bar_start: string; bar instance name where the path begins; None to start from the first bar
+        :param bar_end: string; bar instance name where the path ends; None to end in the last bar
+        :param bars: iterable<string>; bars to consider; None for all
+        :return: list<string>
+        """
+        if bars is not None:
+            bars = set(bars)
+        position = self.position
+
+        def positionOf(b):
+            if b is None or (bars is not None and b not in bars):
+                return None
+            return position.get(b)
+
+        i, j = positionOf(bar_start), positionOf(bar_end)
+        reverse = False
+        if bar_start is None:
+            i = 0
+        elif j is not None and (i is None or j < i):
+            i, j, reverse = j, i, True  # The end comes first: walk from it, and reverse the path
+        elif i is None:
+            return []
+        path = self.order[i:j + 1 if j is not None else len(self.order)]
+        if bars is not None:
+            path = [b for b in path if b in bars]
+        return path[::-1] if reverse else path
+
+
+def navIndexOf(o):
+    """
+    Returns the navigation index of the chart handled by the given ontology, building it the first time
+    :param o: BarChartOntology instance
+    :return: NavIndex instance
+    """
+    with _indexes_lock:
+        index = _indexes.get(o.sess_id)
+        if index is None:
+            index = NavIndex(o)
+            _indexes[o.sess_id] = index
+        return index
+
+
+def dropNavIndex(sess_id):
+    """
+    Drops the navigation index of a chart so it is rebuilt on its next use, e.g. after its bar order has changed
+    :param sess_id: string; session/store index of the chart
+    :return: None
+    """
+    with _indexes_lock:
+        _indexes.pop(sess_id, None)
@@ -0,0 +1,66 @@
+"""
+Process-wide cache of chart summaries. The summary of a chart only depends on the chart, so it is generated once and
+served to every session; entries are keyed by the checksum of the chart's RDF file, so a summary is generated again
+when the file changes, and are dropped when the whole graph is reloaded.
+"""
+import os
+import threading
+from ontology.graph_pool import graphSource
+
+_summaries = {}  # Key: session/store index of a chart; value: (checksum of its RDF file, summary)
+_summaries_lock = threading.Lock()
+_chart_locks = {}  # Key: session/store index of a chart; value: lock held while generating its summary
+_checksums = {}  # Key: path to an RDF file; value: ((modification time, size), checksum)
+
+
+def sourceChecksumOf(sess_id):
+    """
+    Returns the checksum of the RDF file of a chart; the file is only read again when it has been modified
+    :param sess_id: string; session/store index of the chart
+    :return: string; None if the file is unknown or checksums are not available
+    """
+    source = graphSource(sess_id)
+    if not source:
+        return None
+    try:
+        from ontology.compiled_chart import sourceChecksum
+        st = os.stat(source)
+    except (ImportError, OSError):
+        return None
+    stamp = (st.st_mtime, st.st_size)
+    cached = _checksums.get(source)
+    if cached is None or cached[0] != stamp:
+        cached = _checksums[source] = (stamp, sourceChecksum(source))
+    return cached[1]
+
+
+def summaryOf(o):
+    """
+    Returns the summary of the chart handled by the given ontology, generating it the first time
+    :param o: BarChartOntology instance
+    :return: string; summary in NL
+    """
+    checksum = sourceChecksumOf(o.sess_id)
+    with _summaries_lock:
+        entry = _summaries.get(o.sess_id)
+        if entry is not None and entry[0] == checksum:
+            return entry[1]
+        chart_lock = _chart_locks.setdefault(o.sess_id, threading.Lock())
+    with chart_lock:  # Only requests of the same chart wait for its summary to be generated
+        with _summaries_lock:
+            entry = _summaries.get(o.sess_id)
+        if entry is None or entry[0] != checksum:
+            entry = (checksum, o.generateSummary())
+            with _summaries_lock:
+                _summaries[o.sess_id] = entry
+        return entry[1]
+
+
+def dropSummary(sess_id):
+    """
+    Drops the cached summary of a chart so it is generated again on its next use
+    :param sess_id: string; session/store index of the chart
+    :return: None
+    """
+    with _summaries_lock:
+        _summaries.pop(sess_id, None)
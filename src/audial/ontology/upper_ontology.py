@@ -3,9 +3,12 @@ from rdflib.term import URIRef
 from rdflib import RDF, RDFS, Literal, XSD
 from util import *
 import os
-import bsddb
 import const as c
 import constants as o_c
+import graph_pool
+from memo import memoized
+from lexicon import lexiconOf, dropLexicon
+from hierarchy import hierarchyOf, updateHierarchies, CLASS, PROPERTY
 
 
 class UpperOntology(object):
@@ -21,18 +24,24 @@ class UpperOntology(object):
         """
         self.VIS_NS = c.VIS_NS
         self.sess_id = sess_id
-        self.graph = rdflib.ConjunctiveGraph("Sleepycat")
+        self.graph = None
+        self.graph_lock = None  # Lock shared by all handlers of the same pooled graph; held while writing
+        self.memo = None  # GraphMemo of the pooled graph; memoized read results
         store_dir = "%s_%s" % (sess_id, o_c.ONT_REL_DIR)
         store_path = os.path.join(os.path.dirname(__file__), store_dir)
-        if not os.path.isdir(store_path):
+        if not graph_pool.isInMemory(sess_id) and not os.path.isdir(store_path):
             os.makedirs(store_path)
-        already_loaded = self.open(store_path)
-        if reload:
-            for context in self.graph.contexts():
-                self.graph.remove_context(context)
-            self.load(RDFpath)
-        if not already_loaded and RDFpath is not None:
-            self.load(RDFpath)
+        already_loaded = self.open(store_path, RDFpath)
+        if reload and already_loaded:
+            try:
+                with self.graph_lock:
+                    for context in self.graph.contexts():
+                        self.graph.remove_context(context)
+                    self.load(RDFpath)
+                self._onTripleChanged(None, None)
+            except Exception:
+                self.close()  # The caller never gets this handler, so it could not give the graph back
+                raise
 
     class ScoreDataProperty:
         """
@@ -42,18 +51,18 @@ class UpperOntology(object):
         HAS_DISTANCE_SCORE = "has_distance_score"
         HAS_PROP_FINAL_SCORE = "has_property_final_score"
 
-    def open(self, path):
+    def open(self, path, source=None):
         """
-        Open or create a persistent ontology graph
+        Borrow a persistent ontology graph from the process-wide pool, opening or creating it if necessary
+        :param path: string; path to the persistent graph store
+        :param source: string; path to an RDF file to populate the store with if it has just been created
+        :return: bool; whether the graph store already existed
         """
-        exists = True
-        try:
-            self.graph.open(path, create=False)
-        except bsddb.db.DBNoSuchFileError:
-            self.graph.open(path, create=True)
-            exists = False
-        finally:
-            return exists
+        entry, exists = graph_pool.acquireGraph(self.sess_id, path, source)
+        self.graph, self.graph_lock, self.memo = entry.graph, entry.lock, entry.memo
+        if not exists:
+            self.path = source
+        return exists
 
     def load(self, fileName):
         """
@@ -61,7 +70,7 @@ class UpperOntology(object):
         """
         if fileName:
             self.path = fileName
-            self.graph.load(fileName)
+            graph_pool.loadSource(self.graph, fileName)
 
     def save(self, fileName):
         """
@@ -77,11 +86,12 @@ class UpperOntology(object):
 
     def close(self):
         """
-        Close graph to avoid lock entries leak
+        Give the graph back to the pool; the underlying store is kept open until shutdown or eviction
         """
-        if self.graph:
-            self.graph.close()
+        if self.graph is not None:  # An empty graph is falsy
+            graph_pool.releaseGraph(self.sess_id)
             self.graph = None
+            self.memo = None
 
     def count(self, element):
         """
@@ -314,13 +324,9 @@ class UpperOntology(object):
         Returns all literals in the ontology
         :return: list<string>: a list of literal values
         """
-        query = """SELECT DISTINCT ?o
-                   WHERE { ?s ?p ?o
-                        FILTER isLiteral(?o)
-                   }"""
-        query_res = self.graph.query(query)
-        return [row[0].toPython() for row in query_res]
+        return [obj.toPython() for obj in set(self.graph.objects()) if isinstance(obj, Literal)]
 
+    @memoized
     def getSubjects(self, property, obj, propertyType='object', dtype=None,
                     ns=None, stripns=True):
         """
@@ -349,6 +355,7 @@ class UpperOntology(object):
         else:
             return [str(s) for s in subjects]
 
+    @memoized
     def getObjects(self, subj, property, ns=None, stripns=True):
         """
         Returns a list with all objects for a given subject, property pair
@@ -370,6 +377,7 @@ class UpperOntology(object):
         else:
             return [str(o) for o in objects]
 
+    @memoized
     def getValue(self, s, p, default=None, ns=None, stripns=True):
         """
         Returns the value of a functional property. An exception is raised
@@ -399,6 +407,7 @@ class UpperOntology(object):
         else:
             return self.stripNamespace(str(val)) if stripns else val.toPython()
 
+    @memoized
     def getClassOfElement(self, element, stripns=True, ns=None):
         """
         Return the Entities an individual belongs to; an empty list if none found
@@ -429,32 +438,37 @@ class UpperOntology(object):
         Returns the most generic parent element (class or property) of the given child
         :param child: The name of the child class or property
         :param elem_type: ontology resource type of element: 'class' or 'property'
-        :param ns: namespace, None for default visualization NS
-        :param int: current depth level of search
-        :return: list<string>: the URIs of the topmost parent elements (usually just one)
+        :param ns: namespace of parents, None to take that of each element
+        :param int: depth level of the child
+        :return: (list<string>, int): the URIs of the topmost parent elements (usually just one), and their depth
+        level (that of the child plus the length of the longest path from the child to them)
         """
         if child:
             if elem_type == 'class':
-                parents = self.getParentClasses(child, ns, stripns=False)
+                kind = CLASS
             elif elem_type == 'property':
-                parents = self.getParentProperties(child, ns, stripns=False)
+                kind = PROPERTY
             else:
-                parents = []
-            max_parent_depth = -1
-            topclasses = [child]
-            depth += 1
-            for c in parents:
-                next_classes, next_depth = self.getTopElements(c, elem_type, ns, depth)
-                if next_depth > max_parent_depth:
-                    max_parent_depth = next_depth
-                    topclasses = next_classes
-                    depth = max_parent_depth + 1
-                elif next_depth == max_parent_depth:
-                    topclasses.extend(next_classes)
+                return [child], depth + 1
+            hierarchy = hierarchyOf(self, kind, ns)
+            uri = self.__hierarchyURI(child, ns)
+            topclasses = hierarchy.topElementsOf(uri)
+            if topclasses == [uri]:
+                topclasses = [child]
+            depth += hierarchy.distanceOf(uri)
         else:
             topclasses = []
         return topclasses, depth
 
+    def __hierarchyURI(self, name, ns=None):
+        """
+        Returns the URI a class or property is identified by in its hierarchy
+        :param name: The name or URI of the element
+        :param ns: namespace, None to take that of the element or the default visualization NS
+        :return: string
+        """
+        return "%s#%s" % (ns or self.getNamespace(name) or self.VIS_NS, self.stripNamespace(name))
+
     def getSubclasses(self, parentClass, ns=None):
         """
         Returns all subclasses for the parent class.
@@ -462,14 +476,8 @@ class UpperOntology(object):
         :param ns: namespace, None for default visualization NS
         :return: List<string> its subclasses
         """
-        if not ns:
-            ns = self.getNamespace(parentClass)
-            if not ns:
-                ns = self.VIS_NS
-        namedIndividualURI = URIRef("%s#%s" % (c.OWL_NS, "NamedIndividual"))
-        propertyURI = URIRef("%s#subClassOf" % c.RDFS_NS)
-        objectURI = URIRef("%s#%s" % (ns, self.stripNamespace(parentClass)))
-        subjects = self.graph.subjects(propertyURI, objectURI)
+        namedIndividualURI = "%s#%s" % (c.OWL_NS, "NamedIndividual")
+        subjects = hierarchyOf(self, CLASS).childrenOf(self.__hierarchyURI(parentClass, ns))
         classes = [self.stripNamespace(s) for s in subjects
                    if s != namedIndividualURI]
         return classes
@@ -482,19 +490,9 @@ class UpperOntology(object):
         :param stripns: True to strip the namespace from the output (default), False otherwise
         :return: List<string> its parent classes
         """
-        if not ns:
-            ns = self.getNamespace(childClass)
-            if not ns:
-                ns = self.VIS_NS
-        namedIndividualURI = URIRef("%s#%s" % (c.OWL_NS, "NamedIndividual"))
-        propertyURI = URIRef("%s#subClassOf" % c.RDFS_NS)
-        subjectURI = URIRef("%s#%s" % (ns, self.stripNamespace(childClass)))
-        objects = self.graph.objects(subjectURI, propertyURI)
+        classes = hierarchyOf(self, CLASS).parentsOf(self.__hierarchyURI(childClass, ns))  # Without BNodes
         if stripns:
-            classes = [self.stripNamespace(o) for o in objects
-                       if o != namedIndividualURI and not isinstance(o, rdflib.BNode)]
-        else:
-            classes = [str(o) for o in objects if o != namedIndividualURI and not isinstance(o, rdflib.BNode)]
+            classes = [self.stripNamespace(o) for o in classes]
         return classes
 
     def getParentProperties(self, childProp, ns=None, stripns=True):
@@ -505,17 +503,11 @@ class UpperOntology(object):
         :param stripns: True to strip the namespace from the output (default), False otherwise
         :return: List<string> its parent classes
         """
-        if not ns:
-            ns = self.getNamespace(childProp)
-            if not ns:
-                ns = self.VIS_NS
-        propertyURI = URIRef("%s#subPropertyOf" % c.RDFS_NS)
-        subjectURI = URIRef("%s#%s" % (ns, self.stripNamespace(childProp)))
-        objects = self.graph.objects(subjectURI, propertyURI)
+        props = hierarchyOf(self, PROPERTY).parentsOf(self.__hierarchyURI(childProp, ns))
         if stripns:
-            return [self.stripNamespace(o) for o in objects]
+            return [self.stripNamespace(o) for o in props]
         else:
-            return [str(o) for o in objects]
+            return props
 
     def instanceIsOfClass(self, instance, entity, ns=None):
         """
@@ -598,28 +590,28 @@ class UpperOntology(object):
             ns = self.getNamespace(name)
             if not ns:
                 ns = self.VIS_NS
-        exists = False
         typesFound = {}
         if name and isinstance(name, basestring):
             name = self.stripNamespace(name)
+            lexicon = self.getLexicon()
             if thing_type in ['all', 'value', 'literal']:
-                uri = self.thingOfTypeExists(name, 'literal', ns)
+                uri = lexicon.lookup(name, 'literal', ns)
                 if uri:
                     typesFound[o_c.OTYPE_LITERAL] = uri
             if thing_type in ['all', 'instance', 'individual']:
-                uri = self.thingOfTypeExists(name, 'individual', ns)
+                uri = lexicon.lookup(name, 'individual', ns)
                 if uri:
                     typesFound[o_c.OTYPE_IND] = uri
             if thing_type in ['all', 'class', 'entity']:
-                uri = self.thingOfTypeExists(name, 'class', ns)
+                uri = lexicon.lookup(name, 'class', ns)
                 if uri:
                     typesFound[o_c.OTYPE_CLASS] = uri
             if thing_type in ['all', 'property', 'objectProperty']:
-                uri = self.thingOfTypeExists(name, 'objectProperty', ns)
+                uri = lexicon.lookup(name, 'objectProperty', ns)
                 if uri:
                     typesFound[o_c.OTYPE_OPROP] = uri
             if thing_type in ['all', 'property', 'datatypeProperty']:
-                uri = self.thingOfTypeExists(name, 'datatypeProperty', ns)
+                uri = lexicon.lookup(name, 'datatypeProperty', ns)
                 if uri:
                     typesFound[o_c.OTYPE_DTPROP] = uri
         return typesFound
@@ -671,35 +663,31 @@ class UpperOntology(object):
 
     def specificityDistanceOfClass(self, name, ns=None):
         """
-        Computes the specificity distance for the given class
+        Computes the specificity distance for the given class; distances are memoized along the class hierarchy
         :param name: Class to consider (or its URI)
         :param ns: namespace, None for default visualization NS
         :return: int: distance of class to the furthermost parent class, starting from 1
         """
-        distance = 1
-        max_distance = 0
-        parents = self.getParentClasses(name, ns)
-        for p in parents:
-            p_d = self.specificityDistanceOfClass(p, ns)
-            if p_d > max_distance:
-                max_distance = p_d
-        return distance + max_distance
+        return self.__specificityDistance(name, CLASS, ns)
 
     def specificityDistanceOfProperty(self, name, ns=None):
         """
-        Returns the specificity distance for the given property
+        Returns the specificity distance for the given property; distances are memoized along the property hierarchy
         :param name: Property to consider (or its URI)
         :param ns: namespace, None for default visualization NS
         :return: int: distance of property to the furthermost parent property, starting from 1
         """
-        distance = 1
-        max_distance = 0
-        parents = self.getParentProperties(name, ns)
-        for p in parents:
-            p_d = self.specificityDistanceOfProperty(p, ns)
-            if p_d > max_distance:
-                max_distance = p_d
-        return distance + max_distance
+        return self.__specificityDistance(name, PROPERTY, ns)
+
+    def __specificityDistance(self, name, kind, ns=None):
+        """
+        Returns the specificity distance of a class or property
+        :param name: Class or property to consider (or its URI)
+        :param kind: hierarchy.CLASS or hierarchy.PROPERTY
+        :param ns: namespace, None for default visualization NS
+        :return: int: distance of the element to its furthermost ancestor, starting from 1
+        """
+        return hierarchyOf(self, kind, ns or self.VIS_NS).distanceOf(self.__hierarchyURI(name, ns))
 
     def domainOfProperty(self, prop, stripns=True, ns=None):
         """
@@ -892,10 +880,15 @@ class UpperOntology(object):
                 objectURI = URIRef("%s#%s" % (ns, o))
             else:
                 objectURI = Literal(o, datatype=datatype)
-            if functional:
-                self.graph.remove((subjectURI, propertyURI, None))
-            if (subjectURI, propertyURI, objectURI) not in self.graph:
-                self.graph.add((subjectURI, propertyURI, objectURI))
+            changed = False
+            with self.graph_lock:
+                if functional and list(self.graph.objects(subjectURI, propertyURI)) != [objectURI]:
+                    self.graph.remove((subjectURI, propertyURI, None))
+                if (subjectURI, propertyURI, objectURI) not in self.graph:
+                    self.graph.add((subjectURI, propertyURI, objectURI))
+                    changed = True
+            if changed:
+                self._onTripleChanged(s, p)
 
     def removeDataTypePropertyTriple(self, s=None, p=None, o=None,
                                      datatype=None, ns=None):
@@ -932,6 +925,7 @@ class UpperOntology(object):
         """
         if not ns:
             ns = self.VIS_NS
+        s_name, p_name = s, p
         allNone = True
         if s is not None:
             allNone = False
@@ -948,8 +942,48 @@ class UpperOntology(object):
             else:
                 o = URIRef("%s#%s" % (ns, o))
         if not allNone:
-            self.graph.remove((s, p, o))
+            changed = False
+            with self.graph_lock:
+                if (s, p, o) in self.graph:
+                    self.graph.remove((s, p, o))
+                    changed = True
+            if changed:
+                self._onTripleChanged(s_name, p_name)
 
+    def _onTripleChanged(self, s, p):
+        """
+        Called after triples have been added to or removed from the graph, so that data derived from them can be
+        invalidated. Subclasses extend it for their own derived data.
+        :param s: string; name of the subject of the changed triples; None if any subject may have changed
+        :param p: string; name of the property of the changed triples; None if any property may have changed
+        :return: None
+        """
+        if self.memo is not None:
+            self.memo.bump()
+        dropLexicon(self.sess_id, s, p)
+        for kind, changed in updateHierarchies(self, s, p).iteritems():
+            if changed is None or changed:
+                self.__updateSpecificities(kind, changed)
+
+    def getLexicon(self):
+        """
+        Returns the index from the surface forms of literals, individuals, classes and properties to the elements
+        bearing them, built once per loaded ontology
+        :return: SurfaceLexicon instance
+        """
+        return lexiconOf(self)
+
+    def memoStats(self):
+        """
+        Returns the hit/miss statistics of the memoized read primitives on this ontology's graph
+        :return: dict<string, dict<string, int>>: for each method name, its number of hits and misses
+        """
+        stats = {}
+        if self.memo is not None:
+            stats = self.memo.hitsAndMisses()
+        return stats
+
+    @memoized
     def tripleExists(self, s, p, o, type="object", ns=None):
         """
         Returns whether a given triple exists
@@ -1000,7 +1034,9 @@ class UpperOntology(object):
                 subjectURI = URIRef("%s#ObjectProperty" % c.OWL_NS)
             else:
                 subjectURI = URIRef("%s#DatatypeProperty" % c.OWL_NS)
-            self.graph.add((objectURI, dataPropertyURI, subjectURI))
+            with self.graph_lock:
+                self.graph.add((objectURI, dataPropertyURI, subjectURI))
+            self._onTripleChanged(self.stripNamespace(propertyName), None)
 
     def hasProperty(self, propertyName, type, ns=None):
         """
@@ -1163,6 +1199,47 @@ class UpperOntology(object):
                                            self.ScoreDataProperty.HAS_SPECIFICITY,
                                            s/max_spec, XSD.float)
 
+    def __updateSpecificities(self, kind, changed):
+        """
+        Updates the specificity scores of the classes or properties whose specificity distance has changed, and the
+        distance scores of the properties whose domain or range include those classes; all of them are updated if the
+        scores have to be normalized again. Nothing is done if scores have not been computed yet.
+        :param kind: hierarchy.CLASS or hierarchy.PROPERTY
+        :param changed: dict<string, int>; previous specificity distance of the elements whose distance has changed;
+        None if not known, to update all of them
+        :return: None, updates the serialized ontology
+        """
+        if not self.hasPropertyOccurrences(self.ScoreDataProperty.HAS_SPECIFICITY):
+            return
+        hierarchy = hierarchyOf(self, kind, self.VIS_NS)
+        items = self.getClasses() if kind == CLASS else self.getProperties()
+        distances = dict((i, hierarchy.distanceOf(i) - 1) for i in items)
+        max_spec = max(distances.values() or [0])
+        if changed is None:
+            renormalize = True
+        else:
+            renormalize = max_spec != max([changed[i] - 1 if i in changed else d
+                                           for i, d in distances.iteritems()] or [0])
+        for i in items if renormalize else [i for i in items if i in changed]:
+            if distances[i]:
+                self.addDataTypePropertyTriple(self.stripNamespace(i), self.ScoreDataProperty.HAS_SPECIFICITY,
+                                               float(distances[i]) / max_spec, XSD.float, functional=True)
+            else:  # Null scores are not stored, see computeSpecificities
+                self.removeDataTypePropertyTriple(self.stripNamespace(i), self.ScoreDataProperty.HAS_SPECIFICITY)
+        if kind == CLASS:
+            if renormalize:
+                props = self.getProperties()
+            else:
+                props = set()
+                for i in changed:
+                    classURI = URIRef("%s#%s" % (self.VIS_NS, self.stripNamespace(i)))
+                    for p in [RDFS.domain, RDFS.range]:
+                        props.update(str(prop) for prop in self.graph.subjects(p, classURI))
+            for p in props:
+                self.removeDataTypePropertyTriple(self.stripNamespace(p), self.ScoreDataProperty.HAS_DISTANCE_SCORE)
+            if props:
+                self.computeDistanceScores(list(props))
+
     def computeDistanceScores(self, props=None):
         """
         Computes the distance scores of all properties in the ontology
@@ -1192,13 +1269,40 @@ class UpperOntology(object):
                                            self.ScoreDataProperty.HAS_DISTANCE_SCORE,
                                            avg, XSD.float)
 
+    def hasDerivedData(self):
+        """
+        Returns whether the data computed by resetNavigation is already in the graph, e.g. because it was loaded from
+        a chart compiled along with its derived triples (see chart_compiler). This data only depends on the chart, and
+        is removed when the chart is reloaded, so it does not need to be computed again.
+        :return: bool
+        """
+        return all(self.hasPropertyOccurrences(p) for p in [self.ScoreDataProperty.HAS_SPECIFICITY,
+                                                            self.ScoreDataProperty.HAS_DISTANCE_SCORE])
+
+    def hasPropertyOccurrences(self, p, ns=None):
+        """
+        Returns whether any triple with the given property is in the graph
+        :param p: name of the property
+        :param ns: namespace, None for default visualization NS
+        :return: bool
+        """
+        if not ns:
+            ns = self.VIS_NS
+        propertyURI = URIRef("%s#%s" % (ns, p))
+        return next(self.graph.triples((None, propertyURI, None)), None) is not None
+
     def resetNavigation(self):
         """
-        Recomputes properties useful for navigation of the graphic:
+        Recomputes properties useful for navigation of the graphic, unless already in the graph (see hasDerivedData):
         1. Specificity scores of classes and properties
         2. Distance scores of properties
+        The class and property hierarchies are read beforehand in any case, for hierarchy queries.
         :return: None, updates the serialized ontology
         """
+        for kind in [CLASS, PROPERTY]:
+            hierarchyOf(self, kind)
+        if self.hasDerivedData():
+            return
         self.removeDataTypePropertyTriple(None, self.ScoreDataProperty.HAS_SPECIFICITY, None)
         self.computeSpecificities([], 'class')
         all_props = self.getProperties()
@@ -1,6 +1,7 @@
 from flask import session
 from sys import float_info
 from ontology.upper_ontology import UpperOntology
+from ontology.memo import memoized
 from NLP.util.TreeUtil import quick_norm
 import rdflib
 from rdflib import XSD, URIRef
@@ -336,6 +337,7 @@ class UpperVisOntology(UpperOntology):
         return self.getObjects(element,
                                self.SyntacticProperty.HAS_SYNTACTIC_ROLE)
 
+    @memoized
     def elementHasRole(self, element, role, type="syntactic", ns=None):
         """
         Returns whether the given element has the given syntactic role
@@ -982,6 +984,13 @@ class UpperVisOntology(UpperOntology):
             ul = labels.get(element, "")
         return ul
 
+    def getAllUserLabels(self):
+        """
+        Returns the user-defined tags of all elements tagged by the current user
+        :return: dict<string, string>: element instance name -> user-defined information
+        """
+        return dict(session.get(c.SESS_USER_LABELS % self.sess_id, {}))
+
     def getElementsWithUserLabels(self, userTags, negate=False):
         """
         Return the elements of the ontology tagged by the user with all the given user tags
@@ -1339,6 +1348,28 @@ class UpperVisOntology(UpperOntology):
                         break
         return trend_changes
 
+    def getAxisCalibration(self):
+        """
+        Returns the calibration of the chart's metric axis, used to convert element lengths to values
+        :return: AxisCalibration instance
+        """
+        from ontology.axis_calibration import calibrationOf
+        calibration = calibrationOf(self)
+        if calibration is None:
+            raise Exception("Axis not found in chart.")
+        return calibration
+
+    def _onTripleChanged(self, s, p):
+        """
+        Drops the metric axis calibration if the changed triples may alter it
+        :param s: string; name of the subject of the changed triples; None if any subject may have changed
+        :param p: string; name of the property of the changed triples; None if any property may have changed
+        :return: None
+        """
+        from ontology.axis_calibration import dropCalibration
+        super(UpperVisOntology, self)._onTripleChanged(s, p)
+        dropCalibration(self.sess_id, s, p)
+
     def resetNavigation(self):
         """
         Reset navigation-related session variables
@@ -0,0 +1,180 @@
+"""
+In-memory server-side sessions for Flask, shared by all request threads of the application process. Session data is
+kept in a compact binary encoding (pickled, and compressed when large), expires after a time to live, and the
+number of sessions kept is capped. Sessions are only re-encoded when modified, so requests that just read their
+session (e.g. navigation) cost no encoding nor any disk I/O.
+"""
+import cPickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from uuid import uuid4
+from flask.sessions import SessionInterface
+from flask_session.sessions import ServerSideSession
+
+COMPRESS_MIN_SIZE = 512  # Encoded sessions larger than this (bytes) are compressed
+_RAW, _COMPRESSED = '\x00', '\x01'  # Leading byte of encoded sessions
+
+
+def encodeSession(data):
+    """
+    Encodes session data
+    :param data: dict; session contents
+    :return: string; encoded session
+    """
+    blob = cPickle.dumps(data, cPickle.HIGHEST_PROTOCOL)
+    if len(blob) > COMPRESS_MIN_SIZE:
+        return _COMPRESSED + zlib.compress(blob, 1)
+    return _RAW + blob
+
+
+def decodeSession(blob):
+    """
+    Decodes session data encoded by encodeSession
+    :param blob: string; encoded session
+    :return: dict; session contents
+    """
+    if blob[0] == _COMPRESSED:
+        return cPickle.loads(zlib.decompress(blob[1:]))
+    return cPickle.loads(blob[1:])
+
+
+class MemorySessionStore(object):
+    """
+    Thread-safe map of session IDs to encoded sessions, evicting sessions not used within their time to live and,
+    beyond the maximum number of sessions, the least recently used ones
+    """
+    def __init__(self, ttl, max_entries):
+        """
+        MemorySessionStore constructor
+        :param ttl: float; seconds a session is kept since it was last used
+        :param max_entries: int; maximum number of sessions kept
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # Key: session ID; value: (expiration time, encoded session). LRU first
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'expired': 0, 'evicted': 0}
+
+    def get(self, sid):
+        """
+        Returns the encoded session with the given ID, extending its lifetime
+        :param sid: string; session ID
+        :return: string; None if not found or expired
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.entries.pop(sid, None)
+            if entry is None or entry[0] < now:
+                self.stats['misses'] += 1
+                if entry is not None:
+                    self.stats['expired'] += 1
+                return None
+            self.entries[sid] = (now + self.ttl, entry[1])
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def set(self, sid, blob):
+        """
+        Stores an encoded session
+        :param sid: string; session ID
+        :param blob: string; encoded session
+        :return: None
+        """
+        now = time.time()
+        with self.lock:
+            self.entries.pop(sid, None)
+            self.entries[sid] = (now + self.ttl, blob)
+            self.stats['writes'] += 1
+            self.__evict(now)
+
+    def delete(self, sid):
+        """
+        Removes a session
+        :param sid: string; session ID
+        :return: None
+        """
+        with self.lock:
+            self.entries.pop(sid, None)
+
+    def clear(self):
+        """
+        Removes all sessions
+        :return: None
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def size(self):
+        """
+        Returns the number of sessions kept and the total size of their encodings
+        :return: (int, int): sessions, bytes
+        """
+        with self.lock:
+            return len(self.entries), sum(len(blob) for _, blob in self.entries.itervalues())
+
+    def __evict(self, now):
+        """
+        Drops expired sessions, and the least recently used ones beyond the maximum. Lock must be held.
+        :param now: float; current time
+        :return: None
+        """
+        while self.entries:
+            sid, (expires, _) = next(self.entries.iteritems())
+            if expires >= now and len(self.entries) <= self.max_entries:
+                break  # Entries are in order of last use, hence of expiration time
+            del self.entries[sid]
+            self.stats['expired' if expires < now else 'evicted'] += 1
+
+
+class MemorySession(ServerSideSession):
+    """
+    Server-side session; stored is True if it was read from the store
+    """
+    stored = False
+
+
+class MemorySessionInterface(SessionInterface):
+    """
+    Flask session interface keeping sessions in a MemorySessionStore; the session cookie only holds the session ID
+    """
+    session_class = MemorySession
+
+    def __init__(self, ttl, max_entries):
+        """
+        MemorySessionInterface constructor
+        :param ttl: float; seconds a session is kept since it was last used
+        :param max_entries: int; maximum number of sessions kept
+        """
+        self.store = MemorySessionStore(ttl, max_entries)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid:
+            blob = self.store.get(sid)
+            if blob is not None:
+                try:
+                    session = self.session_class(decodeSession(blob), sid=sid)
+                    session.stored = True
+                    return session
+                except Exception:
+                    pass  # Unreadable session; start a new one
+        return self.session_class(sid=str(uuid4()))
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+        if session.modified or not session.stored:
+            session.permanent = True  # Cookies last as long as sessions are kept
+            self.store.set(session.sid, encodeSession(dict(session)))
+        if not session.stored or self.should_set_cookie(app, session):
+            response.set_cookie(app.session_cookie_name, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app))